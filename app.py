@@ -1,403 +1,893 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import os
 import re
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import PyPDF2
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer, TfidfTransformer
+from sklearn.preprocessing import normalize as l2_normalize
 import nltk
 from nltk.corpus import stopwords, wordnet
-from nltk.tokenize import word_tokenize
 from nltk.stem import PorterStemmer, WordNetLemmatizer
-import pickle
 import hashlib
-import io
-import base64
-from PIL import Image
-from rank_bm25 import BM25Okapi
 import json
+import time
+import threading
+import atexit
+import copy
+from contextlib import contextmanager
 from datetime import datetime
+from ingest import extract_document, ingest_files, default_workers, pool_size
+from bm25_index import BM25Index
+from vector_index import build_vector_index, top_k_ids, ExactIndex, IVFIndex, STORAGE_TYPES
+from index_store import IndexReader, IndexWriter, IndexLock, read_object, write_object, current_generation, CURRENT_FILE
+from index_state import IndexState
+from query_cache import ResultCache, EmbeddingCache
+from filter_index import FilterIndex
+from snippet_index import SnippetIndex, TextPositions
+from image_store import ImageStore
+from jobs import JobQueue
+from text_analyzer import TextAnalyzer, CUSTOM_STOPWORDS
+from query_expansion import ExpansionTable, build_expansion_table
+from streaming import (STREAM_MIMETYPES, negotiate_stream, format_event, negotiate_encoding,
+                       compress, compress_stream)
+
+STARTED_AT = time.time()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
 # Load configuration
 CONFIG = {
     'max_pages_per_pdf': 10,
     'max_images_per_pdf': 3,
-    'tfidf_max_features': 1000,
-    'hybrid_alpha': 0.5,  # Weight for TF-IDF in hybrid (1-alpha for semantic)
+    'tfidf_max_features': 0,  # Cap on the TF-IDF vocabulary (most frequent terms; 0 = keep every term)
+    'tfidf_min_df': 1,  # Drop TF-IDF terms in fewer documents (int) or a smaller fraction of them (float)
+    'tfidf_max_df': 1.0,  # Drop TF-IDF terms in more documents (int) or a larger fraction of them (float)
+    'hybrid_fusion': 'weighted',  # weighted (sum of scores) or rrf (Reciprocal Rank Fusion)
+    'hybrid_weights': {'tfidf': 0.3, 'bm25': 0.35, 'semantic': 0.35},
+    'rrf_k': 60,  # Rank offset for RRF
     'use_stemming': True,
     'use_lemmatization': False,
-    'enable_query_expansion': True,
-    'context_window': 150
+    'enable_query_expansion': True,  # Add WordNet synonyms found in the collection to lexical queries
+    'expansion_weight': 0.3,  # Weight of an expansion term relative to a query term
+    'expansion_synsets': 2,  # WordNet senses (most common first) whose synonyms are considered
+    'expansion_max_terms': 3,  # Most expansion terms per query term
+    'context_window': 150,
+    'ingest_workers': 0,  # Processes for document extraction (0 = one per CPU core, 1 = serial)
+    'passage_size': 200,  # Words per passage for semantic embeddings
+    'passage_overlap': 50,  # Words shared by consecutive passages
+    'semantic_aggregation': 'max',  # How passage scores become document scores: max or mean_top_n
+    'semantic_top_n': 3,  # Passages averaged per document for mean_top_n
+    'embedding_batch_size': 64,
+    'vector_index': 'exact',  # exact or ivf (approximate nearest neighbours)
+    'ivf_lists': 0,  # IVF buckets (0 = about sqrt(number of passages))
+    'ivf_probe': 8,  # IVF buckets scanned per query (higher = better recall, slower)
+    'vector_storage': 'float32',  # Passage vector storage: float32, float16 or int8 (scalar-quantized)
+    'semantic_candidates': 1000,  # Passages retrieved from the vector index before aggregating per document
+    'semantic_model': 'all-MiniLM-L6-v2',
+    'semantic_warmup': True,  # Load the semantic model in the background at server start (else on first semantic query)
+    'max_top_k': 100,  # Largest page size /search accepts
+    'max_batch_queries': 1000,  # Most queries one /search/batch request may carry
+    'compress_min_bytes': 1024,  # gzip/brotli JSON and HTML responses at least this large
+    'index_poll_interval': 2,  # Seconds between checks for an index saved by another server worker (0 = never)
+    'job_history': 100,  # Finished indexing jobs kept for /jobs/<id>
+    'result_cache_size': 256,  # Cached /search responses (0 disables the cache)
+    'result_cache_ttl': 300,  # Seconds before a cached response expires (0 = never)
+    'query_embedding_cache_size': 1024,  # Cached query embeddings
+    'query_embedding_cache_mb': 16,  # Memory bound of the query embedding cache
+    'persist_query_embeddings': False  # Keep cached query embeddings across restarts
 }
 
+def upgrade_config(config):
+    """Map settings from older config files onto their replacements: hybrid_alpha
+    (lexical weight, split over TF-IDF and BM25) becomes hybrid_weights unless
+    those are given too
+    """
+    config = dict(config)
+    alpha = config.pop('hybrid_alpha', None)
+    if alpha is not None and 'hybrid_weights' not in config:
+        config['hybrid_weights'] = {'tfidf': alpha / 2, 'bm25': alpha / 2, 'semantic': 1 - alpha}
+    return config
+
 # Try to load config.json if exists
 config_path = os.path.join(r'A:\IR', 'config.json')
 if os.path.exists(config_path):
     try:
         with open(config_path, 'r') as f:
-            CONFIG.update(json.load(f))
+            CONFIG.update(upgrade_config(json.load(f)))
     except:
         pass
 
+def check_vector_config(config):
+    """Warn about vector_storage settings that cannot work or scan slowly; an
+    unknown storage falls back to float32. Returns the warnings.
+    """
+    warnings = []
+    storage = config.get('vector_storage', 'float32')
+    if storage not in STORAGE_TYPES:
+        warnings.append(f"Unknown vector_storage {storage!r}, using float32 (choose from {', '.join(STORAGE_TYPES)})")
+        config['vector_storage'] = 'float32'
+    elif storage == 'float16' and config.get('vector_index') != 'ivf':
+        # numpy has no half-precision BLAS: every exact scan converts all vectors to float32
+        warnings.append("vector_storage float16 with the exact vector index scans several times slower "
+                        "than float32; int8 uses less memory still at float32 speed, or use vector_index ivf")
+    for warning in warnings:
+        print(f"⚠️ {warning}")
+    return warnings
+
+check_vector_config(CONFIG)
+
 # Initialize NLP tools
 stemmer = PorterStemmer()
 lemmatizer = WordNetLemmatizer()
 
-# Try to load semantic model
+# Semantic model and NLTK data are loaded lazily so that importing the app
+# (and lexical search) does not wait for torch or NLTK downloads
 SEMANTIC_MODEL = None
 SEMANTIC_AVAILABLE = False
+semantic_status = 'not_loaded'  # not_loaded, loading, ready or failed
+semantic_error = None
+_semantic_lock = threading.Lock()
+_nltk_ready = False
+
+def ensure_nltk_data():
+    """Download the NLTK stopword data on first use (tokenizing needs no NLTK data)"""
+    global _nltk_ready
+    if _nltk_ready:
+        return
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('stopwords')
+    _nltk_ready = True
+
+def load_semantic_model():
+    """Load the sentence-transformer model once; returns it, or None if unavailable.
+    Callers arriving while a background load is running wait for it.
+    """
+    global SEMANTIC_MODEL, SEMANTIC_AVAILABLE, semantic_status, semantic_error
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SEMANTIC_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
-    SEMANTIC_AVAILABLE = True
-    print("✅ Semantic search enabled!")
-except Exception as e:
-    print(f"⚠️ Semantic search disabled: {e}")
-    SEMANTIC_AVAILABLE = False
-
-# Global variables to store documents
-documents = []
-doc_names = []
-doc_images = []  # Store images for each document
-doc_metadata = []  # Store file size, modified time, etc.
-processed_docs = []  # Tokenized and preprocessed docs for BM25
-tfidf_vectorizer = None
-tfidf_matrix = None
-bm25_model = None
-semantic_embeddings = None
+    with _semantic_lock:
+        if SEMANTIC_MODEL is not None or semantic_status == 'failed':
+            return SEMANTIC_MODEL
+        semantic_status = 'loading'
+        started = time.time()
+        try:
+            from sentence_transformers import SentenceTransformer
+            SEMANTIC_MODEL = SentenceTransformer(CONFIG.get('semantic_model', 'all-MiniLM-L6-v2'))
+            SEMANTIC_AVAILABLE = True
+            semantic_status = 'ready'
+            print(f"✅ Semantic search enabled! (model loaded in {time.time() - started:.1f}s)")
+        except Exception as e:
+            SEMANTIC_AVAILABLE = False
+            semantic_status = 'failed'
+            semantic_error = str(e)
+            print(f"⚠️ Semantic search disabled: {e}")
+            return None
+        if CONFIG.get('persist_query_embeddings'):
+            # A damaged cache file only costs the cached embeddings, not semantic search
+            try:
+                loaded = query_embedding_cache.load(QUERY_EMBEDDING_FILE)
+                print(f"Loaded {loaded} cached query embeddings")
+            except Exception as e:
+                print(f"Error loading query embeddings (ignored): {e}")
+    
+    # Embed documents indexed before the model was available. Either way hybrid
+    # results computed during warm-up lacked the semantic scores
+    if not embed_missing_documents():
+        bump_index_generation()
+    return SEMANTIC_MODEL
+
+def embed_query(query):
+    """Embedding of a query string, memoized in query_embedding_cache.
+    Every code path that embeds queries should go through here or embed_queries.
+    """
+    vector = query_embedding_cache.get(query)
+    if vector is None:
+        vector = np.asarray(SEMANTIC_MODEL.encode([query], show_progress_bar=False)[0], dtype=np.float32)
+        query_embedding_cache.put(query, vector)
+    return vector
+
+def embed_queries(queries):
+    """Embeddings of many queries (one row each). Queries missing from
+    query_embedding_cache are encoded together in a single model call.
+    """
+    vectors = [query_embedding_cache.get(query) for query in queries]
+    missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+    if missing:
+        encoded = np.asarray(SEMANTIC_MODEL.encode(missing, batch_size=CONFIG.get('embedding_batch_size', 64),
+                                                   show_progress_bar=False), dtype=np.float32)
+        encoded = dict(zip(missing, encoded))
+        for query, vector in encoded.items():
+            query_embedding_cache.put(query, vector)
+        vectors = [encoded[query] if vector is None else vector for query, vector in zip(queries, vectors)]
+    return np.vstack(vectors)
+
+@atexit.register
+def save_query_embeddings():
+    """Persist the query embedding cache on shutdown (if enabled)"""
+    if CONFIG.get('persist_query_embeddings') and SEMANTIC_MODEL is not None:
+        try:
+            query_embedding_cache.save(QUERY_EMBEDDING_FILE)
+        except Exception as e:
+            print(f"Error saving query embeddings: {e}")
+
+def start_warmup():
+    """Load NLTK data and the semantic model in a background thread"""
+    global semantic_status
+
+    def warmup():
+        ensure_nltk_data()
+        load_semantic_model()
+
+    if semantic_status == 'not_loaded' and SEMANTIC_MODEL is None:
+        # Mark as loading right away so hybrid search doesn't block on the model
+        semantic_status = 'loading'
+        threading.Thread(target=warmup, name='warmup', daemon=True).start()
+
+# The loaded documents and indices (see index_state.py). Searches read index_state
+# once and use that object throughout; updates publish a new one instead of
+# modifying it, so requests never see a half-updated index
+index_state = IndexState()
+index_generation = 0  # Bumped whenever search results may change; part of every result cache key
+_update_lock = threading.RLock()  # Serializes index updates within this process
+_update_depth = 0  # index_update_lock nesting of the thread holding _update_lock
+_publish_lock = threading.Lock()
+_embedding_lock = threading.Lock()
+_seen_generation = None  # On-disk generation this process last opened or saved
+result_cache = ResultCache(CONFIG.get('result_cache_size', 256), CONFIG.get('result_cache_ttl', 300))
+query_embedding_cache = EmbeddingCache(CONFIG.get('query_embedding_cache_size', 1024),
+                                       int(CONFIG.get('query_embedding_cache_mb', 16) * 2**20),
+                                       model_name=CONFIG.get('semantic_model', 'all-MiniLM-L6-v2'))
 
 # Cache settings
 BASE_DIR = r'A:\IR'
-CACHE_FILE = os.path.join(BASE_DIR, 'document_cache.pkl')
-HASH_FILE = os.path.join(BASE_DIR, 'files_hash.txt')
-IMAGE_CACHE_DIR = os.path.join(BASE_DIR, 'extracted_images')
+DOCS_DIR = os.path.join(BASE_DIR, 'data', 'docs')
+INDEX_DIR = os.path.join(BASE_DIR, 'index')  # On-disk index (see index_store.py)
+CACHE_VERSION = 13
+IMAGE_CACHE_DIR = os.path.join(BASE_DIR, 'extracted_images')  # Content-addressed image store
+QUERY_EMBEDDING_FILE = os.path.join(BASE_DIR, 'query_embeddings.npz')
+JOBS_DIR = os.path.join(BASE_DIR, 'jobs')  # Status of indexing jobs (see jobs.py)
 
 # Create image cache directory
 if not os.path.exists(IMAGE_CACHE_DIR):
     os.makedirs(IMAGE_CACHE_DIR)
+image_store = ImageStore(IMAGE_CACHE_DIR)
+job_queue = JobQueue(JOBS_DIR, CONFIG.get('job_history', 100))  # Runs /reload and /upload indexing
+
+def __getattr__(name):
+    """Expose the published index's fields as module attributes (app.documents, ...)"""
+    if name in vars(index_state):
+        return getattr(index_state, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_analyzers = {}  # (use_stemming, use_lemmatization) -> TextAnalyzer
+
+def text_analyzer():
+    """The TextAnalyzer for the configured stemming/lemmatization (created once per setting)"""
+    mode = (bool(CONFIG.get('use_stemming')), bool(CONFIG.get('use_lemmatization')))
+    analyzer = _analyzers.get(mode)
+    if analyzer is None:
+        ensure_nltk_data()
+        normalize = stemmer.stem if mode[0] else lemmatizer.lemmatize if mode[1] else None
+        analyzer = _analyzers[mode] = TextAnalyzer(CUSTOM_STOPWORDS.union(stopwords.words('english')), normalize)
+    return analyzer
 
 def preprocess_text_advanced(text):
-    """Advanced preprocessing with stemming/lemmatization"""
-    # Lowercase
-    text = text.lower()
-    
-    # Remove special characters but keep spaces
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
-    
-    # Tokenize
-    tokens = word_tokenize(text)
-    
-    # Remove stopwords
-    stop_words = set(stopwords.words('english'))
-    # Add custom IR-specific stopwords
-    custom_stops = {'note', 'notes', 'question', 'answer', 'section', 'unit', 'page'}
-    stop_words.update(custom_stops)
-    
-    tokens = [t for t in tokens if t not in stop_words and len(t) > 2]
-    
-    # Apply stemming or lemmatization
-    if CONFIG.get('use_stemming'):
-        tokens = [stemmer.stem(t) for t in tokens]
-    elif CONFIG.get('use_lemmatization'):
-        tokens = [lemmatizer.lemmatize(t) for t in tokens]
-    
-    return tokens
+    """Advanced preprocessing with stemming/lemmatization (see text_analyzer.py)"""
+    return text_analyzer().analyze(text)
 
-def expand_query(query):
-    """Expand query with synonyms using WordNet"""
-    if not CONFIG.get('enable_query_expansion'):
-        return query
-    
-    expanded_terms = []
-    tokens = word_tokenize(query.lower())
-    
-    for token in tokens:
-        expanded_terms.append(token)
-        # Get synonyms from WordNet
-        synsets = wordnet.synsets(token)
-        if synsets:
-            # Add first 2 synonyms max
-            for syn in synsets[:2]:
-                for lemma in syn.lemmas()[:1]:
-                    synonym = lemma.name().replace('_', ' ')
-                    if synonym != token and synonym not in expanded_terms:
-                        expanded_terms.append(synonym)
-    
-    return ' '.join(expanded_terms)
+_wordnet_ready = None  # True/False once WordNet has been looked for
+_synonyms = {}  # word -> WordNet synonyms, filled while expansion tables are built
 
-def extract_images_from_pdf(pdf_path, max_images=3):
-    """Extract images from PDF file"""
-    images = []
-    try:
-        import fitz  # PyMuPDF
-        pdf_document = fitz.open(pdf_path)
-        image_count = 0
-        
-        for page_num in range(min(10, len(pdf_document))):
-            if image_count >= max_images:
-                break
-            
-            page = pdf_document[page_num]
-            image_list = page.get_images(full=True)
-            
-            for img_index, img_info in enumerate(image_list):
-                if image_count >= max_images:
-                    break
-                
-                try:
-                    xref = img_info[0]
-                    base_image = pdf_document.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    
-                    # Convert to PIL Image
-                    img = Image.open(io.BytesIO(image_bytes))
-                    
-                    # Skip very small images
-                    if img.width < 50 or img.height < 50:
-                        continue
-                    
-                    # Resize if too large
-                    if img.width > 600 or img.height > 600:
-                        img.thumbnail((600, 600), Image.Resampling.LANCZOS)
-                    
-                    # Convert to RGB if necessary
-                    if img.mode not in ('RGB', 'L'):
-                        img = img.convert('RGB')
-                    
-                    # Convert to base64 (return just the base64 string without prefix)
-                    buffered = io.BytesIO()
-                    img.save(buffered, format="PNG")
-                    img_str = base64.b64encode(buffered.getvalue()).decode()
-                    
-                    # Return as plain base64 string, not object
-                    images.append(img_str)
-                    image_count += 1
-                except Exception:
-                    continue
-        
-        pdf_document.close()
-    except ImportError:
-        # Fallback: PyMuPDF not installed, skip image extraction
-        pass
-    except Exception:
-        pass
-    
-    return images
+def wordnet_synonyms(word):
+    """Single-word WordNet synonyms of word from its expansion_synsets most common
+    senses (empty if WordNet data is unavailable)
+    """
+    global _wordnet_ready
+    synonyms = _synonyms.get(word)
+    if synonyms is not None:
+        return synonyms
+    if _wordnet_ready is None:
+        try:
+            wordnet.ensure_loaded()
+        except LookupError:
+            nltk.download('wordnet', quiet=True)
+        try:
+            wordnet.ensure_loaded()
+            _wordnet_ready = True
+        except LookupError:
+            _wordnet_ready = False
+            print("⚠️ WordNet data unavailable, query expansion disabled")
+    if not _wordnet_ready:
+        return ()
+    synonyms = _synonyms[word] = tuple(dict.fromkeys(
+        lemma.name().lower() for synset in wordnet.synsets(word)[:CONFIG.get('expansion_synsets', 2)]
+        for lemma in synset.lemmas() if '_' not in lemma.name() and lemma.name().lower() != word))
+    return synonyms
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF file with error handling"""
-    text = ""
-    try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            # Limit to first 20 pages for performance
-            max_pages = min(CONFIG.get('max_pages_per_pdf', 20), len(pdf_reader.pages))
-            for i in range(max_pages):
-                try:
-                    page_text = pdf_reader.pages[i].extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                except (KeyboardInterrupt, SystemExit):
-                    raise
-                except Exception:
-                    # Skip problematic pages silently
-                    continue
-    except (KeyboardInterrupt, SystemExit):
-        raise
-    except Exception as e:
-        # Skip entire PDF if unreadable
-        return ""
-    return text
+def seed_synonyms(state):
+    """Add the synonym lookups saved with state's index to the wordnet_synonyms memo,
+    so rebuilding the expansion table only queries WordNet for new words
+    """
+    if state.synonyms:
+        for word, synonyms in state.synonyms:
+            _synonyms.setdefault(word, tuple(synonyms))
+        state.synonyms = ()
 
-def extract_text_from_txt(txt_path):
-    """Extract text from text file"""
-    try:
-        with open(txt_path, 'r', encoding='utf-8', errors='ignore') as file:
-            return file.read()
-    except Exception as e:
-        print(f"Error reading text file {txt_path}: {e}")
-        return ""
+def build_expansions(state):
+    """Rebuild the query expansion table of state: synonyms of the collection's
+    words, restricted to index terms that occur in some document
+    """
+    if not CONFIG.get('enable_query_expansion') or state.bm25_model is None:
+        state.expansion_table = ExpansionTable()
+        return
+    seed_synonyms(state)
+    bm25 = state.bm25_model
+    doc_freqs = np.diff(bm25.indptr)
+    vocabulary = {term for term, term_id in bm25.vocabulary.items() if doc_freqs[term_id] > 0}
+    words = (word for word in state.snippet_index.vocabulary if word.isalpha() and len(word) > 2)
+    state.expansion_table = build_expansion_table(words, text_analyzer().analyze, vocabulary, wordnet_synonyms,
+                                                  CONFIG.get('expansion_max_terms', 3))
+
+def analyze_query(query, state=None):
+    """Index terms of a query and their weights: its own terms (weight 1) followed
+    by expansion terms from the expansion table (weight expansion_weight)
+    """
+    terms = text_analyzer().analyze(query)
+    if not CONFIG.get('enable_query_expansion'):
+        return terms, [1.0] * len(terms)
+    return (state or index_state).expansion_table.expand(terms, CONFIG.get('expansion_weight', 0.3))
+
+def expand_query(query, state=None):
+    """The query followed by the expansion terms (index terms) it is searched with"""
+    own_terms = len(text_analyzer().analyze(query))
+    return ' '.join([query] + analyze_query(query, state)[0][own_terms:])
+
+def compute_file_hash(file_path):
+    """Calculate MD5 hash of a file's contents"""
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
 
-def get_files_hash(docs_path):
-    """Calculate hash of all files in docs folder to detect changes"""
-    file_info = []
+def scan_docs_folder(docs_path):
+    """Find all supported files in the docs folder.
+    Returns {rel_path: (file_path, mtime, size)}
+    """
+    found = {}
     for root, dirs, files in os.walk(docs_path):
         for filename in files:
             if filename.endswith('.pdf') or filename.endswith('.txt'):
                 file_path = os.path.join(root, filename)
-                # Get file modification time and size
+                rel_path = os.path.relpath(file_path, docs_path)
                 stat = os.stat(file_path)
-                file_info.append(f"{file_path}:{stat.st_mtime}:{stat.st_size}")
-    
-    # Sort for consistent hashing
-    file_info.sort()
-    combined = '|'.join(file_info)
-    return hashlib.md5(combined.encode()).hexdigest()
+                found[rel_path] = (file_path, stat.st_mtime, stat.st_size)
+    return found
 
-def load_from_cache():
-    """Load documents from cache if available"""
-    global documents, doc_names, doc_images, doc_metadata, processed_docs
-    global tfidf_vectorizer, tfidf_matrix, bm25_model, semantic_embeddings
-    
+def make_manifest_entry(file_path, file_hash=None):
+    """Build a manifest entry (mtime, size, content hash) for a file"""
+    stat = os.stat(file_path)
+    return {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'hash': file_hash or compute_file_hash(file_path),
+        'indexed': False
+    }
+
+def diff_manifest(old_manifest, docs_path):
+    """Compare the docs folder against the cached manifest.
+    Returns (new_manifest, to_extract, removed) where to_extract holds added or
+    changed files and removed holds files that disappeared or changed.
+    Files whose mtime/size moved but whose content hash did not are kept as-is.
+    """
+    new_manifest = {}
+    to_extract = []
+    removed = []
+
+    for rel_path, (file_path, mtime, size) in sorted(scan_docs_folder(docs_path).items()):
+        entry = old_manifest.get(rel_path)
+        if entry and entry['mtime'] == mtime and entry['size'] == size:
+            new_manifest[rel_path] = entry
+            continue
+
+        file_hash = compute_file_hash(file_path)
+        if entry and entry['hash'] == file_hash:
+            # Touched but not modified, just refresh the stat info
+            new_manifest[rel_path] = dict(entry, mtime=mtime, size=size)
+            continue
+
+        new_manifest[rel_path] = make_manifest_entry(file_path, file_hash)
+        to_extract.append(rel_path)
+        if entry:
+            removed.append(rel_path)
+
+    removed.extend(rel_path for rel_path in old_manifest if rel_path not in new_manifest)
+    return new_manifest, to_extract, removed
+
+def publish_index(state=None):
+    """Make state the index that searches use, under a new result cache generation.
+    Without a state the current index is republished, which drops cached results.
+    """
+    global index_state, index_generation
+    with _publish_lock:
+        if state is None:
+            state = copy.copy(index_state)
+        index_generation += 1
+        state.generation = index_generation
+        index_state = state
+    result_cache.clear()
+
+def bump_index_generation():
+    """Record that the searchable state changed and drop cached results"""
+    publish_index()
+
+@contextmanager
+def index_update_lock():
+    """Serialize index updates within this process (_update_lock) and across server
+    workers sharing INDEX_DIR (IndexLock). Reentrant; the file lock is taken once.
+    """
+    global _update_depth
+    with _update_lock:
+        _update_depth += 1
+        try:
+            if _update_depth == 1:
+                with IndexLock(INDEX_DIR):
+                    yield
+            else:
+                yield
+        finally:
+            _update_depth -= 1
+
+@contextmanager
+def updating_index(state=None):
+    """Apply an update to a copy of the published index and publish the copy when
+    the block completes (nothing is published if it raises). Searches keep using
+    the previous index meanwhile. Given a state (an update already in progress),
+    that state is used as it is and publishing is left to its owner.
+    """
+    if state is not None:
+        yield state
+        return
+    with index_update_lock():
+        state = index_state.copy()
+        yield state
+        rows = state.tfidf_matrix.shape[0] if state.tfidf_matrix is not None else 0
+        if rows != len(state.documents):
+            # Documents changed without rebuild_lexical_indices: never publish stale TF-IDF
+            rebuild_lexical_indices(state)
+        publish_index(state)
+
+def reset_index(state=None):
+    """Clear all loaded documents and indices"""
+    with updating_index(state) as state:
+        state.clear()
+
+def remove_documents(names, state=None):
+    """Drop documents (and their per-document index data) by relative path"""
+    names = set(names)
+    with updating_index(state) as state:
+        doc_names = state.doc_names
+        keep = [i for i, name in enumerate(doc_names) if name not in names]
+        if len(keep) == len(doc_names):
+            return
+
+        keep_mask = np.zeros(len(doc_names), dtype=bool)
+        keep_mask[keep] = True
+
+        state.documents = [state.documents[i] for i in keep]
+        state.doc_names = [doc_names[i] for i in keep]
+        state.doc_images = [state.doc_images[i] for i in keep]
+        state.doc_metadata = [state.doc_metadata[i] for i in keep]
+        if state.bm25_model is not None:
+            state.bm25_model.remove_documents(keep)
+        state.snippet_index.remove_documents(keep)
+        if state.semantic_index is not None:
+            # Drop the removed documents' passages and renumber the rest
+            passage_doc_ids = state.passage_doc_ids
+            passage_mask = keep_mask[passage_doc_ids]
+            state.semantic_index.remove(passage_mask)
+            state.passage_spans = state.passage_spans[passage_mask]
+            state.passage_doc_ids = (np.cumsum(keep_mask) - 1)[passage_doc_ids[passage_mask]].astype(np.int32)
+
+def chunk_passages(text, size=200, overlap=50):
+    """Split text into overlapping windows of `size` words.
+    Returns a list of (start, end) character offsets.
+    """
+    words = [(m.start(), m.end()) for m in re.finditer(r'\S+', text)]
+    if not words:
+        return []
+
+    step = max(1, size - overlap)
+    spans = []
+    for first in range(0, len(words), step):
+        last = min(first + size, len(words)) - 1
+        spans.append((words[first][0], words[last][1]))
+        if last == len(words) - 1:
+            break
+    return spans
+
+def embed_documents(state, start):
+    """Chunk state.documents[start:] into passages, embed them in batches and append
+    to the passage index (state is an index being updated)
+    """
+    size = CONFIG.get('passage_size', 200)
+    overlap = CONFIG.get('passage_overlap', 50)
+    documents = state.documents
+    passages, doc_ids, spans = [], [], []
+    for idx in range(start, len(documents)):
+        for span_start, span_end in chunk_passages(documents[idx], size, overlap):
+            passages.append(documents[idx][span_start:span_end])
+            doc_ids.append(idx)
+            spans.append((span_start, span_end))
+    if not passages:
+        return
+
+    new_embeddings = SEMANTIC_MODEL.encode(passages, batch_size=CONFIG.get('embedding_batch_size', 64),
+                                           show_progress_bar=False)
+    new_doc_ids = np.array(doc_ids, dtype=np.int32)
+    new_spans = np.array(spans, dtype=np.int64)
+    if state.semantic_index is None or start == 0:
+        state.semantic_index = new_vector_index()
+        state.passage_doc_ids = new_doc_ids[:0]
+        state.passage_spans = new_spans[:0]
+    state.semantic_index.add(new_embeddings)
+    state.passage_doc_ids = np.concatenate([state.passage_doc_ids, new_doc_ids])
+    state.passage_spans = np.vstack([state.passage_spans, new_spans])
+
+def new_vector_index():
+    """Create an empty vector index using the configured backend"""
+    storage = CONFIG.get('vector_storage', 'float32')
+    if CONFIG.get('vector_index') == 'ivf':
+        return build_vector_index(backend='ivf', n_lists=CONFIG.get('ivf_lists', 0),
+                                  n_probe=CONFIG.get('ivf_probe', 8), storage=storage)
+    return build_vector_index(backend='exact', storage=storage)
+
+def embedded_document_count(state=None):
+    """Number of leading documents that already have passage embeddings"""
+    state = state or index_state
+    if state.semantic_index is None or len(state.passage_doc_ids) == 0:
+        return 0
+    return int(state.passage_doc_ids[-1]) + 1
+
+def embed_missing_documents():
+    """Embed documents indexed before the semantic model was loaded, as an index
+    update (one at a time, across server workers). Returns True if any documents
+    were embedded by this process.
+    """
+    if not _embedding_lock.acquire(blocking=False):
+        return False
     try:
-        if os.path.exists(CACHE_FILE):
-            print("Loading documents from cache...")
-            with open(CACHE_FILE, 'rb') as f:
-                cache_data = pickle.load(f)
-                documents = cache_data['documents']
-                doc_names = cache_data['doc_names']
-                doc_images = cache_data.get('doc_images', [[] for _ in documents])
-                doc_metadata = cache_data.get('doc_metadata', [{} for _ in documents])
-                processed_docs = cache_data.get('processed_docs', [])
-                tfidf_vectorizer = cache_data['tfidf_vectorizer']
-                tfidf_matrix = cache_data['tfidf_matrix']
-                bm25_model = cache_data.get('bm25_model')
-                semantic_embeddings = cache_data.get('semantic_embeddings')
-            print(f"Loaded {len(documents)} documents from cache!")
-            return True
+        if embedded_document_count() == len(index_state.documents):
+            return False
+        # One worker embeds and saves; the others wait here and open its generation
+        with index_update_lock():
+            refresh_index()
+            if embedded_document_count() == len(index_state.documents):
+                return False
+            with updating_index() as state:
+                print("Building semantic embeddings...")
+                start = embedded_document_count(state)
+                embed_documents(state, start)
+                save_to_cache(state)
+        return True
     except Exception as e:
-        print(f"Error loading cache: {e}")
-    return False
+        print(f"  ⚠ Semantic embeddings failed: {e}")
+        return False
+    finally:
+        _embedding_lock.release()
+
+def add_documents(entries, state=None):
+    """Append (rel_path, text, image_refs, metadata) entries, tokenizing and embedding only them"""
+    if not entries:
+        return
+
+    with updating_index(state) as state:
+        if state.bm25_model is None:
+            state.bm25_model = BM25Index()
+
+        new_texts = []
+        for rel_path, text, images, metadata in entries:
+            state.documents.append(text)
+            state.doc_names.append(rel_path)
+            state.doc_images.append(images)
+            state.doc_metadata.append(metadata)
+            new_texts.append(text)
+        # The only tokenization pass: TF-IDF is derived from the BM25 term counts
+        state.bm25_model.add_documents(text_analyzer().analyze_many(new_texts))
+        state.snippet_index.add_documents(new_texts)
 
-def save_to_cache():
-    """Save documents to cache"""
+        if SEMANTIC_AVAILABLE and SEMANTIC_MODEL is not None:
+            try:
+                start = len(state.documents) - len(new_texts)
+                if embedded_document_count(state) != start:
+                    # No usable embeddings yet, encode the whole collection once
+                    start = 0
+                embed_documents(state, start)
+            except Exception as e:
+                print(f"  ⚠ Semantic embeddings failed: {e}")
+                state.semantic_index = None
+
+def build_tfidf_index(bm25_model):
+    """Build the TF-IDF vectorizer and matrix from the term counts held by the
+    BM25 postings, so documents are tokenized once for both lexical indices.
+    Mirrors TfidfVectorizer.fit_transform over those counts, keeping every term
+    within the tfidf_min_df/tfidf_max_df document frequency bounds. The matrix
+    rows are L2-normalized float32.
+    """
+    counts = bm25_model.count_matrix()
+    num_docs = counts.shape[0]
+    all_terms = bm25_model.terms()
+
+    # Document frequencies are the posting list lengths. Terms of removed
+    # documents stay in the BM25 vocabulary with no postings
+    doc_freqs = np.diff(bm25_model.indptr)
+    min_df, max_df = CONFIG.get('tfidf_min_df', 1), CONFIG.get('tfidf_max_df', 1.0)
+    min_docs = min_df * num_docs if isinstance(min_df, float) else min_df
+    max_docs = max_df * num_docs if isinstance(max_df, float) else max_df
+    keep = (doc_freqs > 0) & (doc_freqs >= min_docs) & (doc_freqs <= max_docs)
+    columns = np.array(sorted(np.flatnonzero(keep), key=all_terms.__getitem__), dtype=np.int64)
+
+    max_features = CONFIG.get('tfidf_max_features', 0)
+    if max_features and len(columns) > max_features:
+        # Keep the most frequent terms across the corpus, like max_features does
+        totals = np.asarray(counts[:, columns].sum(axis=0)).ravel()
+        keep = np.sort(np.argsort(-totals, kind='stable')[:max_features])
+        columns = columns[keep]
+    terms = [all_terms[i] for i in columns]
+    count_matrix = counts[:, columns].astype(np.float32)
+
+    transformer = TfidfTransformer().fit(count_matrix)
+    return make_tfidf_vectorizer(terms, transformer.idf_), transformer.transform(count_matrix)
+
+def make_tfidf_vectorizer(terms, idf):
+    """A ready-to-use TfidfVectorizer for a fixed vocabulary (terms in column order) and idf.
+    Queries are analyzed like the documents (text_analyzer).
+    """
+    vectorizer = TfidfVectorizer(analyzer=preprocess_text_advanced, vocabulary={term: i for i, term in enumerate(terms)},
+                                 dtype=np.float32)
+    vectorizer.idf_ = np.asarray(idf)
+    return vectorizer
+
+def rebuild_lexical_indices(state=None):
+    """Recompute corpus-level TF-IDF statistics from the term counts of the BM25 index,
+    and the query expansion table.
+    (The BM25 index is patched in place by add_documents/remove_documents.)
+    """
+    with updating_index(state) as state:
+        if state.documents:
+            ensure_bm25_model(state)
+            state.tfidf_vectorizer, state.tfidf_matrix = build_tfidf_index(state.bm25_model)
+            build_expansions(state)
+        else:
+            state.tfidf_vectorizer = None
+            state.tfidf_matrix = None
+            state.expansion_table = ExpansionTable()
+        build_filter_index(state)
+
+def open_index():
+    """Open the on-disk index as an IndexState, or return None if there is none
+    (or it is outdated). Arrays are memory-mapped and document texts/images are
+    decoded on access, so this returns almost immediately regardless of collection
+    size, and server workers share the mapped pages.
+    """
+    global _seen_generation
+
+    if not os.path.exists(os.path.join(INDEX_DIR, CURRENT_FILE)):
+        return None
     try:
-        print("Saving documents to cache...")
-        cache_data = {
-            'documents': documents,
-            'doc_names': doc_names,
-            'doc_images': doc_images,
-            'doc_metadata': doc_metadata,
-            'processed_docs': processed_docs,
-            'tfidf_vectorizer': tfidf_vectorizer,
-            'tfidf_matrix': tfidf_matrix,
-            'bm25_model': bm25_model,
-            'semantic_embeddings': semantic_embeddings
-        }
-        with open(CACHE_FILE, 'wb') as f:
-            pickle.dump(cache_data, f)
-        print("Cache saved successfully!")
+        print("Opening document index...")
+        started = time.time()
+        reader = IndexReader(INDEX_DIR)
+        if reader.meta.get('version') != CACHE_VERSION:
+            print("Index format is outdated, rebuilding...")
+            return None
+
+        state = IndexState()
+        state.documents = reader.strings('documents')
+        state.doc_names = list(reader.strings('doc_names'))
+        state.doc_images = reader.json_list('doc_images')
+        state.doc_metadata = reader.meta['doc_metadata']
+        if 'tfidf_matrix' in reader:
+            state.tfidf_vectorizer = make_tfidf_vectorizer(list(reader.strings('tfidf_vocabulary')),
+                                                           reader.array('tfidf_idf'))
+            state.tfidf_matrix = reader.sparse('tfidf_matrix')
+        if 'bm25' in reader.meta:
+            state.bm25_model = read_object(reader, 'bm25', [BM25Index])
+            state.bm25_model.vocabulary = {term: i for i, term in enumerate(reader.strings('bm25.vocabulary'))}
+        if 'expansions' in reader:
+            state.expansion_table = ExpansionTable({term: tuple(terms) for term, terms in reader.json_list('expansions')})
+        if 'synonyms' in reader and reader.meta.get('expansion_synsets') == CONFIG.get('expansion_synsets', 2):
+            state.synonyms = reader.json_list('synonyms')  # Decoded only when expansions are rebuilt
+        state.snippet_index = read_object(reader, 'snippets', [SnippetIndex])
+        state.snippet_index.vocabulary = {term: i for i, term in enumerate(reader.strings('snippets.vocabulary'))}
+        if 'semantic_index' in reader.meta:
+            state.semantic_index = read_object(reader, 'semantic_index', [ExactIndex, IVFIndex])
+            if isinstance(state.semantic_index, IVFIndex):
+                state.semantic_index.n_probe = CONFIG.get('ivf_probe', state.semantic_index.n_probe)
+        state.passage_doc_ids = reader.array('passage_doc_ids')
+        state.passage_spans = reader.array('passage_spans')
+        state.file_manifest = reader.meta['file_manifest']
+        build_filter_index(state)
+        _seen_generation = reader.generation
+        print(f"Opened {len(state.documents)} documents from {reader.generation} in {time.time() - started:.2f}s")
+        return state
     except Exception as e:
-        print(f"Error saving cache: {e}")
+        print(f"Error loading index: {e}")
+    return None
+
+def load_from_cache():
+    """Open the on-disk index and publish it; returns False if there is none"""
+    with _update_lock:
+        state = open_index()
+        if state is None:
+            return False
+        publish_index(state)
+        return True
+
+def refresh_index():
+    """Publish the on-disk index if another process (server worker) saved a new
+    generation since this one last opened or saved it. Returns True if it did.
+    """
+    with _update_lock:
+        generation = current_generation(INDEX_DIR)
+        if generation is None or generation == _seen_generation:
+            return False
+        return load_from_cache()
+
+def watch_index(interval):
+    """Check for generations saved by other processes every interval seconds, in a
+    background thread, so the swap never happens on the request path
+    """
+    def watch():
+        while True:
+            time.sleep(interval)
+            try:
+                refresh_index()
+            except Exception as e:
+                print(f"Error refreshing index: {e}")
+
+    threading.Thread(target=watch, name='index-watcher', daemon=True).start()
+
+def save_to_cache(state=None):
+    """Write the index as a new generation in INDEX_DIR"""
+    global _seen_generation
+
+    state = state or index_state
+    try:
+        print("Saving document index...")
+        writer = IndexWriter(INDEX_DIR)
+        writer.set('version', CACHE_VERSION)
+        writer.set('doc_metadata', list(state.doc_metadata))
+        writer.set('file_manifest', state.file_manifest)
+        writer.add_strings('documents', state.documents)
+        writer.add_strings('doc_names', state.doc_names)
+        writer.add_json_list('doc_images', state.doc_images)
+        if state.tfidf_matrix is not None:
+            vocabulary = state.tfidf_vectorizer.vocabulary
+            writer.add_strings('tfidf_vocabulary', sorted(vocabulary, key=vocabulary.get))
+            writer.add_array('tfidf_idf', state.tfidf_vectorizer.idf_)
+            writer.add_sparse('tfidf_matrix', state.tfidf_matrix)
+        if state.bm25_model is not None:
+            write_object(writer, 'bm25', state.bm25_model)
+            writer.add_strings('bm25.vocabulary', state.bm25_model.vocabulary)
+        writer.add_json_list('expansions', sorted(state.expansion_table.expansions.items()))
+        # WordNet lookups of the collection's words, so the next rebuild (in any
+        # process) only looks up new words
+        seed_synonyms(state)
+        writer.set('expansion_synsets', CONFIG.get('expansion_synsets', 2))
+        writer.add_json_list('synonyms', sorted((word, _synonyms[word]) for word in state.snippet_index.vocabulary
+                                                if word in _synonyms))
+        write_object(writer, 'snippets', state.snippet_index)
+        writer.add_strings('snippets.vocabulary', state.snippet_index.vocabulary)
+        if state.semantic_index is not None:
+            write_object(writer, 'semantic_index', state.semantic_index)
+        writer.add_array('passage_doc_ids', state.passage_doc_ids)
+        writer.add_array('passage_spans', state.passage_spans)
+        writer.commit()
+        _seen_generation = writer.generation
+        print(f"Index saved ({writer.generation})!")
+    except Exception as e:
+        print(f"Error saving index: {e}")
+
+def no_progress(stage=None, done=None, total=None, error=None):
+    pass
+
+def load_documents(force_reload=False, progress=no_progress):
+    """Load all documents from the data/docs folder and subfolders.
+    Only files added, changed or deleted since the last run are processed;
+    force_reload discards the cache and rebuilds everything.
+    The update is built on a copy of the index and published when complete.
+    progress (e.g. Job.update) is told the current stage, files extracted and errors.
+    """
+    docs_path = DOCS_DIR
 
-def load_documents(force_reload=False):
-    """Load all documents from the data/docs folder and subfolders"""
-    global documents, doc_names, doc_images, tfidf_vectorizer, tfidf_matrix
-    
-    docs_path = os.path.join(BASE_DIR, 'data', 'docs')
-    
     if not os.path.exists(docs_path):
         os.makedirs(docs_path)
         return
-    
-    # Calculate current files hash
-    current_hash = get_files_hash(docs_path)
-    
-    # Check if we can use cache
-    if not force_reload and os.path.exists(HASH_FILE):
-        with open(HASH_FILE, 'r') as f:
-            cached_hash = f.read().strip()
-        
-        if cached_hash == current_hash:
+
+    with index_update_lock():
+        # Continue from the loaded index unless another process saved a newer one
+        loaded = (not force_reload and index_state.file_manifest
+                  and current_generation(INDEX_DIR) in (None, _seen_generation))
+        if loaded:
+            state = index_state.copy()
+        elif force_reload:
+            state = IndexState()
+        else:
+            state = open_index() or IndexState()
+
+        # Compare current files against the manifest
+        print("Scanning for documents...")
+        progress(stage='scanning')
+        new_manifest, to_extract, removed = diff_manifest(state.file_manifest, docs_path)
+
+        if not to_extract and not removed:
             print("No changes detected in documents folder.")
-            if load_from_cache():
+            if new_manifest != state.file_manifest:
+                state.file_manifest = new_manifest
+                save_to_cache(state)
+            elif loaded:
                 return
-            else:
-                print("Cache load failed, reloading documents...")
-    
-    # Load documents from files
-    documents = []
-    doc_names = []
-    doc_images = []
-    
-    print("Scanning for documents...")
-    file_count = 0
-    
-    # Walk through all subdirectories
-    for root, dirs, files in os.walk(docs_path):
-        for filename in files:
-            if not (filename.endswith('.pdf') or filename.endswith('.txt')):
-                continue
-                
-            file_count += 1
-            file_path = os.path.join(root, filename)
-            
-            # Get relative path for display
-            rel_path = os.path.relpath(file_path, docs_path)
-            
-            print(f"[{file_count}] {rel_path[:60]}{'...' if len(rel_path) > 60 else ''}")
-            
-            try:
-                if filename.endswith('.pdf'):
-                    text = extract_text_from_pdf(file_path)
-                    if not text or len(text.strip()) < 50:
-                        # Skip PDFs with no extractable text
-                        continue
-                    images = extract_images_from_pdf(file_path)
-                elif filename.endswith('.txt'):
-                    text = extract_text_from_txt(file_path)
-                    images = []
-                else:
-                    continue
-                
-                if text.strip():
-                    documents.append(text)
-                    doc_names.append(rel_path)
-                    doc_images.append(images)
-            except Exception as e:
-                print(f"  ⚠ Error loading: {e}")
-    
-    print(f"\nSuccessfully loaded {len(documents)} documents!")
-    
-    if documents:
-        print("Building search indices...")
-        
-        # Build TF-IDF index
-        print("  - TF-IDF...")
-        tfidf_vectorizer = TfidfVectorizer(stop_words='english', max_features=CONFIG.get('tfidf_max_features', 1000))
-        tfidf_matrix = tfidf_vectorizer.fit_transform(documents)
-        
-        # Build BM25 index
-        print("  - BM25...")
-        processed_docs = [preprocess_text_advanced(doc) for doc in documents]
-        bm25_model = BM25Okapi(processed_docs)
-        
-        # Build semantic embeddings if available
-        if SEMANTIC_AVAILABLE and SEMANTIC_MODEL is not None:
-            print("  - Semantic embeddings...")
-            try:
-                semantic_embeddings = SEMANTIC_MODEL.encode(documents, show_progress_bar=False)
-                print("  ✓ All indices built successfully!")
-            except Exception as e:
-                print(f"  ⚠ Semantic embeddings failed: {e}")
-                semantic_embeddings = None
-        else:
-            print("  ⚠ Semantic search not available")
-            semantic_embeddings = None
-        
-        # Save to cache
-        save_to_cache()
-        
-        # Save current hash
-        with open(HASH_FILE, 'w') as f:
-            f.write(current_hash)
+            publish_index(state)
+            return
+
+        print(f"{len(to_extract)} new/changed and {len(removed)} removed file(s)")
+
+        workers = CONFIG.get('ingest_workers') or default_workers()
+        files = [(rel_path, os.path.join(docs_path, rel_path)) for rel_path in to_extract]
+        print(f"Extracting with {pool_size(len(files), workers)} worker(s)...")
+        progress(stage='extracting', total=len(files))
+
+        entries = []
+        failures = []
+        started = time.time()
+        results = ingest_files(files, workers=workers,
+                               max_pages=CONFIG.get('max_pages_per_pdf', 20),
+                               max_images=CONFIG.get('max_images_per_pdf', 3))
+        for file_count, result in enumerate(results, 1):
+            rel_path = result['rel_path']
+            print(f"[{file_count}/{len(files)}] {rel_path[:60]}{'...' if len(rel_path) > 60 else ''} ({result['seconds']:.2f}s)")
+
+            if result['error']:
+                print(f"  ⚠ Error loading: {result['error']}")
+                failures.append(rel_path)
+                progress(error=f"{rel_path}: {result['error']}")
+            elif result['text'] is not None:
+                entry = new_manifest[rel_path]
+                entries.append((rel_path, result['text'], image_store.add(result['images']),
+                                {'size': entry['size'], 'mtime': entry['mtime']}))
+                entry['indexed'] = True
+            progress(done=file_count)
+
+        print(f"Extracted {len(files)} file(s) in {time.time() - started:.1f}s, {len(failures)} failed")
+        for rel_path in failures:
+            # Retry failed files on the next load
+            del new_manifest[rel_path]
+
+        print("Updating search indices...")
+        progress(stage='indexing')
+        remove_documents(removed, state)
+        add_documents(entries, state)
+        rebuild_lexical_indices(state)
+        state.file_manifest = new_manifest
+
+        print(f"\nSuccessfully loaded {len(state.documents)} documents!")
+
+        # Save to cache, then swap the new index in
+        progress(stage='saving')
+        save_to_cache(state)
         print("Documents cached for faster startup next time!")
+        publish_index(state)
+
+        if removed or force_reload:
+            # Drop images no remaining document refers to. Under the lock no other
+            # worker is adding images for a generation it has not committed yet
+            pruned = image_store.prune(image['id'] for images in state.doc_images for image in images)
+            if pruned:
+                print(f"Removed {pruned} unused image(s)")
 
 def preprocess_text(text):
     """Preprocess text for better matching"""
@@ -406,28 +896,27 @@ def preprocess_text(text):
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
-def extract_summary_and_points(text, query, context_window=200):
-    """Extract clean summary and key bullet points from text"""
-    text_lower = text.lower()
+def extract_summary_and_points(text, query, context_window=200, span=None, positions=None):
+    """Extract clean summary and key bullet points from text.
+    If span=(start, end) is given (e.g. the best matching passage), only that part is used.
+    positions (from snippet_index.positions) locates query words and sentence
+    boundaries from the index; without it the text is scanned.
+    """
+    lo, hi = span if span is not None else (0, len(text))
+    if positions is None:
+        positions = TextPositions(text, lo, hi)
     query_lower = query.lower()
     query_words = [w for w in query_lower.split() if len(w) > 2]
     
-    # Find all occurrences of query words
-    matches = []
-    for word in query_words:
-        pattern = r'\b' + re.escape(word) + r'\w*\b'
-        for match in re.finditer(pattern, text_lower):
-            matches.append((match.start(), match.end(), word))
+    # First occurrences of query words, by position
+    matches = positions.matches(query_words, limit=5)
     
     if not matches:
         # Return first part as summary
-        summary = text[:context_window * 2]
+        summary = text[lo:min(hi, lo + context_window * 2)]
         summary = re.sub(r'\s+', ' ', summary).strip()
         return {'summary': summary[:300] + '...', 'points': []}
     
-    # Sort matches by position
-    matches.sort()
-    
     # Extract snippets around matches
     snippets = []
     seen_ranges = []
@@ -442,18 +931,9 @@ def extract_summary_and_points(text, query, context_window=200):
         if overlaps:
             continue
         
-        # Get context window
-        context_start = max(0, start - context_window)
-        context_end = min(len(text), end + context_window)
-        
-        # Adjust to sentence boundaries
-        while context_start > 0 and text[context_start] not in '.!?\n':
-            context_start -= 1
-        if context_start > 0:
-            context_start += 1
-        
-        while context_end < len(text) and text[context_end] not in '.!?\n':
-            context_end += 1
+        # Get context window, adjusted to sentence boundaries
+        context_start = positions.sentence_start(max(lo, start - context_window))
+        context_end = positions.sentence_end(min(hi, end + context_window))
         
         snippet = text[context_start:context_end].strip()
         
@@ -465,7 +945,7 @@ def extract_summary_and_points(text, query, context_window=200):
         seen_ranges.append((context_start, context_end))
     
     # Create summary from first snippet
-    summary = snippets[0][:300] + '...' if snippets else text[:300] + '...'
+    summary = snippets[0][:300] + '...' if snippets else text[lo:lo + 300] + '...'
     summary = re.sub(r'\s+', ' ', summary).strip()
     
     # Extract bullet points from snippets
@@ -637,274 +1117,421 @@ def extract_key_points(snippet, max_points=5):
     # Prepend bullet markers to match UI style
     return cleaned
 
-def search_tfidf(query, top_k=5, filter_files=None):
-    """Search using TF-IDF"""
-    if not documents:
-        return []
+def build_filter_index(state):
+    """Rebuild the file/folder filter index for the documents of state"""
+    state.filter_index = FilterIndex(state.doc_names)
+
+def filter_mask(filter_files, state=None):
+    """Boolean mask of documents matching any filter (exact file or folder prefix),
+    or None when no filter is given
+    """
+    if not filter_files:
+        return None
+    state = state or index_state
+    if state.filter_index.num_docs != len(state.doc_names):
+        build_filter_index(state)
+    return state.filter_index.mask(filter_files)
+
+def tfidf_query_vectors(queries, state):
+    """TF-IDF vectors of queries (CSR, one L2-normalized float32 row each), weighted
+    like TfidfVectorizer.transform with expansion terms counted fractionally
+    """
+    vocabulary, idf = state.tfidf_vectorizer.vocabulary, state.tfidf_vectorizer.idf_
+    rows, cols, values = [], [], []
+    for row, query in enumerate(queries):
+        for term, weight in zip(*analyze_query(query, state)):
+            col = vocabulary.get(term)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+                values.append(weight * idf[col])
+    vectors = csr_matrix((values, (rows, cols)), shape=(len(queries), len(vocabulary)), dtype=np.float32)
+    return l2_normalize(vectors)
+
+def score_tfidf(query, mask=None, state=None):
+    """TF-IDF cosine similarity of the query against every document
+    (only the documents in mask are scored when a mask is given)
+    """
+    state = state or index_state
+    tfidf_matrix = state.tfidf_matrix
+    # Rows and query are already L2-normalized (float32), so cosine is one
+    # sparse matrix x dense vector product
+    query_vec = tfidf_query_vectors([query], state).toarray().ravel()
+    if mask is None:
+        return tfidf_matrix @ query_vec
+    doc_ids = np.flatnonzero(mask)
+    scores = np.zeros(tfidf_matrix.shape[0], dtype=np.float32)
+    scores[doc_ids] = tfidf_matrix[doc_ids] @ query_vec
+    return scores
+
+def score_tfidf_many(queries, state=None):
+    """TF-IDF cosine similarity of every query against every document
+    (queries x documents array), computed with one sparse product
+    """
+    state = state or index_state
+    return (tfidf_query_vectors(queries, state) @ state.tfidf_matrix.T).toarray()
+
+def ensure_bm25_model(state):
+    """Build the BM25 model of state if it is missing or out of date"""
+    if state.bm25_model is None or state.bm25_model.corpus_size != len(state.documents):
+        print("DEBUG: Building BM25 model...")
+        state.bm25_model = BM25Index(text_analyzer().analyze_many(state.documents))
+        print(f"DEBUG: BM25 model built with {state.bm25_model.corpus_size} docs")
+
+def score_bm25(query, state=None):
+    """Raw BM25 score of every document"""
+    state = state or index_state
+    ensure_bm25_model(state)
     
-    query_vec = tfidf_vectorizer.transform([query])
-    similarities = cosine_similarity(query_vec, tfidf_matrix).flatten()
+    # Preprocess (and expand) query
+    query_tokens, weights = analyze_query(query, state)
+    print(f"DEBUG: Query tokens: {query_tokens[:10]}")  # First 10 tokens
     
-    # Apply file filtering if specified
-    if filter_files:
-        filtered_indices = []
-        for i, doc_name in enumerate(doc_names):
-            # Check if document matches any filter
-            for filter_item in filter_files:
-                # Match exact file or files in folder
-                if doc_name == filter_item or doc_name.startswith(filter_item + '\\') or doc_name.startswith(filter_item + '/'):
-                    filtered_indices.append(i)
-                    break
-        
-        # Filter similarities to only include matching documents
-        if filtered_indices:
-            filtered_similarities = np.zeros_like(similarities)
-            filtered_similarities[filtered_indices] = similarities[filtered_indices]
-            similarities = filtered_similarities
+    # Get BM25 scores (only touches the postings of the query terms)
+    return state.bm25_model.get_scores(query_tokens, weights)
+
+def score_bm25_many(queries, state=None):
+    """Raw BM25 scores of every query against every document (queries x documents array)"""
+    state = state or index_state
+    ensure_bm25_model(state)
+    analyzed = [analyze_query(query, state) for query in queries]
+    return state.bm25_model.get_scores_many([terms for terms, _ in analyzed], [weights for _, weights in analyzed])
+
+def semantic_ready(state):
+    """Whether state can be searched semantically (model loaded, every document embedded)"""
+    if load_semantic_model() is None:
+        return False
+    if embedded_document_count(state) != len(state.documents):
+        # Documents indexed before the model was loaded are embedded in the background
+        threading.Thread(target=embed_missing_documents, name='embed', daemon=True).start()
+        return False
+    return True
+
+def score_semantic(query, state=None):
+    """Semantic similarity of every document (its aggregated passage scores).
+    Returns (scores, best_passage), or None if the semantic model or the
+    document embeddings are unavailable.
+    """
+    state = state or index_state
+    if not semantic_ready(state):
+        return None
     
-    # Get top-k results
-    top_indices = np.argsort(similarities)[::-1][:top_k]
+    # Encode query
+    query_embedding = embed_query(query)
     
-    results = []
-    for idx in top_indices:
-        if similarities[idx] > 0:  # Only return if there's some similarity
-            # Extract structured content
-            content = extract_summary_and_points(documents[idx], query)
-            
-            # Get file metadata
-            file_path = os.path.join(BASE_DIR, 'data', 'docs', doc_names[idx])
-            file_type = 'PDF' if doc_names[idx].endswith('.pdf') else 'TXT'
-            folder = os.path.dirname(doc_names[idx]) or 'Root'
-            
-            # Get file stats if available
-            file_size = ''
-            modified_date = ''
-            if os.path.exists(file_path):
-                try:
-                    stat = os.stat(file_path)
-                    file_size = f"{stat.st_size / 1024:.1f} KB"
-                    modified_date = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d')
-                except:
-                    pass
-            
-            results.append({
-                'filename': doc_names[idx],
-                'score': float(similarities[idx]),
-                'summary': content['summary'],
-                'key_points': content['points'],
-                'images': doc_images[idx] if idx < len(doc_images) else [],
-                'file_type': file_type,
-                'folder': folder,
-                'file_size': file_size,
-                'modified_date': modified_date,
-                'method': 'tfidf'
-            })
+    # Retrieve the nearest passages, then aggregate per document
+    passage_ids, passage_scores = state.semantic_index.search(query_embedding, CONFIG.get('semantic_candidates', 1000))
+    return aggregate_passage_scores(passage_ids, passage_scores, len(state.documents), state)
+
+def score_semantic_many(queries, state=None):
+    """score_semantic for many queries: one model call encodes them all and one
+    matrix product scores them. Returns a list of (scores, best_passage), or None.
+    """
+    state = state or index_state
+    if not semantic_ready(state):
+        return None
+    matches = state.semantic_index.search_many(embed_queries(queries), CONFIG.get('semantic_candidates', 1000))
+    return [aggregate_passage_scores(passage_ids, passage_scores, len(state.documents), state)
+            for passage_ids, passage_scores in matches]
+
+def select_hits(scores, top_k, mask=None, keep_zero=False, offset=0, min_score=None):
+    """Scoring stage: (doc_ids, scores) of hits offset..offset+top_k, best first.
+    Only positive scores qualify (non-negative with keep_zero), at least min_score
+    if given, and only documents in mask if one is given. Uses a partial sort;
+    equal scores are ordered by document index.
+    """
+    candidates = scores >= 0 if keep_zero else scores > 0
+    if min_score is not None:
+        candidates &= scores >= min_score
+    if mask is not None:
+        candidates &= mask
+    doc_ids = np.flatnonzero(candidates)
+    doc_ids = doc_ids[top_k_ids(scores[doc_ids], offset + top_k)][offset:]
+    return doc_ids, scores[doc_ids]
+
+def iter_hits(doc_ids, scores, query, method, spans=None, state=None):
+    """Materialization stage, one result dict at a time (used for streaming)"""
+    state = state or index_state
+    for i, (idx, score) in enumerate(zip(doc_ids, scores)):
+        yield build_result(idx, query, score, method, span=spans[i] if spans is not None else None, state=state)
+
+def materialize_hits(doc_ids, scores, query, method, spans=None, state=None):
+    """Materialization stage: result dicts for the given hits only"""
+    return list(iter_hits(doc_ids, scores, query, method, spans, state))
+
+def build_result(idx, query, score, method, span=None, state=None):
+    """Result dict (snippet, images and file metadata) for document idx.
+    File size and date come from doc_metadata, so no filesystem access happens here.
+    """
+    state = state or index_state
+    doc_names, doc_images, doc_metadata = state.doc_names, state.doc_images, state.doc_metadata
+    text = state.documents[idx]
+    content = extract_summary_and_points(text, query, span=span,
+                                         positions=state.snippet_index.positions(idx, text, span))
+    file_type = 'PDF' if doc_names[idx].endswith('.pdf') else 'TXT'
+    folder = os.path.dirname(doc_names[idx]) or 'Root'
+    
+    metadata = doc_metadata[idx] if idx < len(doc_metadata) else {}
+    file_size = f"{metadata['size'] / 1024:.1f} KB" if 'size' in metadata else ''
+    modified_date = datetime.fromtimestamp(metadata['mtime']).strftime('%Y-%m-%d') if 'mtime' in metadata else ''
+    
+    return {
+        'filename': doc_names[idx],
+        'score': float(score),
+        'summary': content['summary'],
+        'key_points': content['points'],
+        'images': doc_images[idx] if idx < len(doc_images) else [],
+        'file_type': file_type,
+        'folder': folder,
+        'file_size': file_size,
+        'modified_date': modified_date,
+        'method': method
+    }
+
+def search_tfidf(query, top_k=5, filter_files=None, offset=0, min_score=None, stream=False, state=None):
+    """Search using TF-IDF.
+    With stream=True (all search_* functions) results are returned as an iterator
+    that builds each result when it is requested. All search_* functions search
+    state (default: the published index) from start to finish.
+    """
+    state = state or index_state
+    if not state.documents:
+        return []
     
-    return results
+    mask = filter_mask(filter_files, state)
+    doc_ids, scores = select_hits(score_tfidf(query, mask, state), top_k, mask, offset=offset, min_score=min_score)
+    hits = iter_hits(doc_ids, scores, query, 'tfidf', state=state)
+    return hits if stream else list(hits)
 
-def search_bm25(query, top_k=5, filter_files=None):
+def scale_bm25(scores, mask=None):
+    """Normalize BM25 scores relative to the best matching document (in mask)"""
+    max_score = scores.max() if mask is None else scores[mask].max(initial=0)
+    return scores / max_score if max_score > 0 else scores
+
+def search_bm25(query, top_k=5, filter_files=None, offset=0, min_score=None, stream=False, state=None):
     """Search using BM25 algorithm"""
-    global bm25_model, processed_docs
-    
-    if not documents:
+    state = state or index_state
+    if not state.documents:
         print("DEBUG: No documents loaded")
         return []
     
-    # Build BM25 model if not exists
-    if bm25_model is None or not processed_docs:
-        print("DEBUG: Building BM25 model...")
-        processed_docs = [preprocess_text_advanced(doc) for doc in documents]
-        bm25_model = BM25Okapi(processed_docs)
-        print(f"DEBUG: BM25 model built with {len(processed_docs)} docs")
-    
-    # Preprocess query
-    query_tokens = preprocess_text_advanced(query)
-    print(f"DEBUG: Query tokens: {query_tokens[:10]}")  # First 10 tokens
-    
-    # Get BM25 scores
-    scores = bm25_model.get_scores(query_tokens)
-    print(f"DEBUG: Score range: {scores.min():.4f} to {scores.max():.4f}")
-    print(f"DEBUG: Top 5 scores: {sorted(scores, reverse=True)[:5]}")
-    
-    # Get BM25 scores
-    scores = bm25_model.get_scores(query_tokens)
-    
-    # Apply filtering
-    if filter_files:
-        filtered_scores = np.zeros_like(scores)
-        for i, doc_name in enumerate(doc_names):
-            for filter_item in filter_files:
-                if doc_name == filter_item or doc_name.startswith(filter_item + '\\') or doc_name.startswith(filter_item + '/'):
-                    filtered_scores[i] = scores[i]
-                    break
-        scores = filtered_scores
-    
-    # Get top-k indices
-    top_indices = np.argsort(scores)[::-1][:top_k]
-    
-    results = []
-    max_score = scores[top_indices[0]] if len(top_indices) > 0 and scores[top_indices[0]] > 0 else 1.0
+    mask = filter_mask(filter_files, state)
+    scores = scale_bm25(score_bm25(query, state), mask)
     
-    for idx in top_indices:
-        # Include results even with very low scores for BM25
-        if scores[idx] >= 0:
-            content = extract_summary_and_points(documents[idx], query)
-            file_path = os.path.join(BASE_DIR, 'data', 'docs', doc_names[idx])
-            file_type = 'PDF' if doc_names[idx].endswith('.pdf') else 'TXT'
-            folder = os.path.dirname(doc_names[idx]) or 'Root'
-            
-            file_size = ''
-            modified_date = ''
-            if os.path.exists(file_path):
-                try:
-                    stat = os.stat(file_path)
-                    file_size = f"{stat.st_size / 1024:.1f} KB"
-                    modified_date = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d')
-                except:
-                    pass
-            
-            # Normalize BM25 score relative to max
-            normalized_score = float(scores[idx] / max_score) if max_score > 0 else 0.0
-            
-            results.append({
-                'filename': doc_names[idx],
-                'score': float(normalized_score),
-                'summary': content['summary'],
-                'key_points': content['points'],
-                'images': doc_images[idx] if idx < len(doc_images) else [],
-                'file_type': file_type,
-                'folder': folder,
-                'file_size': file_size,
-                'modified_date': modified_date,
-                'method': 'bm25'
-            })
-    
-    return results
+    # Include results even with very low scores for BM25
+    doc_ids, scores = select_hits(scores, top_k, mask, keep_zero=True, offset=offset, min_score=min_score)
+    hits = iter_hits(doc_ids, scores, query, 'bm25', state=state)
+    return hits if stream else list(hits)
 
-def search_semantic(query, top_k=5, filter_files=None):
-    """Search using semantic similarity with sentence embeddings"""
-    global semantic_embeddings, SEMANTIC_MODEL
-    
-    if not SEMANTIC_AVAILABLE or SEMANTIC_MODEL is None:
-        return search_tfidf(query, top_k, filter_files)
+def aggregate_passage_scores(passage_ids, passage_scores, num_docs, state=None):
+    """Turn scores of retrieved passages into document scores (max or mean of the top-n passages).
+    Returns (doc_scores, best_passage) where best_passage[d] is the index of
+    document d's highest scoring passage, or -1 if none was retrieved.
+    """
+    doc_scores = np.zeros(num_docs)
+    best_passage = np.full(num_docs, -1, dtype=np.int64)
+    if len(passage_ids) == 0:
+        return doc_scores, best_passage
+    
+    # Group passages by document, best passage first within each group
+    passage_docs = (state or index_state).passage_doc_ids[passage_ids]
+    order = np.lexsort((-passage_scores, passage_docs))
+    sorted_docs = passage_docs[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_docs[1:] != sorted_docs[:-1]])
+    docs = sorted_docs[group_starts]
+    best_passage[docs] = passage_ids[order[group_starts]]
+    
+    if CONFIG.get('semantic_aggregation') == 'mean_top_n':
+        top_n = max(1, CONFIG.get('semantic_top_n', 3))
+        group_sizes = np.diff(np.r_[group_starts, len(order)])
+        rank_in_group = np.arange(len(order)) - np.repeat(group_starts, group_sizes)
+        top = rank_in_group < top_n
+        sums = np.bincount(sorted_docs[top], weights=passage_scores[order][top], minlength=num_docs)
+        counts = np.bincount(sorted_docs[top], minlength=num_docs)
+        doc_scores[docs] = sums[docs] / counts[docs]
+    else:
+        doc_scores[docs] = passage_scores[order[group_starts]]
     
-    if not documents:
+    return doc_scores, best_passage
+
+def search_semantic(query, top_k=5, filter_files=None, offset=0, min_score=None, stream=False, state=None):
+    """Search using semantic similarity with passage-level sentence embeddings"""
+    state = state or index_state
+    if not state.documents:
         return []
     
-    # Build embeddings if not exists
-    if semantic_embeddings is None:
-        print("Building semantic embeddings...")
-        semantic_embeddings = SEMANTIC_MODEL.encode(documents, show_progress_bar=False)
-    
-    # Encode query
-    query_embedding = SEMANTIC_MODEL.encode([query])[0]
-    
-    # Calculate cosine similarities
-    similarities = cosine_similarity([query_embedding], semantic_embeddings).flatten()
-    
-    # Apply filtering
-    if filter_files:
-        filtered_similarities = np.zeros_like(similarities)
-        for i, doc_name in enumerate(doc_names):
-            for filter_item in filter_files:
-                if doc_name == filter_item or doc_name.startswith(filter_item + '\\') or doc_name.startswith(filter_item + '/'):
-                    filtered_similarities[i] = similarities[i]
-                    break
-        similarities = filtered_similarities
-    
-    # Get top-k results
-    top_indices = np.argsort(similarities)[::-1][:top_k]
-    
-    results = []
-    for idx in top_indices:
-        if similarities[idx] > 0:
-            content = extract_summary_and_points(documents[idx], query)
-            file_path = os.path.join(BASE_DIR, 'data', 'docs', doc_names[idx])
-            file_type = 'PDF' if doc_names[idx].endswith('.pdf') else 'TXT'
-            folder = os.path.dirname(doc_names[idx]) or 'Root'
-            
-            file_size = ''
-            modified_date = ''
-            if os.path.exists(file_path):
-                try:
-                    stat = os.stat(file_path)
-                    file_size = f"{stat.st_size / 1024:.1f} KB"
-                    modified_date = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d')
-                except:
-                    pass
-            
-            results.append({
-                'filename': doc_names[idx],
-                'score': float(similarities[idx]),
-                'summary': content['summary'],
-                'key_points': content['points'],
-                'images': doc_images[idx] if idx < len(doc_images) else [],
-                'file_type': file_type,
-                'folder': folder,
-                'file_size': file_size,
-                'modified_date': modified_date,
-                'method': 'semantic'
-            })
-    
-    return results
+    semantic = score_semantic(query, state)
+    if semantic is None:
+        return search_tfidf(query, top_k, filter_files, offset, min_score, stream, state)
+    similarities, best_passage = semantic
+    
+    doc_ids, scores = select_hits(similarities, top_k, filter_mask(filter_files, state), offset=offset, min_score=min_score)
+    # Snippets come from the best matching passage rather than the whole text
+    passage_spans = state.passage_spans
+    spans = [passage_spans[best_passage[idx]] if best_passage[idx] >= 0 else None for idx in doc_ids]
+    hits = iter_hits(doc_ids, scores, query, 'semantic', spans, state)
+    return hits if stream else list(hits)
 
-def search_hybrid(query, top_k=5, alpha=0.5, filter_files=None):
-    """Advanced hybrid search combining TF-IDF, BM25, and Semantic"""
-    if not documents:
+def hybrid_weights(alpha=None):
+    """Fusion weights per method: the configured hybrid_weights, or if alpha is
+    given, alpha split evenly over TF-IDF and BM25 and 1 - alpha for semantic
+    """
+    if alpha is not None:
+        return {'tfidf': alpha / 2, 'bm25': alpha / 2, 'semantic': 1 - alpha}
+    return dict({'tfidf': 0.3, 'bm25': 0.35, 'semantic': 0.35}, **CONFIG.get('hybrid_weights', {}))
+
+def reciprocal_ranks(scores, k=60):
+    """1 / (k + rank) for every document with a positive score (rank starts at 1), else 0"""
+    order = np.argsort(-scores, kind='stable')
+    positive = order[scores[order] > 0]
+    fused = np.zeros(len(scores))
+    fused[positive] = 1.0 / (k + np.arange(1, len(positive) + 1))
+    return fused
+
+def search_hybrid(query, top_k=5, alpha=None, filter_files=None, offset=0, min_score=None, stream=False, state=None):
+    """Advanced hybrid search combining TF-IDF, BM25, and Semantic.
+    Fuses the full score vectors of every method (weighted sum, or Reciprocal Rank
+    Fusion when hybrid_fusion is 'rrf') and only builds result dicts for the final top_k.
+    """
+    state = state or index_state
+    if not state.documents:
         return []
     
-    # Get results from all methods
-    tfidf_results = search_tfidf(query, top_k=top_k*2, filter_files=filter_files)
-    bm25_results = search_bm25(query, top_k=top_k*2, filter_files=filter_files)
-    semantic_results = search_semantic(query, top_k=top_k*2, filter_files=filter_files)
-    
-    # Combine scores using weighted average
-    combined_scores = {}
-    
-    # TF-IDF scores (30% weight)
-    for result in tfidf_results:
-        filename = result['filename']
-        if filename not in combined_scores:
-            combined_scores[filename] = {'score': 0, 'result': result, 'methods': {}}
-        combined_scores[filename]['score'] += result['score'] * 0.3
-        combined_scores[filename]['methods']['tfidf'] = result['score']
-    
-    # BM25 scores (35% weight)
-    for result in bm25_results:
-        filename = result['filename']
-        if filename not in combined_scores:
-            combined_scores[filename] = {'score': 0, 'result': result, 'methods': {}}
-        combined_scores[filename]['score'] += result['score'] * 0.35
-        combined_scores[filename]['methods']['bm25'] = result['score']
-    
-    # Semantic scores (35% weight)
-    for result in semantic_results:
-        filename = result['filename']
-        if filename not in combined_scores:
-            combined_scores[filename] = {'score': 0, 'result': result, 'methods': {}}
-        combined_scores[filename]['score'] += result['score'] * 0.35
-        combined_scores[filename]['methods']['semantic'] = result['score']
-    
-    # Sort by combined score
-    sorted_results = sorted(combined_scores.items(), key=lambda x: x[1]['score'], reverse=True)
-    
-    # Format results with score breakdown
-    final_results = []
-    for filename, data in sorted_results[:top_k]:
-        result = data['result'].copy()
-        result['score'] = data['score']
-        result['method'] = 'hybrid'
-        result['tfidf_score'] = data['methods'].get('tfidf', 0)
-        result['bm25_score'] = data['methods'].get('bm25', 0)
-        result['semantic_score'] = data['methods'].get('semantic', 0)
-        final_results.append(result)
-    
-    return final_results
+    mask = filter_mask(filter_files, state)
+    components = {'tfidf': score_tfidf(query, mask, state), 'bm25': score_bm25(query, state)}
+    best_passage = None
+    if semantic_status != 'loading':
+        # While the model warms up, lexical scores are served on their own
+        semantic = score_semantic(query, state)
+        if semantic is not None:
+            components['semantic'], best_passage = semantic
+    
+    doc_ids, scores = select_hits(fuse_scores(components, mask, alpha), top_k, mask, offset=offset, min_score=min_score)
+    results = hybrid_results(doc_ids, scores, components, best_passage, query, state)
+    return results if stream else list(results)
+
+def fuse_scores(components, mask=None, alpha=None):
+    """Hybrid score of every document from the per-method score vectors in
+    components (method -> scores), which are masked and scaled in place
+    """
+    if mask is not None:
+        # Filtered-out documents must not influence the BM25 scaling or RRF ranks
+        for scores in components.values():
+            scores[~mask] = 0
+    
+    # BM25 is unbounded, scale it to [0, 1] by the best matching document
+    max_bm25 = components['bm25'].max()
+    if max_bm25 > 0:
+        components['bm25'] = components['bm25'] / max_bm25
+    
+    weights = hybrid_weights(alpha)
+    fused = np.zeros(len(components['bm25']))
+    for method, scores in components.items():
+        if CONFIG.get('hybrid_fusion') == 'rrf':
+            fused += weights[method] * reciprocal_ranks(scores, CONFIG.get('rrf_k', 60))
+        else:
+            fused += weights[method] * scores
+    return fused
+
+def hybrid_results(doc_ids, scores, components, best_passage, query, state):
+    """Result dicts of hybrid hits (built lazily), with each method's score"""
+    spans = []
+    for idx in doc_ids:
+        span = None
+        if best_passage is not None and best_passage[idx] >= 0 and not (components['tfidf'][idx] or components['bm25'][idx]):
+            # Only a semantic match: take the snippet from the best passage
+            span = state.passage_spans[best_passage[idx]]
+        spans.append(span)
+    
+    for idx, result in zip(doc_ids, iter_hits(doc_ids, scores, query, 'hybrid', spans, state)):
+        for method in ('tfidf', 'bm25', 'semantic'):
+            result[f'{method}_score'] = float(components[method][idx]) if method in components else 0
+        yield result
+
+SEARCH_METHODS = ('tfidf', 'bm25', 'semantic', 'hybrid')
+
+# Score matrix cells per search_batch chunk (about 128 MB of float64 scores)
+BATCH_SCORE_CELLS = 2**24
+
+def search_batch(queries, methods=('hybrid',), top_k=5, filter_files=None, alpha=None, min_score=None,
+                 snippets=True, state=None):
+    """Run every query with every method in one pass.
+    Each method scores a chunk of queries with one matrix product (queries x documents)
+    and the semantic model encodes each chunk in one call, so large batches
+    cost far less than one search_* call per query and method.
+    Results are ranked as by the matching search_* function; with snippets=False
+    they only hold filename, score and method (no snippet extraction).
+    Returns one dict per query, mapping method -> results.
+    """
+    state = state or index_state
+    queries, methods = list(queries), list(dict.fromkeys(methods))
+    unknown = [method for method in methods if method not in SEARCH_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown search method: {', '.join(unknown)}")
+    batch = [{method: [] for method in methods} for _ in queries]
+    if not state.documents or not queries:
+        return batch
+    
+    mask = filter_mask(filter_files, state)
+    use_semantic = (('semantic' in methods or ('hybrid' in methods and semantic_status != 'loading'))
+                    and semantic_ready(state))
+    
+    def hits(doc_ids, scores, query, method, spans=None):
+        if snippets:
+            return materialize_hits(doc_ids, scores, query, method, spans, state)
+        return [{'filename': state.doc_names[idx], 'score': float(score), 'method': method}
+                for idx, score in zip(doc_ids, scores)]
+    
+    # Score in chunks of queries so the queries x documents (and queries x passages)
+    # matrices stay within BATCH_SCORE_CELLS
+    width = len(state.documents)
+    if use_semantic:
+        width = max(width, len(state.semantic_index))
+    chunk_size = max(1, BATCH_SCORE_CELLS // width)
+    for start in range(0, len(queries), chunk_size):
+        chunk = queries[start:start + chunk_size]
+        semantic = score_semantic_many(chunk, state) if use_semantic else None
+        lexical = {'tfidf', 'hybrid'} | ({'semantic'} if semantic is None else set())
+        tfidf = score_tfidf_many(chunk, state) if lexical & set(methods) else None
+        bm25 = score_bm25_many(chunk, state) if {'bm25', 'hybrid'} & set(methods) else None
+        
+        for row, query in enumerate(chunk):
+            results = batch[start + row]
+            best_passage = None
+            if semantic is not None:
+                semantic_scores, best_passage = semantic[row]
+            if 'tfidf' in methods:
+                doc_ids, scores = select_hits(tfidf[row], top_k, mask, min_score=min_score)
+                results['tfidf'] = hits(doc_ids, scores, query, 'tfidf')
+            if 'bm25' in methods:
+                doc_ids, scores = select_hits(scale_bm25(bm25[row], mask), top_k, mask, keep_zero=True,
+                                              min_score=min_score)
+                results['bm25'] = hits(doc_ids, scores, query, 'bm25')
+            if 'semantic' in methods:
+                if semantic is None:
+                    # Same fallback as search_semantic
+                    doc_ids, scores = select_hits(tfidf[row], top_k, mask, min_score=min_score)
+                    results['semantic'] = hits(doc_ids, scores, query, 'tfidf')
+                else:
+                    doc_ids, scores = select_hits(semantic_scores, top_k, mask, min_score=min_score)
+                    spans = [state.passage_spans[best_passage[idx]] if best_passage[idx] >= 0 else None
+                             for idx in doc_ids]
+                    results['semantic'] = hits(doc_ids, scores, query, 'semantic', spans)
+            if 'hybrid' in methods:
+                components = {'tfidf': tfidf[row].copy(), 'bm25': bm25[row].copy()}
+                if semantic is not None:
+                    components['semantic'] = semantic_scores.copy()
+                doc_ids, scores = select_hits(fuse_scores(components, mask, alpha), top_k, mask, min_score=min_score)
+                if snippets:
+                    results['hybrid'] = list(hybrid_results(doc_ids, scores, components, best_passage, query, state))
+                else:
+                    results['hybrid'] = hits(doc_ids, scores, query, 'hybrid')
+    return batch
 
 @app.route('/')
 def index():
     """Render the main page"""
-    return render_template('index.html', doc_count=len(documents))
+    return render_template('index.html', doc_count=len(index_state.documents))
 
 @app.route('/get_files', methods=['GET'])
 def get_files():
@@ -914,7 +1541,7 @@ def get_files():
         folders = set()
         files_list = []
         
-        for doc_name in doc_names:
+        for doc_name in index_state.doc_names:
             # Add to files list
             files_list.append(doc_name)
             
@@ -931,9 +1558,111 @@ def get_files():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def run_search(query, search_type, filter_files=None, top_k=5, offset=0, min_score=None, stream=False, state=None):
+    """Dispatch a query to the search method named by search_type"""
+    if search_type == 'tfidf':
+        return search_tfidf(query, top_k, filter_files, offset, min_score, stream, state)
+    elif search_type == 'bm25':
+        return search_bm25(query, top_k, filter_files, offset, min_score, stream, state)
+    elif search_type == 'semantic':
+        return search_semantic(query, top_k, filter_files, offset, min_score, stream, state)
+    else:  # hybrid
+        return search_hybrid(query, top_k, filter_files=filter_files, offset=offset, min_score=min_score,
+                             stream=stream, state=state)
+
+def cache_results(key, results):
+    if key[-1] == index_generation:
+        # Don't store results if the index changed while searching
+        result_cache.put(key, results)
+
+def cache_when_done(key, results):
+    """Pass results through, caching them once all have been produced"""
+    collected = []
+    for result in results:
+        collected.append(result)
+        yield result
+    cache_results(key, collected)
+
+def cached_search(query, search_type, filter_files=None, top_k=5, offset=0, min_score=None, stream=False):
+    """run_search through the result cache. Returns (results, served_from_cache).
+    With stream=True results is an iterator that builds hits one at a time.
+    The whole search runs against the index published when it started.
+    """
+    state = index_state
+    key = ResultCache.make_key(query, search_type, filter_files, top_k, state.generation, offset, min_score)
+    results = result_cache.get(key)
+    if results is not None:
+        return (iter(results) if stream else results), True
+    if stream:
+        results = run_search(query, search_type, filter_files, top_k, offset, min_score, stream=True, state=state)
+        return cache_when_done(key, results), False
+    results = run_search(query, search_type, filter_files, top_k, offset, min_score, state=state)
+    cache_results(key, results)
+    return results, False
+
+def stream_response(events, fmt):
+    """Response that sends (event, data) pairs as NDJSON or SSE while they are
+    produced, compressed when the client accepts it
+    """
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    chunks = (format_event(event, data, fmt) for event, data in events)
+    response = Response(stream_with_context(compress_stream(chunks, encoding)), mimetype=STREAM_MIMETYPES[fmt])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Ask proxies not to buffer the stream
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def search_events(query, search_type, filter_files, top_k, offset, min_score):
+    """Events of a streamed search: 'meta', one 'result' per hit as soon as it
+    is built, then 'done' (or 'error')
+    """
+    try:
+        results, cached = cached_search(query, search_type, filter_files, top_k + 1, offset, min_score, stream=True)
+        yield 'meta', {
+            'query': query,
+            'search_type': search_type,
+            'filter_files': filter_files,
+            'top_k': top_k,
+            'offset': offset,
+            'cached': cached
+        }
+        count = 0
+        for result in results:
+            count += 1
+            if count <= top_k:
+                yield 'result', result
+        yield 'done', {'total': min(count, top_k), 'has_more': count > top_k}
+    except Exception as e:
+        yield 'error', {'error': f'Search error: {str(e)}'}
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli-compress large JSON and HTML responses when the client accepts it.
+    Streams compress themselves (see stream_response), files are sent as they are.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', 'text/html')):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < CONFIG.get('compress_min_bytes', 1024):
+        return response
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
 @app.route('/search', methods=['POST'])
 def search():
-    """Handle search requests"""
+    """Handle search requests.
+    Optional paging fields: top_k (page size), offset (hits to skip) and min_score.
+    With "stream": "ndjson" | "sse" (or a matching Accept header) hits are streamed
+    as they are built, see search_events.
+    """
     data = request.json
     query = data.get('query', '').strip()
     search_type = data.get('search_type', 'hybrid')
@@ -942,44 +1671,169 @@ def search():
     if not query:
         return jsonify({'error': 'Please enter a search query'}), 400
     
-    if not documents:
+    try:
+        top_k = int(data.get('top_k', 5))
+        offset = int(data.get('offset', 0))
+        min_score = data.get('min_score')
+        min_score = float(min_score) if min_score is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_k and offset must be integers and min_score a number'}), 400
+    if not 1 <= top_k <= CONFIG.get('max_top_k', 100) or offset < 0:
+        return jsonify({'error': f"top_k must be between 1 and {CONFIG.get('max_top_k', 100)} and offset non-negative"}), 400
+    
+    if not index_state.documents:
         return jsonify({'error': 'No documents found. Please add PDFs or text files to the data/docs folder'}), 404
     
+    stream_format = negotiate_stream(data.get('stream'), request.headers.get('Accept'))
+    if stream_format:
+        return stream_response(search_events(query, search_type, filter_files, top_k, offset, min_score), stream_format)
+    
     try:
-        if search_type == 'tfidf':
-            results = search_tfidf(query, filter_files=filter_files)
-        elif search_type == 'bm25':
-            results = search_bm25(query, filter_files=filter_files)
-        elif search_type == 'semantic':
-            results = search_semantic(query, filter_files=filter_files)
-        else:  # hybrid
-            results = search_hybrid(query, filter_files=filter_files)
+        # Fetch one extra hit to tell whether another page exists
+        results, cached = cached_search(query, search_type, filter_files, top_k + 1, offset, min_score)
+        has_more = len(results) > top_k
+        results = results[:top_k]
         
         return jsonify({
             'query': query,
             'search_type': search_type,
             'filter_files': filter_files,
             'results': results,
-            'total': len(results)
+            'total': len(results),
+            'top_k': top_k,
+            'offset': offset,
+            'has_more': has_more,
+            'cached': cached
         })
     except Exception as e:
         return jsonify({'error': f'Search error: {str(e)}'}), 500
 
+@app.route('/search/batch', methods=['POST'])
+def search_batch_route():
+    """Run many queries with one or more methods in one request (see search_batch).
+    Body: queries (list of strings), methods (default ["hybrid"]), top_k,
+    min_score, filter_files, alpha and snippets (false = filenames and scores only).
+    """
+    data = request.json or {}
+    queries = data.get('queries')
+    methods = data.get('methods', ['hybrid'])
+    if isinstance(methods, str):
+        methods = [methods]
+    
+    max_queries = CONFIG.get('max_batch_queries', 1000)
+    if (not isinstance(queries, list) or not queries
+            or not all(isinstance(query, str) and query.strip() for query in queries)):
+        return jsonify({'error': 'queries must be a non-empty list of non-empty strings'}), 400
+    if len(queries) > max_queries:
+        return jsonify({'error': f'At most {max_queries} queries per batch'}), 400
+    if not isinstance(methods, list) or not methods or any(method not in SEARCH_METHODS for method in methods):
+        return jsonify({'error': f"methods must be a list of: {', '.join(SEARCH_METHODS)}"}), 400
+    
+    try:
+        top_k = int(data.get('top_k', 5))
+        min_score = data.get('min_score')
+        min_score = float(min_score) if min_score is not None else None
+        alpha = data.get('alpha')
+        alpha = float(alpha) if alpha is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_k must be an integer and min_score and alpha numbers'}), 400
+    if not 1 <= top_k <= CONFIG.get('max_top_k', 100):
+        return jsonify({'error': f"top_k must be between 1 and {CONFIG.get('max_top_k', 100)}"}), 400
+    
+    if not index_state.documents:
+        return jsonify({'error': 'No documents found. Please add PDFs or text files to the data/docs folder'}), 404
+    
+    queries = [query.strip() for query in queries]
+    try:
+        started = time.perf_counter()
+        batch = search_batch(queries, methods, top_k, data.get('filter_files', []), alpha, min_score,
+                             snippets=bool(data.get('snippets', True)))
+        elapsed = time.perf_counter() - started
+    except Exception as e:
+        return jsonify({'error': f'Search error: {str(e)}'}), 500
+    
+    return jsonify({
+        'results': [{'query': query, 'results': results} for query, results in zip(queries, batch)],
+        'methods': methods,
+        'top_k': top_k,
+        'total': len(queries),
+        'search_time': round(elapsed, 4),
+        'queries_per_sec': round(len(queries) / elapsed, 1) if elapsed > 0 else None
+    })
+
+def job_response(job, **fields):
+    """202 response pointing the client at the status of a queued job"""
+    response = jsonify({'job_id': job.id, 'status': job.status, 'status_url': f'/jobs/{job.id}', **fields})
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response
+
+def reload_job(job, force_reload):
+    """Job: load_documents, reporting progress to the job"""
+    load_documents(force_reload=force_reload, progress=job.update)
+    return {'message': 'Documents reloaded successfully', 'doc_count': len(index_state.documents)}
+
 @app.route('/reload', methods=['POST'])
 def reload():
-    """Reload documents from the folder"""
+    """Reload documents from the folder (only changed files unless force is set).
+    Runs as a background job; poll the returned status_url (see /jobs/<id>).
+    """
     try:
-        load_documents(force_reload=True)
-        return jsonify({
-            'message': 'Documents reloaded successfully',
-            'doc_count': len(documents)
-        })
+        data = request.get_json(silent=True) or {}
+        return job_response(job_queue.submit('reload', reload_job, bool(data.get('force', False))))
     except Exception as e:
         return jsonify({'error': f'Error reloading documents: {str(e)}'}), 500
 
+def upload_job(job, file_path):
+    """Job: extract an uploaded file and add it to the index.
+    The file is removed again if it cannot be indexed.
+    """
+    rel_path = os.path.relpath(file_path, DOCS_DIR)
+    try:
+        job.update(stage='extracting', total=1)
+        extracted = extract_document(file_path, CONFIG.get('max_pages_per_pdf', 20), CONFIG.get('max_images_per_pdf', 3))
+        if not extracted:
+            if file_path.lower().endswith('.pdf'):
+                raise ValueError('Could not extract text from PDF. The file might be empty or image-based.')
+            raise ValueError('File appears to be empty')
+        text, images = extracted
+        job.update(done=1)
+        
+        # Add to document collection and patch the indices with just this file
+        job.update(stage='indexing')
+        entry = make_manifest_entry(file_path)
+        entry['indexed'] = True
+        with index_update_lock():
+            # Build on the newest index, in case another worker saved one meanwhile
+            refresh_index()
+            if rel_path not in index_state.file_manifest:  # Unless a reload picked it up first
+                with updating_index() as state:
+                    state.file_manifest[rel_path] = entry
+                    print(f"Indexing {rel_path} ({len(state.documents) + 1} documents)...")
+                    add_documents([(rel_path, text, image_store.add(images), {'size': entry['size'], 'mtime': entry['mtime']})], state)
+                    rebuild_lexical_indices(state)
+                    
+                    # Update cache
+                    job.update(stage='saving')
+                    save_to_cache(state)
+    except Exception:
+        # If processing fails, remove the file
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    
+    return {
+        'message': 'File uploaded and indexed successfully',
+        'filename': os.path.basename(file_path),
+        'total_documents': len(index_state.documents)
+    }
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload"""
+    """Handle file upload.
+    The file is saved right away and indexed by a background job; poll the
+    returned status_url (see /jobs/<id>).
+    """
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -996,8 +1850,12 @@ def upload_file():
         if file_ext not in allowed_extensions:
             return jsonify({'error': f'File type {file_ext} not supported. Please upload PDF, TXT, DOC, or DOCX files'}), 400
         
+        if file_ext in ['.doc', '.docx']:
+            # For DOC/DOCX, you would need python-docx library
+            return jsonify({'error': 'DOC/DOCX support coming soon. Please upload PDF or TXT files.'}), 400
+        
         # Create uploads directory in data/docs
-        upload_dir = os.path.join(BASE_DIR, 'data', 'docs', 'uploads')
+        upload_dir = os.path.join(DOCS_DIR, 'uploads')
         if not os.path.exists(upload_dir):
             os.makedirs(upload_dir)
         
@@ -1014,78 +1872,39 @@ def upload_file():
         # Save the file
         file.save(file_path)
         
-        # Process the uploaded file
-        try:
-            if file_ext == '.pdf':
-                text = extract_text_from_pdf(file_path)
-                if not text or len(text.strip()) < 50:
-                    os.remove(file_path)
-                    return jsonify({'error': 'Could not extract text from PDF. The file might be empty or image-based.'}), 400
-                images = extract_images_from_pdf(file_path)
-            elif file_ext == '.txt':
-                text = extract_text_from_txt(file_path)
-                images = []
-            elif file_ext in ['.doc', '.docx']:
-                # For DOC/DOCX, you would need python-docx library
-                # For now, return error or convert to text
-                return jsonify({'error': 'DOC/DOCX support coming soon. Please upload PDF or TXT files.'}), 400
-            else:
-                return jsonify({'error': 'Unsupported file type'}), 400
-            
-            if not text.strip():
-                os.remove(file_path)
-                return jsonify({'error': 'File appears to be empty'}), 400
-            
-            # Add to document collection
-            rel_path = os.path.join('uploads', os.path.basename(file_path))
-            documents.append(text)
-            doc_names.append(rel_path)
-            doc_images.append(images)
-            
-            # Rebuild indices
-            print(f"Rebuilding indices with {len(documents)} documents...")
-            
-            # Rebuild TF-IDF
-            global tfidf_vectorizer, tfidf_matrix, bm25_model, processed_docs, semantic_embeddings
-            tfidf_vectorizer = TfidfVectorizer(stop_words='english', max_features=CONFIG.get('tfidf_max_features', 1000))
-            tfidf_matrix = tfidf_vectorizer.fit_transform(documents)
-            
-            # Rebuild BM25
-            processed_docs = [preprocess_text_advanced(doc) for doc in documents]
-            bm25_model = BM25Okapi(processed_docs)
-            
-            # Rebuild semantic embeddings if available
-            if SEMANTIC_AVAILABLE and SEMANTIC_MODEL is not None:
-                try:
-                    semantic_embeddings = SEMANTIC_MODEL.encode(documents, show_progress_bar=False)
-                except Exception as e:
-                    print(f"Error building semantic embeddings: {e}")
-                    semantic_embeddings = None
-            
-            # Update cache
-            save_to_cache()
-            
-            # Update hash file
-            docs_path = os.path.join(BASE_DIR, 'data', 'docs')
-            current_hash = get_files_hash(docs_path)
-            with open(HASH_FILE, 'w') as f:
-                f.write(current_hash)
-            
-            return jsonify({
-                'message': 'File uploaded and indexed successfully',
-                'filename': os.path.basename(file_path),
-                'total_documents': len(documents)
-            }), 200
-            
-        except Exception as e:
-            # If processing fails, remove the file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            return jsonify({'error': f'Error processing file: {str(e)}'}), 500
+        return job_response(job_queue.submit('upload', upload_job, file_path), filename=os.path.basename(file_path))
         
     except Exception as e:
         return jsonify({'error': f'Upload error: {str(e)}'}), 500
 
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Recent indexing jobs of this server process, newest first"""
+    return jsonify({'jobs': job_queue.list()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Progress of an indexing job: status (queued, running, done, failed), stage,
+    files done/total, errors, eta_seconds, and the result once done
+    """
+    status = job_queue.get(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status)
+
+@app.route('/image/<image_id>', methods=['GET'])
+def serve_image(image_id):
+    """Serve an extracted image by id.
+    Ids are content hashes, so the id is the ETag and responses can be cached forever.
+    """
+    path = image_store.path(image_id)
+    if path is None or not os.path.exists(path):
+        return jsonify({'error': 'Image not found'}), 404
+    response = send_file(path, mimetype='image/png', etag=image_id, max_age=31536000, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/download/<path:filename>', methods=['GET'])
 def download_file(filename):
     """Download or view a file"""
@@ -1109,7 +1928,10 @@ def download_file(filename):
 
 @app.route('/ai-chat', methods=['POST'])
 def ai_chat():
-    """AI-powered chat using search results"""
+    """AI-powered chat using search results.
+    With "stream": "ndjson" | "sse" (or a matching Accept header) the answer is sent
+    token by token, see chat_events.
+    """
     try:
         data = request.json
         query = data.get('query', '').strip()
@@ -1119,34 +1941,55 @@ def ai_chat():
         if not query:
             return jsonify({'error': 'Please enter a query'}), 400
         
-        # Extract relevant content from search results
-        context_parts = []
-        sources = []
+        prompt, context, sources = build_chat_prompt(query, search_results, conversation_history)
         
-        for i, result in enumerate(search_results[:5]):  # Top 5 results
-            context_parts.append(f"Document {i+1}: {result['filename']}")
-            context_parts.append(f"Content: {result.get('summary', '')}")
-            if result.get('key_points'):
-                context_parts.append("Key Points:")
-                for point in result['key_points'][:3]:
-                    # Remove HTML tags from points
-                    clean_point = re.sub(r'<[^>]+>', '', point)
-                    context_parts.append(f"- {clean_point}")
-            context_parts.append("")  # Empty line between documents
-            sources.append(result['filename'])
+        stream_format = negotiate_stream(data.get('stream'), request.headers.get('Accept'))
+        if stream_format:
+            return stream_response(chat_events(prompt, query, search_results, context, sources), stream_format)
         
-        context = "\n".join(context_parts)
+        ai_response = ''.join(chat_tokens(prompt, query, search_results, context))
         
-        # Build conversation context
-        conversation_context = ""
-        if conversation_history:
-            for msg in conversation_history[-3:]:  # Last 3 messages
-                role = msg.get('role', 'user')
-                content = msg.get('content', '')
-                conversation_context += f"{role.upper()}: {content}\n"
+        return jsonify({
+            'response': ai_response,
+            'sources': sources[:5],
+            'context_used': len(search_results)
+        })
         
-        # Create a comprehensive prompt
-        prompt = f"""You are an AI assistant helping users understand information from their document collection.
+    except Exception as e:
+        return jsonify({'error': f'AI chat error: {str(e)}'}), 500
+
+def build_chat_prompt(query, search_results, conversation_history):
+    """Prompt for the chat model from the top search results and recent messages.
+    Returns (prompt, context, sources)
+    """
+    # Extract relevant content from search results
+    context_parts = []
+    sources = []
+    
+    for i, result in enumerate(search_results[:5]):  # Top 5 results
+        context_parts.append(f"Document {i+1}: {result['filename']}")
+        context_parts.append(f"Content: {result.get('summary', '')}")
+        if result.get('key_points'):
+            context_parts.append("Key Points:")
+            for point in result['key_points'][:3]:
+                # Remove HTML tags from points
+                clean_point = re.sub(r'<[^>]+>', '', point)
+                context_parts.append(f"- {clean_point}")
+        context_parts.append("")  # Empty line between documents
+        sources.append(result['filename'])
+    
+    context = "\n".join(context_parts)
+    
+    # Build conversation context
+    conversation_context = ""
+    if conversation_history:
+        for msg in conversation_history[-3:]:  # Last 3 messages
+            role = msg.get('role', 'user')
+            content = msg.get('content', '')
+            conversation_context += f"{role.upper()}: {content}\n"
+    
+    # Create a comprehensive prompt
+    prompt = f"""You are an AI assistant helping users understand information from their document collection.
 
 Previous conversation:
 {conversation_context if conversation_context else "No previous conversation"}
@@ -1172,38 +2015,54 @@ Instructions:
 
 Keep your response clear, informative, engaging, and visually appealing with emojis and proper formatting."""
 
-        # Try to use OpenAI API if available, otherwise provide a structured response
-        try:
-            from openai import OpenAI
-            # Check if API key is set in environment
-            api_key = os.getenv('OPENAI_API_KEY')
-            if api_key and not api_key.startswith('sk-proj-YOUR'):
-                client = OpenAI(api_key=api_key)
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful AI assistant that answers questions based on provided document context. Format your responses using markdown with emojis for better readability."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1000
-                )
-                ai_response = response.choices[0].message.content
-            else:
-                raise Exception("OpenAI API key not set or invalid")
-        except Exception as e:
-            print(f"OpenAI API error: {e}")
-            # Fallback: Generate a structured response from the context
-            ai_response = generate_fallback_response(query, search_results, context)
-        
-        return jsonify({
-            'response': ai_response,
-            'sources': sources[:5],
-            'context_used': len(search_results)
-        })
-        
+    return prompt, context, sources
+
+def chat_tokens(prompt, query, search_results, context):
+    """Yield the answer in pieces as it is generated: OpenAI tokens when an API
+    key is configured, otherwise the fallback response line by line
+    """
+    sent = False
+    try:
+        from openai import OpenAI
+        # Check if API key is set in environment
+        api_key = os.getenv('OPENAI_API_KEY')
+        if api_key and not api_key.startswith('sk-proj-YOUR'):
+            client = OpenAI(api_key=api_key)
+            response = client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a helpful AI assistant that answers questions based on provided document context. Format your responses using markdown with emojis for better readability."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=1000,
+                stream=True
+            )
+            for chunk in response:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    sent = True
+                    yield token
+            return
+        else:
+            raise Exception("OpenAI API key not set or invalid")
     except Exception as e:
-        return jsonify({'error': f'AI chat error: {str(e)}'}), 500
+        if sent:
+            # Part of the answer is already out, don't append a second one
+            raise
+        print(f"OpenAI API error: {e}")
+    
+    # Fallback: Generate a structured response from the context
+    yield from generate_fallback_response(query, search_results, context).splitlines(keepends=True)
+
+def chat_events(prompt, query, search_results, context, sources):
+    """Events of a streamed chat answer: one 'token' per piece of text, then 'done' (or 'error')"""
+    try:
+        for token in chat_tokens(prompt, query, search_results, context):
+            yield 'token', {'text': token}
+        yield 'done', {'sources': sources[:5], 'context_used': len(search_results)}
+    except Exception as e:
+        yield 'error', {'error': f'AI chat error: {str(e)}'}
 
 def generate_fallback_response(query, search_results, context):
     """Generate a structured response when AI API is not available"""
@@ -1273,15 +2132,53 @@ Would you like to try a different question? 🤔"""
     
     return "\n".join(response_parts)
 
+@app.route('/health')
+def health():
+    """Readiness of the server: lexical search is available as soon as documents
+    are loaded, semantic search once the model has finished loading
+    """
+    return jsonify({
+        'status': 'ok',
+        'documents': len(index_state.documents),
+        'lexical_ready': bool(index_state.documents),
+        'semantic': 'ready' if SEMANTIC_MODEL is not None else semantic_status,
+        'semantic_error': semantic_error,
+        'nltk_ready': _nltk_ready,
+        'result_cache': result_cache.stats(),
+        'query_embedding_cache': query_embedding_cache.stats(),
+        'uptime': round(time.time() - STARTED_AT, 3)
+    })
+
 @app.route('/hero')
 def hero():
     """Hero landing page with animated background paths"""
     return render_template('hero.html')
 
-if __name__ == '__main__':
+def startup(warmup=True):
+    """Load the document index before serving (and start the model warm-up).
+    Called by the development server below and by wsgi.py.
+    """
+    print(f"App imported in {time.time() - STARTED_AT:.2f}s")
+    if warmup and CONFIG.get('semantic_warmup', True):
+        start_warmup()
     print("Loading documents...")
     load_documents()
-    print(f"Loaded {len(documents)} documents")
+    print(f"Loaded {len(index_state.documents)} documents")
+    print(f"Ready to serve lexical search {time.time() - STARTED_AT:.2f}s after start")
+
+def start_worker():
+    """Per-process setup of a forked server worker (see gunicorn.conf.py).
+    Threads do not survive fork, so each worker starts its own model warm-up
+    and watches INDEX_DIR for generations saved by other workers.
+    """
+    if CONFIG.get('semantic_warmup', True):
+        start_warmup()
+    if CONFIG.get('index_poll_interval', 2):
+        watch_index(CONFIG['index_poll_interval'])
+
+if __name__ == '__main__':
+    startup()
     print("Starting Flask server...")
+    # Development server; use wsgi.py for production (see README)
     # Disable reloader to avoid MemoryError with PyPDF2 on Windows
     app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
@@ -0,0 +1,798 @@
+"""
+IR System Benchmarks
+Run this to measure indexing and search performance
+
+Usage:
+    python benchmark_ir.py pdf [docs_folder]
+    python benchmark_ir.py bm25 [sizes...]
+    python benchmark_ir.py vectors [num_vectors]
+    python benchmark_ir.py store [num_docs]
+    python benchmark_ir.py startup [runs]
+    python benchmark_ir.py hybrid [num_docs]
+    python benchmark_ir.py filters [num_docs]
+    python benchmark_ir.py topk [num_docs]
+    python benchmark_ir.py snippets [doc_kb]
+    python benchmark_ir.py streaming [num_docs]
+    python benchmark_ir.py batch [num_docs]
+    python benchmark_ir.py analyzer [num_docs]
+    python benchmark_ir.py lexical [num_docs]
+    python benchmark_ir.py tfidf [num_docs]
+    python benchmark_ir.py expansion [num_docs]
+    python benchmark_ir.py quantize [num_vectors]
+"""
+
+import os
+import re
+import sys
+import time
+import subprocess
+import io
+import zlib
+import contextlib
+import numpy as np
+
+DEFAULT_DOCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'docs')
+
+def find_pdfs(docs_path):
+    """List all PDF files below a folder"""
+    pdfs = []
+    for root, dirs, files in os.walk(docs_path):
+        for filename in files:
+            if filename.endswith('.pdf'):
+                pdfs.append(os.path.join(root, filename))
+    return sorted(pdfs)
+
+def bench_pdf_extraction(pdf_paths, max_pages=20, max_images=3):
+    """Compare the two-pass PyPDF2 + PyMuPDF path against single-pass extract_pdf.
+
+    Returns:
+        Dict mapping path name -> {'pages', 'seconds', 'pages_per_sec', 'images'}
+    """
+    import ingest
+
+    fitz = ingest._import_pymupdf()
+    total_pages = 0
+    for pdf_path in pdf_paths:
+        try:
+            with fitz.open(pdf_path) as pdf_document:
+                total_pages += min(max_pages, len(pdf_document))
+        except Exception:
+            pass
+
+    def two_pass(pdf_path):
+        text = ingest.extract_text_from_pdf(pdf_path, max_pages)
+        return text, ingest.extract_images_from_pdf(pdf_path, max_images, max_pages)
+
+    def single_pass(pdf_path):
+        return ingest.extract_pdf(pdf_path, max_pages, max_images)
+
+    results = {}
+    for name, extract in [('PyPDF2 + PyMuPDF (two-pass)', two_pass), ('PyMuPDF (single-pass)', single_pass)]:
+        images = 0
+        start = time.perf_counter()
+        for pdf_path in pdf_paths:
+            text, pdf_images = extract(pdf_path)
+            images += len(pdf_images)
+        seconds = time.perf_counter() - start
+        results[name] = {
+            'pages': total_pages,
+            'seconds': seconds,
+            'pages_per_sec': total_pages / seconds if seconds > 0 else 0.0,
+            'images': images
+        }
+    return results
+
+def synthetic_corpus(num_docs, vocab_size=50000, doc_length=120, seed=42):
+    """Generate tokenized documents with a Zipf-like term distribution"""
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"term{i}" for i in range(vocab_size)])
+    probabilities = 1.0 / np.arange(1, vocab_size + 1)
+    probabilities /= probabilities.sum()
+    lengths = rng.integers(doc_length // 2, doc_length * 3 // 2, size=num_docs)
+    tokens = rng.choice(vocab_size, size=int(lengths.sum()), p=probabilities)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return [vocab[tokens[offsets[i]:offsets[i + 1]]].tolist() for i in range(num_docs)], vocab
+
+def synthetic_queries(vocab, num_queries=50, terms_per_query=3, seed=7):
+    """Pick query terms from the mid-frequency part of the vocabulary"""
+    rng = np.random.default_rng(seed)
+    return [vocab[rng.integers(10, 5000, size=terms_per_query)].tolist() for _ in range(num_queries)]
+
+def bench_bm25(sizes=(1000, 10000, 100000)):
+    """Compare build time and query latency of BM25Index against rank_bm25.BM25Okapi.
+
+    Returns:
+        Dict mapping "<engine> @ <docs>" -> {'build_s', 'query_ms', 'max_diff'}
+    """
+    from bm25_index import BM25Index
+    try:
+        from rank_bm25 import BM25Okapi
+    except ImportError:
+        BM25Okapi = None
+
+    results = {}
+    for num_docs in sizes:
+        corpus, vocab = synthetic_corpus(num_docs)
+        queries = synthetic_queries(vocab)
+
+        engines = [('BM25Index', BM25Index)]
+        if BM25Okapi is not None:
+            engines.append(('rank_bm25', BM25Okapi))
+
+        scores = {}
+        for name, engine in engines:
+            start = time.perf_counter()
+            model = engine(corpus)
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            scores[name] = [model.get_scores(q) for q in queries]
+            query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            results[f"{name} @ {num_docs}"] = {'build_s': build_s, 'query_ms': query_ms, 'max_diff': 0.0}
+
+        if 'rank_bm25' in scores:
+            max_diff = max(float(np.abs(a - b).max()) for a, b in zip(scores['BM25Index'], scores['rank_bm25']))
+            results[f"BM25Index @ {num_docs}"]['max_diff'] = max_diff
+    return results
+
+def synthetic_embeddings(num_vectors, dim=384, num_clusters=1000, num_queries=200, noise=1.5, seed=42):
+    """Clustered random unit vectors plus queries drawn near the same clusters"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, num_clusters, num_vectors)] + noise * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    queries = centers[rng.integers(0, num_clusters, num_queries)] + noise * rng.standard_normal((num_queries, dim)).astype(np.float32)
+    return vectors, queries
+
+def bench_vector_index(num_vectors=100000, k=10, probes=(1, 2, 4, 8, 16, 32)):
+    """Measure recall@k against exact search and per-query latency for each backend.
+
+    Returns:
+        Dict mapping backend name -> {'build_s', 'query_ms', 'recall'}
+    """
+    from vector_index import ExactIndex, IVFIndex
+
+    vectors, queries = synthetic_embeddings(num_vectors)
+    results = {}
+
+    start = time.perf_counter()
+    exact = ExactIndex(vectors)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    truth = [set(exact.search(q, k)[0].tolist()) for q in queries]
+    query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    results['exact'] = {'build_s': build_s, 'query_ms': query_ms, 'recall': 1.0}
+
+    start = time.perf_counter()
+    ivf = IVFIndex(vectors)
+    build_s = time.perf_counter() - start
+    for n_probe in probes:
+        ivf.n_probe = n_probe
+        start = time.perf_counter()
+        found = [set(ivf.search(q, k)[0].tolist()) for q in queries]
+        query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = float(np.mean([len(f & t) / k for f, t in zip(found, truth)]))
+        results[f"ivf ({len(ivf.centroids)} lists, probe {n_probe})"] = {
+            'build_s': build_s, 'query_ms': query_ms, 'recall': recall
+        }
+    return results
+
+def bench_index_store(num_docs=20000, passages_per_doc=3):
+    """Compare loading a pickled index against opening the memory-mapped index format.
+
+    Returns:
+        Dict mapping format -> {'size_mb', 'save_s', 'open_s', 'first_query_ms'}
+    """
+    import pickle
+    import shutil
+    import tempfile
+    from bm25_index import BM25Index
+    from vector_index import ExactIndex
+    from index_store import IndexReader, IndexWriter, read_object, write_object
+
+    corpus, vocab = synthetic_corpus(num_docs)
+    texts = [" ".join(tokens) for tokens in corpus]
+    bm25 = BM25Index(corpus)
+    vectors, queries = synthetic_embeddings(num_docs * passages_per_doc, num_queries=1)
+    vector_index = ExactIndex(vectors)
+    query_terms = synthetic_queries(vocab, num_queries=1)[0]
+
+    def first_query(bm25, vector_index, texts):
+        start = time.perf_counter()
+        top = int(np.argmax(bm25.get_scores(query_terms)))
+        vector_index.search(queries[0], 10)
+        texts[top]
+        return (time.perf_counter() - start) * 1000
+
+    temp_dir = tempfile.mkdtemp()
+    results = {}
+    try:
+        pickle_path = os.path.join(temp_dir, 'document_cache.pkl')
+        start = time.perf_counter()
+        with open(pickle_path, 'wb') as f:
+            pickle.dump({'documents': texts, 'bm25': bm25, 'vectors': vector_index}, f)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        with open(pickle_path, 'rb') as f:
+            data = pickle.load(f)
+        open_s = time.perf_counter() - start
+        results['pickle'] = {'size_mb': os.path.getsize(pickle_path) / 2**20, 'save_s': save_s, 'open_s': open_s,
+                             'first_query_ms': first_query(data['bm25'], data['vectors'], data['documents'])}
+        del data
+
+        index_dir = os.path.join(temp_dir, 'index')
+        start = time.perf_counter()
+        writer = IndexWriter(index_dir)
+        writer.add_strings('documents', texts)
+        write_object(writer, 'bm25', bm25)
+        writer.add_strings('bm25.vocabulary', bm25.vocabulary)
+        write_object(writer, 'vectors', vector_index)
+        writer.commit()
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        reader = IndexReader(index_dir)
+        documents = reader.strings('documents')
+        mapped_bm25 = read_object(reader, 'bm25', [BM25Index])
+        mapped_bm25.vocabulary = {term: i for i, term in enumerate(reader.strings('bm25.vocabulary'))}
+        mapped_vectors = read_object(reader, 'vectors', [ExactIndex])
+        open_s = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(reader.path, name)) for name in os.listdir(reader.path))
+        results['mmap index'] = {'size_mb': size / 2**20, 'save_s': save_s, 'open_s': open_s,
+                                 'first_query_ms': first_query(mapped_bm25, mapped_vectors, documents)}
+        del documents, mapped_bm25, mapped_vectors, reader
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+STARTUP_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {repo!r})
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/get_files')
+print(imported - started, time.perf_counter() - started)
+"""
+
+def bench_startup(repo_dir=None, runs=5):
+    """Time `import app` and the first response of a fresh interpreter (median of runs).
+
+    Returns:
+        Dict mapping repo_dir -> {'import_s', 'first_response_s'}
+    """
+    repo_dir = repo_dir or os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT.format(repo=repo_dir)],
+                                capture_output=True, text=True, check=True).stdout
+        timings.append([float(v) for v in output.strip().splitlines()[-1].split()])
+    import_s, first_response_s = np.median(np.array(timings), axis=0)
+    return {repo_dir: {'import_s': float(import_s), 'first_response_s': float(first_response_s)}}
+
+class HashingEncoder:
+    """Deterministic stand-in for SentenceTransformer (bag of hashed words)"""
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        vectors = np.zeros((len(texts), 384), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % 384] += 1
+        return vectors
+
+def bench_hybrid(num_docs=2000, num_queries=20, top_k=5):
+    """Compare hybrid search built from three full searches against score-level fusion.
+
+    Returns:
+        Dict mapping approach -> {'query_ms'}
+    """
+    import app
+
+    corpus, vocab = synthetic_corpus(num_docs, vocab_size=5000, doc_length=300)
+    queries = [" ".join(q) for q in synthetic_queries(vocab, num_queries)]
+    app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = HashingEncoder(), True
+    app.result_cache.max_entries = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.reset_index()
+        app.add_documents([(f"doc{i}.txt", " ".join(tokens), [], {}) for i, tokens in enumerate(corpus)])
+        app.rebuild_lexical_indices()
+
+    def three_searches(query):
+        # What hybrid used to do before fusing the result lists
+        app.search_tfidf(query, top_k * 2)
+        app.search_bm25(query, top_k * 2)
+        app.search_semantic(query, top_k * 2)
+
+    results = {}
+    for name, search in [('three searches (top_k*2)', three_searches),
+                         ('score fusion', lambda q: app.search_hybrid(q, top_k))]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            search(queries[0])  # warm up
+            start = time.perf_counter()
+            for query in queries:
+                search(query)
+            query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        results[name] = {'query_ms': query_ms}
+    return results
+
+def bench_filters(num_docs=100000, num_folders=200, filters=('folder7', 'folder42\\sub3', 'folder99')):
+    """Compare per-query string matching of filter_files against the precomputed FilterIndex.
+
+    Returns:
+        Dict mapping approach -> {'build_ms', 'query_ms', 'matches'}
+    """
+    from filter_index import FilterIndex
+
+    rng = np.random.default_rng(0)
+    doc_names = [f"folder{f}\\sub{s}\\doc{i}.pdf" for i, (f, s) in
+                 enumerate(zip(rng.integers(0, num_folders, num_docs), rng.integers(0, 10, num_docs)))]
+
+    def string_matching():
+        mask = np.zeros(len(doc_names), dtype=bool)
+        for i, doc_name in enumerate(doc_names):
+            for filter_item in filters:
+                if doc_name == filter_item or doc_name.startswith(filter_item + '\\') or doc_name.startswith(filter_item + '/'):
+                    mask[i] = True
+                    break
+        return mask
+
+    start = time.perf_counter()
+    index = FilterIndex(doc_names)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    results = {}
+    for name, build, make_mask in [('string matching', 0.0, string_matching),
+                                   ('FilterIndex', build_ms, lambda: index.mask(filters))]:
+        start = time.perf_counter()
+        for _ in range(10):
+            mask = make_mask()
+        results[name] = {'build_ms': build, 'query_ms': (time.perf_counter() - start) * 100,
+                         'matches': int(mask.sum())}
+    return results
+
+def bench_top_k(num_docs=100000, k=10, runs=50):
+    """Compare a full stable argsort against the partial sort in top_k_ids on a score vector.
+
+    Returns:
+        Dict mapping approach -> {'query_ms', 'same_order'}
+    """
+    from vector_index import top_k_ids
+
+    rng = np.random.default_rng(0)
+    # Rounded scores so ties are common, as with BM25 on short queries
+    scores = np.round(rng.random(num_docs), 3)
+    expected = np.argsort(-scores, kind='stable')[:k]
+
+    results = {}
+    for name, select in [('argsort (stable)', lambda: np.argsort(-scores, kind='stable')[:k]),
+                         ('top_k_ids (partition)', lambda: top_k_ids(scores, k))]:
+        start = time.perf_counter()
+        for _ in range(runs):
+            doc_ids = select()
+        results[name] = {'query_ms': (time.perf_counter() - start) * 1000 / runs,
+                         'same_order': bool(np.array_equal(doc_ids, expected))}
+    return results
+
+def bench_snippets(doc_kb=300, num_docs=20, num_queries=20):
+    """Compare snippet extraction by scanning each hit's text against the SnippetIndex.
+
+    Returns:
+        Dict mapping approach -> {'build_s', 'hit_ms', 'same_output'}
+    """
+    import app
+    from snippet_index import SnippetIndex, TextPositions
+
+    words_per_doc = doc_kb * 1024 // 8
+    corpus, vocab = synthetic_corpus(num_docs, vocab_size=20000, doc_length=words_per_doc)
+    # Sentences of 15 words
+    texts = [" ".join(w + ('.' if i % 15 == 14 else '') for i, w in enumerate(tokens)) for tokens in corpus]
+    queries = [" ".join(q) for q in synthetic_queries(vocab, num_queries)]
+
+    start = time.perf_counter()
+    index = SnippetIndex(texts)
+    build_s = time.perf_counter() - start
+
+    outputs = {}
+    results = {}
+    for name, build, positions in [('scan text', 0.0, lambda d: TextPositions(texts[d])),
+                                   ('SnippetIndex', build_s, lambda d: index.positions(d, texts[d]))]:
+        start = time.perf_counter()
+        outputs[name] = [app.extract_summary_and_points(texts[d], q, positions=positions(d))
+                         for q in queries for d in range(num_docs)]
+        hit_ms = (time.perf_counter() - start) * 1000 / (num_docs * num_queries)
+        results[name] = {'build_s': build, 'hit_ms': hit_ms,
+                         'same_output': outputs[name] == outputs['scan text']}
+    return results
+
+def bench_streaming(num_docs=500, top_k=50, num_queries=10):
+    """Compare time to first byte and body size of /search as JSON, NDJSON and gzip.
+
+    Returns:
+        Dict mapping response type -> {'first_byte_ms', 'total_ms', 'kb'}
+    """
+    import app
+
+    corpus, vocab = synthetic_corpus(num_docs, vocab_size=5000, doc_length=2000)
+    queries = [" ".join(q) for q in synthetic_queries(vocab, num_queries)]
+    app.result_cache.max_entries = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.reset_index()
+        app.add_documents([(f"doc{i}.txt", " ".join(tokens), [], {}) for i, tokens in enumerate(corpus)])
+        app.rebuild_lexical_indices()
+    client = app.app.test_client()
+
+    results = {}
+    for name, extra, headers in [('JSON', {}, {}),
+                                 ('JSON + gzip', {}, {'Accept-Encoding': 'gzip'}),
+                                 ('NDJSON stream', {'stream': 'ndjson'}, {}),
+                                 ('NDJSON stream + gzip', {'stream': 'ndjson'}, {'Accept-Encoding': 'gzip'})]:
+        first_byte = total = size = 0.0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for query in queries:
+                start = time.perf_counter()
+                response = client.post('/search', json=dict({'query': query, 'search_type': 'bm25', 'top_k': top_k}, **extra),
+                                       headers=headers, buffered=False)
+                chunks = iter(response.response)
+                body = next(chunks, b'')
+                first_byte += time.perf_counter() - start
+                body += b''.join(chunks)
+                total += time.perf_counter() - start
+                size += len(body)
+        results[name] = {'first_byte_ms': first_byte * 1000 / len(queries), 'total_ms': total * 1000 / len(queries),
+                         'kb': size / 1024 / len(queries)}
+    return results
+
+def bench_batch(num_docs=5000, num_queries=200, top_k=10, methods=('tfidf', 'bm25', 'semantic', 'hybrid')):
+    """Compare one search per query and method against search_batch.
+
+    Returns:
+        Dict mapping approach -> {'queries_per_sec', 'same_ranking' (fraction of identical result lists)}
+    """
+    import app
+
+    corpus, vocab = synthetic_corpus(num_docs, vocab_size=5000, doc_length=300)
+    queries = [" ".join(q) for q in synthetic_queries(vocab, num_queries)]
+    app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = HashingEncoder(), True
+    app.result_cache.max_entries = 0
+    app.query_embedding_cache.max_entries = 0  # Every approach encodes its queries
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.reset_index()
+        app.add_documents([(f"doc{i}.txt", " ".join(tokens), [], {}) for i, tokens in enumerate(corpus)])
+        app.rebuild_lexical_indices()
+
+    def one_by_one(queries):
+        return [{method: app.run_search(query, method, top_k=top_k) for method in methods} for query in queries]
+
+    approaches = [('one search per query and method', one_by_one),
+                  ('search_batch', lambda q: app.search_batch(q, methods, top_k)),
+                  ('search_batch (no snippets)', lambda q: app.search_batch(q, methods, top_k, snippets=False))]
+    results, rankings = {}, {}
+    for name, search in approaches:
+        with contextlib.redirect_stdout(io.StringIO()):
+            search(queries[:2])  # warm up
+            start = time.perf_counter()
+            batch = search(queries)
+            elapsed = time.perf_counter() - start
+        rankings[name] = [[hit['filename'] for hit in hits[method]] for hits in batch for method in methods]
+        # Float rounding differs between matrix-vector and matrix-matrix products,
+        # which can swap hits with (almost) tied scores
+        same = [a == b for a, b in zip(rankings[name], rankings[approaches[0][0]])]
+        results[name] = {'queries_per_sec': len(queries) / elapsed, 'same_ranking': sum(same) / len(same)}
+    return results
+
+def sample_texts(num_docs, words_per_doc=1000, seed=42):
+    """Documents of words sampled from the sample .txt files (real English with
+    punctuation and stopwords), falling back to synthetic terms
+    """
+    words = []
+    for root, _, files in os.walk(DEFAULT_DOCS_DIR):
+        for name in files:
+            if name.endswith('.txt'):
+                with open(os.path.join(root, name), encoding='utf-8', errors='ignore') as f:
+                    words.extend(f.read().split())
+    if not words:
+        words = synthetic_corpus(1, doc_length=words_per_doc)[0][0]
+    rng = np.random.default_rng(seed)
+    return [" ".join(np.array(words)[rng.integers(0, len(words), size=words_per_doc)]) for _ in range(num_docs)]
+
+def legacy_preprocess(text, stem):
+    """preprocess_text_advanced before TextAnalyzer (per-call stop set, word_tokenize, stem per token)"""
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize
+    text = re.sub(r'[^a-z0-9\s]', ' ', text.lower())
+    tokens = word_tokenize(text)
+    stop_words = set(stopwords.words('english'))
+    stop_words.update({'note', 'notes', 'question', 'answer', 'section', 'unit', 'page'})
+    tokens = [t for t in tokens if t not in stop_words and len(t) > 2]
+    return [stem(t) for t in tokens]
+
+def bench_analyzer(num_docs=500):
+    """Compare the old per-call preprocessing against TextAnalyzer (cold and warm word table).
+
+    Returns:
+        Dict mapping approach -> {'tokens_per_sec', 'same_output'}
+    """
+    import app
+    import nltk
+
+    texts = sample_texts(num_docs)
+    app.ensure_nltk_data()
+    try:
+        nltk.data.find('tokenizers/punkt')  # word_tokenize, used by the old pipeline only
+    except LookupError:
+        nltk.download('punkt', quiet=True)
+    num_tokens = sum(len(text.split()) for text in texts)
+    analyzer = app.text_analyzer()
+    analyzer._terms.clear()
+
+    results, outputs = {}, {}
+    for name, analyze in [('preprocess (old)', lambda: [legacy_preprocess(t, app.stemmer.stem) for t in texts]),
+                          ('TextAnalyzer (cold)', lambda: analyzer.analyze_many(texts)),
+                          ('TextAnalyzer (warm)', lambda: analyzer.analyze_many(texts))]:
+        start = time.perf_counter()
+        outputs[name] = analyze()
+        elapsed = time.perf_counter() - start
+        results[name] = {'tokens_per_sec': num_tokens / elapsed,
+                         'same_output': outputs[name] == outputs['preprocess (old)']}
+    return results
+
+def bench_lexical_build(num_docs=2000):
+    """Compare building TF-IDF and BM25 from two tokenizations against one shared count matrix.
+
+    Returns:
+        Dict mapping approach -> {'build_s', 'peak_mb'}
+    """
+    import tracemalloc
+    import app
+    from bm25_index import BM25Index
+    from index_state import IndexState
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    texts = sample_texts(num_docs)
+    app.text_analyzer().analyze_many(texts[:10])  # load NLTK data
+
+    def two_passes():
+        # sklearn's analyzer for TF-IDF, the BM25 analyzer for BM25
+        tfidf = TfidfVectorizer(stop_words='english', max_features=app.CONFIG.get('tfidf_max_features') or None)
+        matrix = tfidf.fit_transform(texts)
+        return matrix, BM25Index(app.text_analyzer().analyze_many(texts))
+
+    def shared_counts():
+        # The app's own build: BM25 postings, then TF-IDF from their term counts
+        state = IndexState()
+        state.documents = texts
+        app.ensure_bm25_model(state)
+        return app.build_tfidf_index(state.bm25_model), state.bm25_model
+
+    results = {}
+    for name, build in [('two tokenizations', two_passes), ('shared term counts', shared_counts)]:
+        app.text_analyzer()._terms.clear()
+        tracemalloc.start()
+        start = time.perf_counter()
+        build()
+        build_s = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {'build_s': build_s, 'peak_mb': peak / 2**20}
+    return results
+
+def bench_tfidf(num_docs=20000, num_queries=50):
+    """Compare the old 1000-term float64 TF-IDF index (sparse x sparse scoring) against
+    the full-vocabulary float32 index (sparse matrix x vector scoring).
+    answered is the fraction of rare-term queries with at least one hit.
+
+    Returns:
+        Dict mapping index -> {'terms', 'matrix_mb', 'build_s', 'query_ms', 'answered'}
+    """
+    import app
+    from bm25_index import BM25Index
+    from index_state import IndexState
+
+    corpus, vocab = synthetic_corpus(num_docs, vocab_size=50000, doc_length=200)
+    rng = np.random.default_rng(7)
+    queries = [" ".join(q) for q in synthetic_queries(vocab, num_queries)]
+    rare_queries = vocab[rng.integers(5000, 50000, size=num_queries)].tolist()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bm25 = BM25Index(app.text_analyzer().analyze_many(" ".join(tokens) for tokens in corpus))
+
+    def old_scores(state, query):
+        query_vec = state.tfidf_vectorizer.transform([query])
+        return (state.tfidf_matrix @ query_vec.T).toarray().ravel()
+
+    results = {}
+    saved = dict(app.CONFIG)
+    try:
+        for name, config, score in [
+                ('1000 terms, float64 (before)', {'tfidf_max_features': 1000}, old_scores),
+                ('full vocabulary, float32', {}, lambda state, q: app.score_tfidf(q, state=state)),
+                ('full vocabulary, min_df=2', {'tfidf_min_df': 2}, lambda state, q: app.score_tfidf(q, state=state))]:
+            app.CONFIG.update({'tfidf_max_features': 0, 'tfidf_min_df': 1, 'tfidf_max_df': 1.0}, **config)
+            state = IndexState()
+            start = time.perf_counter()
+            state.tfidf_vectorizer, state.tfidf_matrix = app.build_tfidf_index(bm25)
+            build_s = time.perf_counter() - start
+            if score is old_scores:
+                state.tfidf_matrix = state.tfidf_matrix.astype(np.float64)
+            matrix = state.tfidf_matrix
+            score(state, queries[0])  # warm up
+            start = time.perf_counter()
+            for query in queries:
+                score(state, query)
+            query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            answered = np.mean([score(state, q).max() > 0 for q in rare_queries])
+            results[name] = {'terms': len(state.tfidf_vectorizer.vocabulary),
+                             'matrix_mb': (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 2**20,
+                             'build_s': build_s, 'query_ms': query_ms, 'answered': float(answered)}
+    finally:
+        app.CONFIG.clear()
+        app.CONFIG.update(saved)
+    return results
+
+def legacy_expand_query(query):
+    """expand_query before the expansion table (WordNet lookups for every query token)"""
+    from nltk.corpus import wordnet
+    from nltk.tokenize import word_tokenize
+    expanded_terms = []
+    for token in word_tokenize(query.lower()):
+        expanded_terms.append(token)
+        for syn in wordnet.synsets(token)[:2]:
+            for lemma in syn.lemmas()[:1]:
+                synonym = lemma.name().replace('_', ' ')
+                if synonym != token and synonym not in expanded_terms:
+                    expanded_terms.append(synonym)
+    return ' '.join(expanded_terms)
+
+def bench_expansion(num_docs=500, num_queries=200):
+    """Compare per-query WordNet expansion against the precomputed expansion table.
+    Without WordNet data the table is built from stand-in synonyms (other words
+    of the collection) and only the table lookup is timed.
+
+    Returns:
+        Dict mapping approach -> {'build_s', 'query_us', 'added_terms'}
+    """
+    import app
+
+    texts = sample_texts(num_docs)
+    rng = np.random.default_rng(7)
+    words = sorted({w for text in texts for w in re.findall(r'[a-z]{4,}', text.lower())})
+    queries = [" ".join(rng.choice(words, size=3)) for _ in range(num_queries)]
+    saved = (app.wordnet_synonyms, dict(app.CONFIG))
+    live = bool(app.wordnet_synonyms('car'))
+    if not live:
+        app.wordnet_synonyms = lambda word: [words[zlib.crc32((word + str(i)).encode()) % len(words)] for i in range(4)]
+
+    results = {}
+    try:
+        app.CONFIG['enable_query_expansion'] = True
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.reset_index()
+            app.add_documents([(f"doc{i}.txt", text, [], {}) for i, text in enumerate(texts)])
+            app.analyze_query(queries[0])
+            start = time.perf_counter()
+            app.rebuild_lexical_indices()
+            build_s = time.perf_counter() - start
+        approaches = [('expansion table', build_s, lambda q: app.analyze_query(q)[0])]
+        if live:
+            approaches.insert(0, ('WordNet per query (before)', 0.0, lambda q: legacy_expand_query(q).split()))
+        for name, build, expand in approaches:
+            expand(queries[0])  # warm up
+            start = time.perf_counter()
+            added = sum(len(expand(q)) - len(q.split()) for q in queries)
+            query_us = (time.perf_counter() - start) * 1e6 / len(queries)
+            results[name] = {'build_s': build, 'query_us': query_us, 'added_terms': added / len(queries)}
+    finally:
+        app.wordnet_synonyms = saved[0]
+        app.CONFIG.clear()
+        app.CONFIG.update(saved[1])
+    return results
+
+def bench_quantization(num_vectors=100000, k=10):
+    """Compare float32, float16 and int8 vector storage (exact and IVF backends).
+    Recall@k is measured against float32 exact search.
+
+    Returns:
+        Dict mapping 'backend storage' -> {'vectors_mb', 'query_ms', 'recall'}
+    """
+    from vector_index import STORAGE_TYPES, build_vector_index
+
+    vectors, queries = synthetic_embeddings(num_vectors)
+    truth = None
+    results = {}
+    for backend in ('exact', 'ivf'):
+        for storage in STORAGE_TYPES:
+            index = build_vector_index(vectors, backend=backend, storage=storage)
+            index.search(queries[0], k)  # warm up
+            start = time.perf_counter()
+            found = [set(index.search(q, k)[0].tolist()) for q in queries]
+            query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            if truth is None:
+                truth = found
+            results[f"{backend} {storage}"] = {
+                'vectors_mb': (index.vectors.nbytes + index.scales.nbytes) / 1e6,
+                'query_ms': query_ms,
+                'recall': float(np.mean([len(f & t) / k for f, t in zip(found, truth)]))
+            }
+    return results
+
+def print_table(title, results, columns):
+    """Print benchmark results as a simple aligned table"""
+    print("=" * 70)
+    print(title)
+    print("=" * 70)
+    print(f"{'':36}" + "".join(f"{c:>15}" for c in columns))
+    for name, row in results.items():
+        cells = []
+        for c in columns:
+            value = row[c]
+            cells.append(f"{value:>15.4g}" if isinstance(value, float) else f"{value:>15}")
+        print(f"{name:36}" + "".join(cells))
+    print()
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'pdf'
+
+    if command == 'pdf':
+        docs_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DOCS_DIR
+        pdfs = find_pdfs(docs_path)
+        print(f"Benchmarking {len(pdfs)} PDFs from {docs_path}\n")
+        print_table("PDF EXTRACTION", bench_pdf_extraction(pdfs),
+                    ['pages', 'seconds', 'pages_per_sec', 'images'])
+    elif command == 'bm25':
+        sizes = [int(n) for n in sys.argv[2:]] or [1000, 10000, 100000]
+        print_table("BM25 SCORING (50 queries x 3 terms)", bench_bm25(sizes),
+                    ['build_s', 'query_ms', 'max_diff'])
+    elif command == 'vectors':
+        num_vectors = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        print_table(f"VECTOR INDEX ({num_vectors} x 384, recall@10)", bench_vector_index(num_vectors),
+                    ['build_s', 'query_ms', 'recall'])
+    elif command == 'store':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+        print_table(f"INDEX LOAD ({num_docs} docs, 3 passages each)", bench_index_store(num_docs),
+                    ['size_mb', 'save_s', 'open_s', 'first_query_ms'])
+    elif command == 'startup':
+        runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+        print_table("STARTUP (import app + first /get_files)", bench_startup(runs=runs),
+                    ['import_s', 'first_response_s'])
+    elif command == 'hybrid':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        print_table(f"HYBRID SEARCH ({num_docs} docs)", bench_hybrid(num_docs), ['query_ms'])
+    elif command == 'filters':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        print_table(f"FILTER MASK ({num_docs} docs, 3 filters)", bench_filters(num_docs),
+                    ['build_ms', 'query_ms', 'matches'])
+    elif command == 'topk':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        print_table(f"TOP-10 SELECTION ({num_docs} scores)", bench_top_k(num_docs),
+                    ['query_ms', 'same_order'])
+    elif command == 'snippets':
+        doc_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+        print_table(f"SNIPPET EXTRACTION (20 docs x {doc_kb} KB, per hit)", bench_snippets(doc_kb),
+                    ['build_s', 'hit_ms', 'same_output'])
+    elif command == 'streaming':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        print_table(f"/search TOP-50 ({num_docs} docs, BM25)", bench_streaming(num_docs),
+                    ['first_byte_ms', 'total_ms', 'kb'])
+    elif command == 'batch':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+        print_table(f"BATCH SEARCH ({num_docs} docs, 200 queries x 4 methods, top 10)", bench_batch(num_docs),
+                    ['queries_per_sec', 'same_ranking'])
+    elif command == 'analyzer':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        print_table(f"TEXT ANALYSIS ({num_docs} docs x 1000 words, Porter stemming)", bench_analyzer(num_docs),
+                    ['tokens_per_sec', 'same_output'])
+    elif command == 'lexical':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        print_table(f"TF-IDF + BM25 BUILD ({num_docs} docs x 1000 words)", bench_lexical_build(num_docs),
+                    ['build_s', 'peak_mb'])
+    elif command == 'tfidf':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+        print_table(f"TF-IDF INDEX ({num_docs} docs, 50k-term Zipf vocabulary)", bench_tfidf(num_docs),
+                    ['terms', 'matrix_mb', 'build_s', 'query_ms', 'answered'])
+    elif command == 'expansion':
+        num_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        print_table(f"QUERY EXPANSION ({num_docs} docs, 200 queries x 3 words)", bench_expansion(num_docs),
+                    ['build_s', 'query_us', 'added_terms'])
+    elif command == 'quantize':
+        num_vectors = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        print_table(f"VECTOR STORAGE ({num_vectors} x 384, recall@10 vs float32 exact)", bench_quantization(num_vectors),
+                    ['vectors_mb', 'query_ms', 'recall'])
+    else:
+        print(__doc__)
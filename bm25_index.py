@@ -0,0 +1,185 @@
+"""
+Inverted-index BM25 for the IR system
+Drop-in replacement for rank_bm25.BM25Okapi that stores postings in
+CSR-style NumPy arrays, so scoring only touches the query terms' postings.
+The postings are also the collection's term-count matrix, from which the
+TF-IDF index is derived (see count_matrix).
+"""
+
+import math
+from collections import Counter
+import numpy as np
+from scipy.sparse import csr_matrix
+
+class BM25Index:
+    """Okapi BM25 over a term -> (doc ids, term frequencies) postings structure.
+
+    Uses the same parameters and idf floor as rank_bm25.BM25Okapi and returns
+    the same scores for the same tokenized corpus.
+
+    Attributes:
+        vocabulary: Dict mapping term -> term id
+        indptr: Postings of term t are doc_ids/tfs[indptr[t]:indptr[t + 1]]
+        doc_ids: Document id of every posting (int32, sorted within a term)
+        tfs: Term frequency of every posting (int32)
+        doc_len: Number of tokens in every document
+        idf: Per-term idf (0 for terms no longer in any document)
+        weights: Precomputed BM25 contribution of every posting
+    """
+
+    # Attributes persisted by index_store (the vocabulary is stored separately)
+    PARAMS = ('k1', 'b', 'epsilon', 'avgdl')
+    ARRAYS = ('indptr', 'doc_ids', 'tfs', 'doc_len', 'idf', 'weights')
+
+    def __init__(self, corpus=(), k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocabulary = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.int32)
+        self.doc_len = np.zeros(0, dtype=np.int64)
+        self.idf = np.zeros(0, dtype=np.float64)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.avgdl = 0.0
+        self.add_documents(corpus)
+
+    @property
+    def corpus_size(self):
+        return len(self.doc_len)
+
+    def _posting_terms(self):
+        """Term id of every posting"""
+        return np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int32), np.diff(self.indptr))
+
+    def _set_postings(self, term_ids, doc_ids, tfs, doc_len):
+        """Sort postings by (term, doc), rebuild indptr and recompute statistics"""
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids = term_ids[order]
+        self.doc_ids = doc_ids[order].astype(np.int32)
+        self.tfs = tfs[order].astype(np.int32)
+        self.doc_len = doc_len
+        counts = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._compute_weights()
+
+    def _compute_weights(self):
+        """Recompute idf, average document length and per-posting weights"""
+        doc_freqs = np.diff(self.indptr)
+        corpus_size = self.corpus_size
+        self.idf = np.zeros(len(doc_freqs), dtype=np.float64)
+        if corpus_size == 0:
+            self.avgdl = 0.0
+            self.weights = np.zeros(0, dtype=np.float64)
+            return
+
+        # Same idf (and summation order) as BM25Okapi, with negative idfs
+        # floored to epsilon * average idf
+        present = np.flatnonzero(doc_freqs)
+        idf_values = [math.log(corpus_size - freq + 0.5) - math.log(freq + 0.5)
+                      for freq in doc_freqs[present].tolist()]
+        if len(present):
+            average_idf = sum(idf_values) / len(idf_values)
+            eps = self.epsilon * average_idf
+            self.idf[present] = [idf if idf >= 0 else eps for idf in idf_values]
+
+        self.avgdl = int(self.doc_len.sum()) / corpus_size
+        if self.avgdl > 0:
+            norms = self.k1 * (1 - self.b + self.b * self.doc_len / self.avgdl)
+        else:
+            norms = np.full(corpus_size, self.k1 * (1 - self.b))
+
+        tfs = self.tfs.astype(np.float64)
+        posting_idf = np.repeat(self.idf, doc_freqs)
+        self.weights = posting_idf * (tfs * (self.k1 + 1) / (tfs + norms[self.doc_ids]))
+
+    def add_documents(self, corpus):
+        """Append tokenized documents to the index"""
+        corpus = list(corpus)
+        if not corpus:
+            return
+
+        vocabulary = self.vocabulary
+        first_doc = self.corpus_size
+        new_terms, new_docs, new_tfs, new_len = [], [], [], []
+        for offset, document in enumerate(corpus):
+            counts = Counter(document)
+            # New terms get the next id, in order of first occurrence
+            term_ids = [vocabulary.setdefault(term, len(vocabulary)) for term in counts]
+            new_terms.extend(term_ids)
+            new_docs.extend([first_doc + offset] * len(term_ids))
+            new_tfs.extend(counts.values())
+            new_len.append(len(document))
+
+        self._set_postings(
+            np.concatenate([self._posting_terms(), np.array(new_terms, dtype=np.int32)]),
+            np.concatenate([self.doc_ids, np.array(new_docs, dtype=np.int32)]),
+            np.concatenate([self.tfs, np.array(new_tfs, dtype=np.int32)]),
+            np.concatenate([self.doc_len, np.array(new_len, dtype=np.int64)])
+        )
+
+    def remove_documents(self, keep):
+        """Drop documents; keep is a boolean mask (or index list) of documents to keep.
+        Remaining documents are renumbered in order.
+        """
+        keep_mask = np.zeros(self.corpus_size, dtype=bool)
+        keep_mask[keep] = True
+        new_ids = np.cumsum(keep_mask) - 1
+        posting_mask = keep_mask[self.doc_ids]
+
+        self._set_postings(
+            self._posting_terms()[posting_mask],
+            new_ids[self.doc_ids[posting_mask]],
+            self.tfs[posting_mask],
+            self.doc_len[keep_mask]
+        )
+
+    def terms(self):
+        """Vocabulary terms in term id order"""
+        terms = [None] * len(self.vocabulary)
+        for term, term_id in self.vocabulary.items():
+            terms[term_id] = term
+        return terms
+
+    def count_matrix(self):
+        """Documents x terms CSR matrix of term frequencies (columns in term id order)"""
+        postings = csr_matrix((self.tfs, self.doc_ids, self.indptr), shape=(len(self.indptr) - 1, self.corpus_size))
+        return postings.T.tocsr()
+
+    def get_scores(self, query, query_weights=None):
+        """BM25 score of every document for a tokenized query.
+        query_weights optionally scales each query term's contribution (e.g. expansion terms).
+        """
+        scores = np.zeros(self.corpus_size)
+        for i, term in enumerate(query):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            if query_weights is None or query_weights[i] == 1:
+                scores[self.doc_ids[start:end]] += self.weights[start:end]
+            else:
+                scores[self.doc_ids[start:end]] += query_weights[i] * self.weights[start:end]
+        return scores
+
+    def get_scores_many(self, queries, query_weights=None):
+        """BM25 scores for many tokenized queries at once (queries x documents array).
+        The postings already form a terms x documents weight matrix, so all
+        queries are scored with one sparse product.
+        """
+        rows, cols, values = [], [], []
+        for row, query in enumerate(queries):
+            weights = query_weights[row] if query_weights is not None else [1.0] * len(query)
+            for term, weight in zip(query, weights):
+                term_id = self.vocabulary.get(term)
+                if term_id is not None:
+                    rows.append(row)
+                    cols.append(term_id)
+                    values.append(weight)
+        num_queries = len(queries)
+        # Repeated query terms are summed, counting once per occurrence like get_scores
+        query_terms = csr_matrix((np.array(values, dtype=np.float64), (rows, cols)),
+                                 shape=(num_queries, len(self.indptr) - 1))
+        weights = csr_matrix((self.weights, self.doc_ids, self.indptr), shape=(len(self.indptr) - 1, self.corpus_size))
+        return (query_terms @ weights).toarray()
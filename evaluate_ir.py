@@ -3,7 +3,9 @@ IR System Evaluation Script
 Run this to generate metrics for your report
 """
 
+import sys
 import json
+import urllib.request
 import numpy as np
 from collections import defaultdict
 
@@ -128,8 +130,96 @@ def evaluate_search_results(search_method_name, test_results):
     
     return results
 
+def collect_results(methods=('tfidf', 'bm25', 'semantic', 'hybrid'), top_k=10, server=None):
+    """
+    Run every test query with every method in one batch search
+    
+    Args:
+        methods: Search methods to evaluate
+        top_k: Documents retrieved per query
+        server: Base URL of a running server (e.g. http://localhost:5000) to
+            query through /search/batch; None searches the saved index in process
+    
+    Returns:
+        Dict mapping method -> {query: list of retrieved doc names}
+    """
+    queries = list(TEST_QUERIES)
+    if server:
+        body = json.dumps({'queries': queries, 'methods': list(methods), 'top_k': top_k, 'snippets': False})
+        request = urllib.request.Request(server.rstrip('/') + '/search/batch', data=body.encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            batch = [entry['results'] for entry in json.load(response)['results']]
+    else:
+        import app
+        app.startup(warmup=False)
+        batch = app.search_batch(queries, methods, top_k, snippets=False)
+    
+    return {method: {query: [hit['filename'] for hit in results[method]]
+                     for query, results in zip(queries, batch)}
+            for method in methods}
+
+def compare_vector_storage(top_k=10):
+    """
+    Semantic search over the saved index with its passage vectors stored as
+    float32, float16 and int8 (exact backend), to weigh the memory saved
+    against the accuracy lost
+    
+    Returns:
+        Dict mapping storage -> {'vectors_mb', 'R@10', 'overlap@10'}, where
+        overlap@10 is the share of the float32 top 10 that is still retrieved
+    """
+    import copy
+    import app
+    from vector_index import STORAGE_TYPES, ExactIndex
+    
+    app.startup(warmup=False)
+    state = app.index_state
+    if not app.semantic_ready(state):
+        raise RuntimeError("Semantic search is unavailable (model not loaded or documents not embedded)")
+    vectors = state.semantic_index.decode()
+    queries = list(TEST_QUERIES)
+    
+    reference = None
+    comparison = {}
+    for storage in STORAGE_TYPES:
+        variant = copy.copy(state)
+        variant.semantic_index = ExactIndex(vectors, storage=storage)
+        retrieved = {}
+        for query, (scores, _) in zip(queries, app.score_semantic_many(queries, variant)):
+            doc_ids, _ = app.select_hits(scores, top_k)
+            retrieved[query] = [state.doc_names[d] for d in doc_ids]
+        if reference is None:
+            reference = retrieved
+        index = variant.semantic_index
+        comparison[storage] = {
+            'vectors_mb': round((index.vectors.nbytes + index.scales.nbytes) / 1e6, 2),
+            'R@10': evaluate_search_results(storage, retrieved)['R@10'],
+            'overlap@10': round(float(np.mean([len(set(retrieved[q]) & set(reference[q])) / max(1, len(reference[q]))
+                                               for q in queries])), 3)
+        }
+    return comparison
+
 # Example: How to use this
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'run':
+        # python evaluate_ir.py run [server URL]
+        names = {'tfidf': 'TF-IDF', 'bm25': 'BM25', 'semantic': 'Semantic', 'hybrid': 'Hybrid'}
+        all_results = collect_results(server=sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"{'Method':10}" + "".join(f"{m:>9}" for m in ['P@3', 'P@5', 'P@10', 'R@10', 'MAP', 'nDCG@10']))
+        for method, test_results in all_results.items():
+            results = evaluate_search_results(names[method], test_results)
+            print(f"{results['method']:10}" + "".join(f"{results[m]:>9}" for m in ['P@3', 'P@5', 'P@10', 'R@10', 'MAP', 'nDCG@10']))
+        sys.exit()
+    if len(sys.argv) > 1 and sys.argv[1] == 'quantize':
+        # python evaluate_ir.py quantize
+        columns = ['vectors_mb', 'R@10', 'overlap@10']
+        print(f"{'Storage':10}" + "".join(f"{c:>12}" for c in columns))
+        for storage, row in compare_vector_storage().items():
+            print(f"{storage:10}" + "".join(f"{row[c]:>12}" for c in columns))
+        sys.exit()
+    
+
     print("="*60)
     print("IR System Evaluation Template")
     print("="*60)
@@ -145,6 +235,11 @@ if __name__ == "__main__":
     print()
     print("3. Call: evaluate_search_results('TF-IDF', test_results_tfidf)")
     print()
+    print("Or evaluate every method with one batch search:")
+    print("   python evaluate_ir.py run [http://localhost:5000]")
+    print("Compare float32/float16/int8 passage vector storage:")
+    print("   python evaluate_ir.py quantize")
+    print()
     
     # Example dummy results
     dummy_results = {}
@@ -0,0 +1,47 @@
+"""
+Folder/file filter index for the IR system
+Maps every file and every folder prefix to the ids of the documents below
+it, so a filter_files restriction becomes a vectorized OR of id arrays
+instead of string matching against every document name.
+"""
+
+import numpy as np
+
+def normalize_path(path):
+    """Use '/' as separator and drop leading/trailing separators"""
+    return path.replace('\\', '/').strip('/')
+
+class FilterIndex:
+    """Document ids per file and per folder prefix.
+
+    Args:
+        doc_names: Relative document paths (either separator)
+    """
+
+    def __init__(self, doc_names=()):
+        self.num_docs = len(doc_names)
+        groups = {}
+        for doc_id, doc_name in enumerate(doc_names):
+            parts = normalize_path(doc_name).split('/')
+            # The file itself and every folder above it
+            for depth in range(1, len(parts) + 1):
+                groups.setdefault('/'.join(parts[:depth]), []).append(doc_id)
+        self.groups = {key: np.array(ids, dtype=np.int32) for key, ids in groups.items()}
+
+    def doc_ids(self, filter_files):
+        """Sorted ids of the documents matching any of the filters"""
+        arrays = [self.groups[key] for key in map(normalize_path, filter_files) if key in self.groups]
+        if not arrays:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(arrays))
+
+    def mask(self, filter_files):
+        """Boolean mask of the documents matching any of the filters, or None without filters"""
+        if not filter_files:
+            return None
+        mask = np.zeros(self.num_docs, dtype=bool)
+        for key in map(normalize_path, filter_files):
+            ids = self.groups.get(key)
+            if ids is not None:
+                mask[ids] = True
+        return mask
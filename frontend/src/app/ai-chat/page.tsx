@@ -5,6 +5,7 @@ import { useState, useRef, useEffect } from "react";
 import { Send, Bot, User, Sparkles, Loader2, RefreshCw } from "lucide-react";
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
+import { readEvents } from "@/lib/stream";
 
 interface Message {
   role: "user" | "assistant";
@@ -17,6 +18,7 @@ export default function AIChatPage() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   const scrollToBottom = () => {
@@ -56,11 +58,12 @@ export default function AIChatPage() {
 
       const searchData = await searchResponse.json();
       
-      // Send to AI endpoint for processing
+      // Send to AI endpoint for processing, streaming the answer as it is generated
       const aiResponse = await fetch("http://localhost:5000/ai-chat", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          Accept: "application/x-ndjson",
         },
         body: JSON.stringify({
           query: input,
@@ -68,17 +71,36 @@ export default function AIChatPage() {
           conversation_history: messages.slice(-5), // Last 5 messages for context
         }),
       });
+      if (!aiResponse.ok) {
+        throw new Error((await aiResponse.json()).error);
+      }
 
-      const aiData = await aiResponse.json();
+      // Update the last (assistant) message in place while tokens arrive
+      const updateAnswer = (update: Partial<Message>) =>
+        setMessages((prev) => [...prev.slice(0, -1), { ...prev[prev.length - 1], ...update }]);
 
-      const assistantMessage: Message = {
-        role: "assistant",
-        content: aiData.response || "I couldn't generate a response. Please try again.",
-        sources: aiData.sources || [],
-        timestamp: new Date(),
-      };
-
-      setMessages((prev) => [...prev, assistantMessage]);
+      let content = "";
+      for await (const { event, data } of readEvents(aiResponse)) {
+        if (event === "token") {
+          if (!content) {
+            setStreaming(true);
+            setMessages((prev) => [...prev, { role: "assistant", content: "", timestamp: new Date() }]);
+          }
+          content += data.text;
+          updateAnswer({ content });
+        } else if (event === "done") {
+          if (!content) {
+            setMessages((prev) => [...prev, {
+              role: "assistant",
+              content: "I couldn't generate a response. Please try again.",
+              timestamp: new Date(),
+            }]);
+          }
+          updateAnswer({ sources: data.sources || [] });
+        } else if (event === "error") {
+          throw new Error(data.error);
+        }
+      }
     } catch (error) {
       console.error("Error:", error);
       const errorMessage: Message = {
@@ -89,6 +111,7 @@ export default function AIChatPage() {
       setMessages((prev) => [...prev, errorMessage]);
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -249,7 +272,7 @@ export default function AIChatPage() {
                   </div>
                 ))}
 
-                {loading && (
+                {loading && !streaming && (
                   <div className="flex gap-4 justify-start animate-pulse">
                     <div className="flex-shrink-0 w-10 h-10 rounded-full bg-gradient-to-br from-purple-500 to-pink-500 flex items-center justify-center">
                       <Bot className="w-6 h-6 text-white" />
@@ -1,15 +1,27 @@
 "use client";
 
 import { DottedSurface } from "@/components/ui/dotted-surface";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Search, Sparkles, Zap, FileText, GitMerge, FolderOpen, X, ExternalLink } from "lucide-react";
+import { readEvents } from "@/lib/stream";
 
 type SearchType = "semantic" | "bm25" | "tfidf" | "hybrid";
 
+type ImageRef = { id: string; width: number; height: number };
+
+// What a search was submitted with; later pages must use the same ranking
+type SearchParams = { query: string; searchType: SearchType; filterFiles: string[] };
+
+const PAGE_SIZE = 10;
+
 export default function SearchPage() {
   const [query, setQuery] = useState("");
   const [results, setResults] = useState<any[]>([]);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [hasMore, setHasMore] = useState(false);
+  const searchId = useRef(0);
+  const submittedSearch = useRef<SearchParams | null>(null);
   const [searchType, setSearchType] = useState<SearchType>("hybrid");
   const [availableFolders, setAvailableFolders] = useState<string[]>([]);
   const [availableFiles, setAvailableFiles] = useState<string[]>([]);
@@ -63,26 +75,53 @@ export default function SearchPage() {
     },
   ];
 
+  // Stream one page of results, showing each hit as soon as the backend sends it
+  const streamResults = async (params: SearchParams, offset: number) => {
+    const id = searchId.current;
+    const response = await fetch("http://localhost:5000/search", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "application/x-ndjson",
+      },
+      body: JSON.stringify({
+        query: params.query,
+        search_type: params.searchType,
+        filter_files: params.filterFiles,
+        top_k: PAGE_SIZE,
+        offset,
+      }),
+    });
+    if (!response.ok) {
+      const data = await response.json();
+      console.error("Search error:", data.error);
+      return;
+    }
+
+    for await (const { event, data } of readEvents(response)) {
+      if (id !== searchId.current) return; // A newer search replaced this one
+      if (event === "result") {
+        setResults(prev => [...prev, data]);
+      } else if (event === "done") {
+        setHasMore(Boolean(data.has_more));
+      } else if (event === "error") {
+        console.error("Search error:", data.error);
+      }
+    }
+  };
+
   const handleSearch = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!query.trim()) return;
 
+    searchId.current += 1;
+    const params = { query, searchType, filterFiles: [...selectedFilters] };
+    submittedSearch.current = params;
+    setResults([]);
+    setHasMore(false);
     setLoading(true);
     try {
-      const response = await fetch("http://localhost:5000/search", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          query,
-          search_type: searchType,
-          filter_files: selectedFilters,
-        }),
-      });
-
-      const data = await response.json();
-      setResults(data.results || []);
+      await streamResults(params, 0);
     } catch (error) {
       console.error("Search error:", error);
     } finally {
@@ -90,6 +129,21 @@ export default function SearchPage() {
     }
   };
 
+  const handleLoadMore = async () => {
+    const params = submittedSearch.current;
+    if (!params) return;
+    setLoadingMore(true);
+    try {
+      // Next page of the same ranking, even if the query box or filters changed since
+      setHasMore(false);
+      await streamResults(params, results.length);
+    } catch (error) {
+      console.error("Search error:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const toggleFilter = (filter: string) => {
     setSelectedFilters(prev => 
       prev.includes(filter) 
@@ -342,7 +396,7 @@ export default function SearchPage() {
           <div className="max-w-4xl mx-auto space-y-6 animate-slideDown">
             <div className="flex items-center justify-between mb-6">
               <h2 className="text-2xl font-semibold">
-                Found {results.length} results
+                Showing {results.length}{hasMore ? "+" : ""} results
               </h2>
               <div className="flex items-center gap-2 px-4 py-2 bg-card/80 backdrop-blur-sm border border-border rounded-lg">
                 <div className={`w-2 h-2 rounded-full bg-gradient-to-r ${
@@ -356,7 +410,7 @@ export default function SearchPage() {
             {results.map((result, idx) => (
               <div
                 key={idx}
-                style={{ animationDelay: `${idx * 0.1}s` }}
+                style={{ animationDelay: `${(idx % PAGE_SIZE) * 0.1}s` }}
                 className="p-6 bg-card/80 backdrop-blur-sm border border-border rounded-xl hover:shadow-lg transition-shadow animate-slideDown"
               >
                 <div className="flex items-start justify-between mb-3">
@@ -421,13 +475,15 @@ export default function SearchPage() {
                   <div className="mt-4 pt-4 border-t border-border/50">
                     <h4 className="font-medium text-sm mb-3">Document Images</h4>
                     <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-                      {result.images.map((img: string, i: number) => (
+                      {result.images.map((img: ImageRef, i: number) => (
                         <div
-                          key={i}
+                          key={img.id}
                           className="relative group overflow-hidden rounded-lg border border-border/50 bg-muted/20"
                         >
                           <img
-                            src={`data:image/png;base64,${img}`}
+                            src={`http://localhost:5000/image/${img.id}`}
+                            width={img.width}
+                            height={img.height}
                             alt={`Document image ${i + 1}`}
                             className="w-full h-auto object-contain max-h-64 transition-transform duration-300 group-hover:scale-105 cursor-pointer"
                             loading="lazy"
@@ -439,6 +495,18 @@ export default function SearchPage() {
                 )}
               </div>
             ))}
+            {hasMore && (
+              <div className="flex justify-center pt-2">
+                <button
+                  type="button"
+                  onClick={handleLoadMore}
+                  disabled={loadingMore}
+                  className="px-6 py-2 bg-primary text-primary-foreground rounded-lg hover:opacity-90 transition disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load more results"}
+                </button>
+              </div>
+            )}
           </div>
         )}
 
@@ -3,6 +3,7 @@
 import { DottedSurface } from "@/components/ui/dotted-surface";
 import { useState } from "react";
 import { Upload, FileText, CheckCircle, XCircle, Loader2 } from "lucide-react";
+import { waitForJob } from "@/lib/jobs";
 
 interface UploadedFile {
   name: string;
@@ -75,16 +76,22 @@ export default function UploadPage() {
         });
 
         const data = await response.json();
-
-        setFiles(prev => prev.map((f, idx) => 
-          idx === prev.length - fileList.length + i
-            ? { 
-                ...f, 
-                status: response.ok ? 'success' : 'error',
-                message: data.message || data.error || (response.ok ? 'Uploaded successfully' : 'Upload failed')
-              }
-            : f
+        const updateFile = (update: Partial<UploadedFile>) => setFiles(prev => prev.map((f, idx) =>
+          idx === prev.length - fileList.length + i ? { ...f, ...update } : f
         ));
+
+        if (!response.ok) {
+          updateFile({ status: 'error', message: data.error || 'Upload failed' });
+          continue;
+        }
+
+        // The file is indexed by a background job on the server
+        const job = await waitForJob(data.status_url, (progress) =>
+          updateFile({ message: `${progress.stage.charAt(0).toUpperCase()}${progress.stage.slice(1)}...` })
+        );
+        updateFile(job.status === 'done'
+          ? { status: 'success', message: job.result?.message || 'Uploaded successfully' }
+          : { status: 'error', message: job.error || 'Indexing failed' });
       } catch (error) {
         console.error('Upload error:', error);
         setFiles(prev => prev.map((f, idx) => 
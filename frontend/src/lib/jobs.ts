@@ -0,0 +1,29 @@
+export interface JobStatus {
+  id: string
+  kind: string
+  status: "queued" | "running" | "done" | "failed"
+  stage: string
+  done: number
+  total: number
+  errors: string[]
+  result: any
+  error: string | null
+  eta_seconds: number | null
+}
+
+// Poll a background indexing job (started by /upload or /reload) until it
+// finishes, passing every status to onProgress on the way
+export async function waitForJob(
+  statusUrl: string,
+  onProgress?: (status: JobStatus) => void,
+  interval = 500
+): Promise<JobStatus> {
+  while (true) {
+    const response = await fetch(`http://localhost:5000${statusUrl}`)
+    const status = await response.json()
+    if (!response.ok) throw new Error(status.error || "Job status unavailable")
+    onProgress?.(status)
+    if (status.status === "done" || status.status === "failed") return status
+    await new Promise((resolve) => setTimeout(resolve, interval))
+  }
+}
@@ -0,0 +1,25 @@
+export interface StreamEvent {
+  event: string
+  data: any
+}
+
+// Read an NDJSON response from the backend ({"event": ..., "data": ...} per line),
+// yielding each event as soon as its line has arrived
+export async function* readEvents(response: Response): AsyncGenerator<StreamEvent> {
+  if (!response.body) return
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ""
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffered += decoder.decode(value, { stream: true })
+    const lines = buffered.split("\n")
+    buffered = lines.pop() ?? ""
+    for (const line of lines) {
+      if (line.trim()) yield JSON.parse(line)
+    }
+  }
+  if (buffered.trim()) yield JSON.parse(buffered)
+}
@@ -0,0 +1,33 @@
+"""
+gunicorn settings for the IR system: gunicorn -c gunicorn.conf.py wsgi:app
+Every setting can be overridden through the environment variables below.
+"""
+
+import os
+import multiprocessing
+
+bind = os.environ.get('IR_BIND', '0.0.0.0:5000')
+
+# Workers are processes, each serving several requests at once with threads.
+# Searches are numpy-heavy and release the GIL for most of their work.
+workers = int(os.environ.get('IR_WORKERS', min(4, multiprocessing.cpu_count())))
+threads = int(os.environ.get('IR_THREADS', 4))
+worker_class = 'gthread'
+
+# Open the index once in the master; forked workers share its mapped pages
+preload_app = True
+
+# Indexing runs in background jobs, so requests are short. Long streamed chat
+# answers are the slowest responses
+timeout = int(os.environ.get('IR_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+
+# Tell wsgi.py not to start threads in the master: they would not survive fork
+os.environ['IR_FORKED_WORKERS'] = '1'
+
+def post_fork(server, worker):
+    import app
+    app.start_worker()
@@ -0,0 +1,67 @@
+"""
+Content-addressed image store for the IR system
+Extracted images are written once, named by the SHA-256 of their PNG bytes,
+and served by /image/<id>. Search results and the index only carry an
+image's id and dimensions, never the image data.
+
+    extracted_images/
+        3f/
+            3fa9...c1.png
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+
+IMAGE_ID_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+class ImageStore:
+    """PNG files under root, addressed by content hash"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, image_id):
+        """File path of an image id, or None if the id is malformed"""
+        if not IMAGE_ID_PATTERN.fullmatch(image_id):
+            return None
+        return os.path.join(self.root, image_id[:2], image_id + '.png')
+
+    def put(self, data):
+        """Store PNG bytes (once per distinct content) and return their id"""
+        image_id = hashlib.sha256(data).hexdigest()
+        path = self.path(image_id)
+        if not os.path.exists(path):
+            folder = os.path.dirname(path)
+            os.makedirs(folder, exist_ok=True)
+            # Write to a temporary name first so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return image_id
+
+    def add(self, images):
+        """Store extracted images ({'data', 'width', 'height'}) and return their
+        references ({'id', 'width', 'height'}), as kept in doc_images
+        """
+        return [{'id': self.put(image['data']), 'width': image['width'], 'height': image['height']}
+                for image in images]
+
+    def prune(self, keep_ids):
+        """Delete stored images whose id is not in keep_ids; returns how many were removed"""
+        keep_ids = set(keep_ids)
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for folder in os.listdir(self.root):
+            folder_path = os.path.join(self.root, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for name in os.listdir(folder_path):
+                image_id, ext = os.path.splitext(name)
+                if ext == '.png' and image_id not in keep_ids:
+                    os.remove(os.path.join(folder_path, name))
+                    removed += 1
+        return removed
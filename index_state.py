@@ -0,0 +1,73 @@
+"""
+Published index state for the IR system
+Everything a search reads (document texts and metadata, the TF-IDF, BM25,
+semantic, snippet and filter indices) is held by one IndexState. A search
+takes the published state once and uses only that object, while updates
+work on a copy and publish it with a single reference swap, so no request
+ever sees a half-updated index.
+"""
+
+import copy
+import numpy as np
+from snippet_index import SnippetIndex
+from filter_index import FilterIndex
+from query_expansion import ExpansionTable
+
+class IndexState:
+    """One consistent version of the loaded index.
+
+    Attributes:
+        documents, doc_names, doc_images, doc_metadata: Per-document lists
+        tfidf_vectorizer, tfidf_matrix: TF-IDF model (None until built)
+        bm25_model: BM25Index (None until documents are added); its postings are
+            the term counts both lexical indices are built from
+        snippet_index: SnippetIndex for result snippets
+        semantic_index: Vector index over passage embeddings (None without the model)
+        passage_doc_ids, passage_spans: Document and (start, end) offsets of every passage
+        file_manifest: rel_path -> {mtime, size, hash, indexed}
+        filter_index: FilterIndex over doc_names
+        expansion_table: ExpansionTable of synonyms occurring in the documents
+        synonyms: (word, WordNet synonyms) pairs saved with the index, used to
+            seed the lookup memo before the expansion table is rebuilt
+        generation: Result cache generation, assigned when the state is published
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        """Drop all documents and indices"""
+        self.documents = []
+        self.doc_names = []
+        self.doc_images = []  # Image references ({'id', 'width', 'height'}) for each document
+        self.doc_metadata = []  # File size and modified time
+        self.tfidf_vectorizer = None
+        self.tfidf_matrix = None
+        self.bm25_model = None
+        self.snippet_index = SnippetIndex()
+        self.semantic_index = None
+        self.passage_doc_ids = np.zeros(0, dtype=np.int32)
+        self.passage_spans = np.zeros((0, 2), dtype=np.int64)
+        self.file_manifest = {}
+        self.filter_index = FilterIndex()
+        self.expansion_table = ExpansionTable()
+        self.synonyms = ()
+
+    def copy(self):
+        """Copy to apply an update to. Lists, dicts and index objects that updates
+        modify in place are duplicated; arrays (possibly memory-mapped) and
+        document texts are shared, as updates only ever replace them.
+        """
+        state = copy.copy(self)
+        for name in ('documents', 'doc_names', 'doc_images', 'doc_metadata'):
+            setattr(state, name, getattr(self, name).copy())
+        state.file_manifest = dict(self.file_manifest)
+        for name in ('bm25_model', 'snippet_index', 'semantic_index'):
+            index = getattr(self, name)
+            if index is not None:
+                index = copy.copy(index)
+                if isinstance(getattr(index, 'vocabulary', None), dict):
+                    index.vocabulary = dict(index.vocabulary)
+                setattr(state, name, index)
+        return state
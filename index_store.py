@@ -0,0 +1,296 @@
+"""
+On-disk index format for the IR system
+An index is a directory of generations. Each generation holds a
+manifest.json, NumPy .npy arrays (opened with mmap_mode='r'), sparse
+matrices stored as their CSR components, and string collections stored as
+one UTF-8 blob plus an offsets array. Nothing is unpickled at startup and
+worker processes share the mapped pages.
+
+    index/
+        CURRENT                 # name of the active generation
+        LOCK                    # held by the process updating the index (IndexLock)
+        gen-000003/
+            manifest.json
+            tfidf_matrix.data.npy
+            documents.bin
+            documents.offsets.npy
+            ...
+"""
+
+import os
+import copy
+import json
+import shutil
+from collections.abc import Sequence
+import numpy as np
+from scipy.sparse import csr_matrix
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'LOCK'
+
+class IndexFormatError(Exception):
+    """The index directory is missing, incomplete or written by an incompatible version"""
+
+def _load_array(path, mmap=True):
+    """Open a .npy file, memory-mapped unless it is empty"""
+    array = np.load(path, mmap_mode='r' if mmap else None)
+    if mmap and array.size == 0:
+        # Nothing to map, keep a regular (writable) empty array
+        array = np.array(array)
+    return array
+
+class LazySequence(Sequence):
+    """Read-only list backed by stored data, decoding items on access.
+    Items appended afterwards are kept in memory.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._extra = []
+
+    def _decode(self, i):
+        raise NotImplementedError
+
+    def __len__(self):
+        return self._size + len(self._extra)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('index out of range')
+        if i >= self._size:
+            return self._extra[i - self._size]
+        return self._decode(i)
+
+    def append(self, item):
+        self._extra.append(item)
+
+    def copy(self):
+        """Shallow copy sharing the stored data (appends to either stay separate)"""
+        clone = copy.copy(self)
+        clone._extra = list(self._extra)
+        return clone
+
+class StringStore(LazySequence):
+    """Strings stored back to back in a UTF-8 blob; item i is blob[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, blob, offsets):
+        super().__init__(len(offsets) - 1)
+        self.blob = blob
+        self.offsets = offsets
+
+    def _decode(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        # Decode everything in one pass instead of item by item
+        data = bytes(self.blob)
+        offsets = np.asarray(self.offsets).tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode('utf-8')
+        yield from self._extra
+
+class JSONStore(StringStore):
+    """StringStore whose items are JSON documents"""
+
+    def _decode(self, i):
+        return json.loads(super()._decode(i))
+
+    def __iter__(self):
+        stored = len(self.offsets) - 1
+        for i, item in enumerate(super().__iter__()):
+            yield json.loads(item) if i < stored else item
+
+class IndexWriter:
+    """Write a new index generation; it becomes visible only after commit()"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        while True:
+            generations = [int(name[4:]) for name in os.listdir(index_dir)
+                           if name.startswith('gen-') and name[4:].isdigit()]
+            self.generation = f"gen-{max(generations, default=0) + 1:06d}"
+            self.path = os.path.join(index_dir, self.generation)
+            try:
+                os.makedirs(self.path)
+                break
+            except FileExistsError:
+                # Another process (server worker) claimed this generation first
+                continue
+        self.manifest = {'format_version': FORMAT_VERSION, 'meta': {}, 'components': {}}
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def set(self, key, value):
+        """Store a small JSON-serializable value directly in the manifest"""
+        self.manifest['meta'][key] = value
+
+    def add_array(self, name, array):
+        array = np.ascontiguousarray(array)
+        np.save(self._file(name + '.npy'), array)
+        self.manifest['components'][name] = {'type': 'array', 'dtype': str(array.dtype),
+                                             'shape': list(array.shape)}
+
+    def add_sparse(self, name, matrix):
+        matrix = csr_matrix(matrix)
+        for part in ('data', 'indices', 'indptr'):
+            np.save(self._file(f"{name}.{part}.npy"), getattr(matrix, part))
+        self.manifest['components'][name] = {'type': 'sparse', 'shape': list(matrix.shape)}
+
+    def add_strings(self, name, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        with open(self._file(name + '.bin'), 'wb') as f:
+            for b in encoded:
+                f.write(b)
+        np.save(self._file(name + '.offsets.npy'), offsets)
+        self.manifest['components'][name] = {'type': 'strings', 'count': len(encoded)}
+
+    def add_json_list(self, name, items):
+        self.add_strings(name, (json.dumps(item) for item in items))
+        self.manifest['components'][name]['type'] = 'json'
+
+    def commit(self):
+        """Write the manifest and point CURRENT at this generation, then drop older ones"""
+        with open(self._file(MANIFEST_FILE), 'w') as f:
+            json.dump(self.manifest, f)
+        current = os.path.join(self.index_dir, CURRENT_FILE)
+        tmp = f"{current}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.generation)
+        os.replace(tmp, current)
+
+        for name in os.listdir(self.index_dir):
+            # Newer generations may still be being written by another process
+            if name.startswith('gen-') and name < self.generation:
+                # Generations still mapped by another process may not be deletable
+                # yet (Windows); they are retried on the next commit
+                shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+
+class IndexLock:
+    """Exclusive lock on an index directory, shared by every process using it.
+    Held while an update reads the current generation, modifies it and commits,
+    so concurrent updates from different server workers never overwrite each other.
+    Not reentrant: each process should take it once (see app.index_update_lock).
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._file = open(os.path.join(self.index_dir, LOCK_FILE), 'a+b')
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            else:
+                self._file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass  # LK_LOCK gives up after 10 seconds; keep waiting
+        except BaseException:
+            self._file.close()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+def current_generation(index_dir):
+    """Name of the generation CURRENT points at, or None if there is no index"""
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+class IndexReader:
+    """Open the current generation of an index directory"""
+
+    def __init__(self, index_dir, mmap=True):
+        self.mmap = mmap
+        try:
+            with open(os.path.join(index_dir, CURRENT_FILE)) as f:
+                self.generation = f.read().strip()
+            self.path = os.path.join(index_dir, self.generation)
+            with open(os.path.join(self.path, MANIFEST_FILE)) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise IndexFormatError(f"No readable index in {index_dir}: {e}")
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise IndexFormatError(f"Index format {self.manifest.get('format_version')} "
+                                   f"is not supported (expected {FORMAT_VERSION})")
+        self.meta = self.manifest['meta']
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def __contains__(self, name):
+        return name in self.manifest['components']
+
+    def array(self, name):
+        return _load_array(self._file(name + '.npy'), self.mmap)
+
+    def sparse(self, name):
+        shape = tuple(self.manifest['components'][name]['shape'])
+        parts = [_load_array(self._file(f"{name}.{part}.npy"), self.mmap)
+                 for part in ('data', 'indices', 'indptr')]
+        return csr_matrix(tuple(parts), shape=shape, copy=False)
+
+    def _blob(self, name):
+        path = self._file(name + '.bin')
+        if self.mmap and os.path.getsize(path) > 0:
+            return np.memmap(path, dtype=np.uint8, mode='r')
+        with open(path, 'rb') as f:
+            return np.frombuffer(f.read(), dtype=np.uint8)
+
+    def strings(self, name):
+        return StringStore(self._blob(name), self.array(name + '.offsets'))
+
+    def json_list(self, name):
+        return JSONStore(self._blob(name), self.array(name + '.offsets'))
+
+def write_object(writer, name, obj):
+    """Store an index object's PARAMS in the manifest and its ARRAYS as .npy files"""
+    writer.set(name, {'class': type(obj).__name__,
+                      'params': {param: getattr(obj, param) for param in obj.PARAMS}})
+    for array in obj.ARRAYS:
+        writer.add_array(f"{name}.{array}", getattr(obj, array))
+
+def read_object(reader, name, classes):
+    """Rebuild an object saved with write_object; classes lists the allowed types"""
+    info = reader.meta[name]
+    cls = {c.__name__: c for c in classes}.get(info['class'])
+    if cls is None:
+        raise IndexFormatError(f"Unknown object type {info['class']} for {name}")
+    obj = cls.__new__(cls)
+    obj.__dict__.update(info['params'])
+    for array in cls.ARRAYS:
+        setattr(obj, array, reader.array(f"{name}.{array}"))
+    return obj
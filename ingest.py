@@ -0,0 +1,245 @@
+"""
+Document ingestion for the IR system
+Text/image extraction for PDF and TXT files, plus a parallel pipeline that
+fans files out to a process pool. Kept free of Flask and model imports, but
+workers are spawned and re-import the main script (all of app.py under
+`python app.py`, about 2 s), so small batches are extracted in-process.
+"""
+
+import os
+import io
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import PyPDF2
+from PIL import Image
+
+def _import_pymupdf():
+    """Import PyMuPDF, or return None when it is not installed"""
+    try:
+        import pymupdf
+        return pymupdf
+    except ImportError:
+        pass
+    try:
+        import fitz  # Older PyMuPDF releases only ship the fitz name
+        return fitz
+    except ImportError:
+        return None
+
+def _encode_pdf_image(pdf_document, xref):
+    """Convert an embedded PDF image to {'data': PNG bytes, 'width', 'height'},
+    or None if it doesn't qualify
+    """
+    try:
+        base_image = pdf_document.extract_image(xref)
+        image_bytes = base_image["image"]
+        
+        # Convert to PIL Image
+        img = Image.open(io.BytesIO(image_bytes))
+        
+        # Skip very small images
+        if img.width < 50 or img.height < 50:
+            return None
+        
+        # Resize if too large
+        if img.width > 600 or img.height > 600:
+            img.thumbnail((600, 600), Image.Resampling.LANCZOS)
+        
+        # Convert to RGB if necessary
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        
+        # Raw PNG bytes; the app stores them in its image store (see image_store.py)
+        buffered = io.BytesIO()
+        img.save(buffered, format="PNG")
+        return {'data': buffered.getvalue(), 'width': img.width, 'height': img.height}
+    except Exception:
+        return None
+
+def _collect_page_images(pdf_document, page, images, max_images):
+    """Append qualifying images from one page until max_images is reached"""
+    for img_info in page.get_images(full=True):
+        if len(images) >= max_images:
+            break
+        image = _encode_pdf_image(pdf_document, img_info[0])
+        if image:
+            images.append(image)
+
+def extract_images_from_pdf(pdf_path, max_images=3, max_pages=10):
+    """Extract images from PDF file (separate pass, see extract_pdf)"""
+    images = []
+    fitz = _import_pymupdf()
+    if fitz is None:
+        # Fallback: PyMuPDF not installed, skip image extraction
+        return images
+    try:
+        pdf_document = fitz.open(pdf_path)
+        try:
+            for page_num in range(min(max_pages, len(pdf_document))):
+                if len(images) >= max_images:
+                    break
+                _collect_page_images(pdf_document, pdf_document[page_num], images, max_images)
+        finally:
+            pdf_document.close()
+    except Exception:
+        pass
+    
+    return images
+
+def extract_pdf(pdf_path, max_pages=20, max_images=3):
+    """Extract text and images from a PDF with a single PyMuPDF open.
+    Falls back to PyPDF2 for the text if PyMuPDF is missing or gets nothing.
+    Returns (text, images)
+    """
+    fitz = _import_pymupdf()
+    if fitz is None:
+        return extract_text_from_pdf(pdf_path, max_pages), []
+    
+    text_parts = []
+    images = []
+    try:
+        pdf_document = fitz.open(pdf_path)
+        try:
+            for page_num in range(min(max_pages, len(pdf_document))):
+                try:
+                    page = pdf_document[page_num]
+                    page_text = page.get_text()
+                    if page_text:
+                        text_parts.append(page_text)
+                    if len(images) < max_images:
+                        _collect_page_images(pdf_document, page, images, max_images)
+                except (KeyboardInterrupt, SystemExit):
+                    raise
+                except Exception:
+                    # Skip problematic pages silently
+                    continue
+        finally:
+            pdf_document.close()
+    except (KeyboardInterrupt, SystemExit):
+        raise
+    except Exception:
+        pass
+    
+    text = "\n".join(text_parts)
+    if not text.strip():
+        text = extract_text_from_pdf(pdf_path, max_pages)
+    return text, images
+
+def extract_text_from_pdf(pdf_path, max_pages=20):
+    """Extract text from PDF file with error handling"""
+    text = ""
+    try:
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            # Limit to first max_pages pages for performance
+            max_pages = min(max_pages, len(pdf_reader.pages))
+            for i in range(max_pages):
+                try:
+                    page_text = pdf_reader.pages[i].extract_text()
+                    if page_text:
+                        text += page_text + "\n"
+                except (KeyboardInterrupt, SystemExit):
+                    raise
+                except Exception:
+                    # Skip problematic pages silently
+                    continue
+    except (KeyboardInterrupt, SystemExit):
+        raise
+    except Exception as e:
+        # Skip entire PDF if unreadable
+        return ""
+    return text
+
+def extract_text_from_txt(txt_path):
+    """Extract text from text file"""
+    try:
+        with open(txt_path, 'r', encoding='utf-8', errors='ignore') as file:
+            return file.read()
+    except Exception as e:
+        print(f"Error reading text file {txt_path}: {e}")
+        return ""
+
+def extract_document(file_path, max_pages=20, max_images=3):
+    """Extract (text, images) from a supported file, or None if it has no usable text"""
+    if file_path.endswith('.pdf'):
+        text, images = extract_pdf(file_path, max_pages, max_images)
+        if not text or len(text.strip()) < 50:
+            # Skip PDFs with no extractable text
+            return None
+    elif file_path.endswith('.txt'):
+        text = extract_text_from_txt(file_path)
+        images = []
+    else:
+        return None
+
+    if not text.strip():
+        return None
+    return text, images
+
+# Fewest files worth starting the process pool for: spawned workers take about
+# 2 s to start under `python app.py`, which a few files cannot make up for
+POOL_MIN_FILES = 10
+
+def default_workers():
+    """Number of worker processes to use when none is configured"""
+    return os.cpu_count() or 1
+
+def _ingest_one(job):
+    """Extract a single file inside a worker; never raises"""
+    rel_path, file_path, max_pages, max_images = job
+    started = time.perf_counter()
+    result = {'rel_path': rel_path, 'text': None, 'images': [], 'error': None}
+    try:
+        extracted = extract_document(file_path, max_pages, max_images)
+        if extracted:
+            result['text'], result['images'] = extracted
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+def pool_size(num_files, workers, min_files=POOL_MIN_FILES):
+    """Processes ingest_files uses for num_files files (1 = in-process)"""
+    if workers <= 1 or num_files < max(2, min_files):
+        return 1
+    return min(workers, num_files)
+
+def ingest_files(files, workers=1, max_pages=20, max_images=3, min_files=POOL_MIN_FILES):
+    """Extract many files, yielding one result dict per file in input order.
+
+    Args:
+        files: List of (rel_path, file_path) tuples
+        workers: Number of processes; 1 (or fewer than min_files files) runs in-process
+        max_pages: Page limit per PDF
+        max_images: Image limit per PDF
+        min_files: Fewest files to start the process pool for
+
+    Yields:
+        {'rel_path', 'text', 'images', 'seconds', 'error'} - text is None when
+        the file had no usable text, error is set when extraction failed
+    """
+    jobs = [(rel_path, file_path, max_pages, max_images) for rel_path, file_path in files]
+
+    processes = pool_size(len(jobs), workers, min_files)
+    if processes == 1:
+        for job in jobs:
+            yield _ingest_one(job)
+        return
+
+    # Spawned rather than forked: the pool is started from a job thread of a
+    # multi-threaded server, and a forked child could inherit a lock some other
+    # thread held at fork time and deadlock. (forkserver does not start faster:
+    # its children re-import the main script as well)
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        # Submit everything up front, then collect in order so results stream
+        # back deterministically while later files are still being processed
+        futures = [executor.submit(_ingest_one, job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # Worker crashed (e.g. BrokenProcessPool), report and carry on
+                yield {'rel_path': job[0], 'text': None, 'images': [],
+                       'error': f"{type(e).__name__}: {e}", 'seconds': 0.0}
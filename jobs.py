@@ -0,0 +1,209 @@
+"""
+Background job queue for the IR system
+/reload and /upload enqueue indexing jobs and return right away. One worker
+thread runs the jobs in order while searches keep using the published index.
+That orders jobs within a process only; index updates from different server
+workers are serialized by app.index_update_lock. Jobs report their progress (stage,
+files done, errors) as they run, and /jobs/<id> reports it to clients.
+
+With a root directory every job is also written to root/<id>.json on each
+update, so any server worker can answer /jobs/<id>, not just the one that
+runs the job.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+class Job:
+    """One queued unit of work and its progress.
+
+    Attributes:
+        status: queued, running, done or failed
+        stage: What the job is doing right now (set by the job function)
+        done, total: Work items (files) finished and expected
+        errors: Problems that did not stop the job (e.g. files that failed to extract)
+        result: Return value of the job function once done
+        error: Why the job failed
+    """
+
+    def __init__(self, kind, func, args=(), on_update=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.done = 0
+        self.total = 0
+        self.errors = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._func = func
+        self._args = args
+        self._on_update = on_update
+        self._counting_since = None
+        self._finished = threading.Event()
+
+    def update(self, stage=None, done=None, total=None, error=None):
+        """Report progress; called by the job function (e.g. as load_documents' progress)"""
+        if stage is not None:
+            self.stage = stage
+        if total is not None:
+            self.total = total
+            self._counting_since = time.time()
+        if done is not None:
+            self.done = done
+        if error is not None:
+            self.errors.append(error)
+        if self._on_update:
+            self._on_update(self)
+
+    def eta(self):
+        """Estimated seconds until all work items are done, from the rate so far (None if unknown)"""
+        if self.status != 'running' or not self.done or self.done >= self.total or self._counting_since is None:
+            return None
+        elapsed = time.time() - self._counting_since
+        return round(elapsed / self.done * (self.total - self.done), 1)
+
+    def run(self):
+        self.status = 'running'
+        self.started_at = time.time()
+        self.update(stage='starting')
+        try:
+            self.result = self._func(self, *self._args)
+            self.status = 'done'
+            self.stage = 'done'
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+        self.finished_at = time.time()
+        self.update()
+        self._finished.set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns False on timeout"""
+        return self._finished.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'done': self.done,
+            'total': self.total,
+            'errors': list(self.errors),
+            'result': self.result,
+            'error': self.error,
+            'eta_seconds': self.eta(),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+class JobQueue:
+    """FIFO queue of Jobs run by one background thread.
+
+    Args:
+        root: Directory where job states are written (None = in memory only)
+        max_jobs: Finished jobs kept (in memory and on disk) for status requests
+    """
+
+    def __init__(self, root=None, max_jobs=100):
+        self.root = root
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, kind, func, *args):
+        """Queue func(job, *args) and return the Job right away"""
+        job = Job(kind, func, args, on_update=self._save)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+            if self._worker is None or not self._worker.is_alive():
+                # Started on first use, so forked server workers get their own thread
+                self._worker = threading.Thread(target=self._run, name='index-jobs', daemon=True)
+                self._worker.start()
+        self._save(job)
+        self._queue.put(job)
+        return job
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.run()
+            self._prune_files()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+    def _path(self, job_id):
+        if self.root is None or not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        return os.path.join(self.root, job_id + '.json')
+
+    def _save(self, job):
+        """Write the job's state to root/<id>.json (atomically, readers never see a partial file)"""
+        path = self._path(job.id)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(job.to_dict(), f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error saving job {job.id}: {e}")
+
+    def _prune_files(self):
+        """Delete the oldest job files beyond max_jobs"""
+        if self.root is None or not os.path.isdir(self.root):
+            return
+        files = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if name.endswith('.json'):
+                    files.append((os.path.getmtime(path), path))
+            except OSError:
+                pass  # Removed by another worker meanwhile
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_jobs)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, job_id):
+        """Status dict of a job (run by this or another process), or None if unknown"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        path = self._path(job_id)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list(self):
+        """Status dicts of the jobs known to this process, newest first"""
+        return [job.to_dict() for job in reversed(list(self._jobs.values()))]
@@ -0,0 +1,183 @@
+"""
+Query caches for the IR system
+ResultCache keeps the final results of recent searches, bounded by entry
+count (LRU) and age (TTL). Keys include the index generation, so results
+computed against an older index are never returned.
+EmbeddingCache memoizes query embeddings, bounded by entries and bytes,
+and can be saved to / loaded from an .npz file across restarts.
+"""
+
+import os
+import re
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so trivially different queries share an entry"""
+    return re.sub(r'\s+', ' ', query.strip().lower())
+
+class ResultCache:
+    """Thread-safe LRU + TTL cache of search results.
+
+    Args:
+        max_entries: Maximum number of cached searches (0 disables caching)
+        ttl: Seconds an entry stays valid (0 = no expiry)
+        clock: Time source, replaceable in tests
+    """
+
+    def __init__(self, max_entries=256, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query, search_type, filter_files, top_k, generation, offset=0, min_score=None):
+        # The generation stays last so callers can check it after searching
+        return (normalize_query(query), search_type, tuple(sorted(filter_files or ())), top_k,
+                offset, min_score, generation)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Cached value for key, or None (counted as a miss)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of query text -> float32 embedding.
+
+    Args:
+        max_entries: Maximum number of cached embeddings (0 disables caching)
+        max_bytes: Maximum total size of the cached vectors
+        model_name: Embeddings saved for a different model are not loaded
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 2**20, model_name=''):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()  # normalized text -> vector
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text):
+        # Only whitespace is normalized: case can matter to cased models
+        return re.sub(r'\s+', ' ', text.strip())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, text):
+        key = self.make_key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.max_entries <= 0 or vector.nbytes > self.max_bytes:
+            return
+        key = self.make_key(text)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = vector
+            self.nbytes += vector.nbytes
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def save(self, path):
+        """Write the cached embeddings (least recently used first) to an .npz file"""
+        with self._lock:
+            keys = list(self._entries)
+            vectors = list(self._entries.values())
+        if not keys:
+            return
+        # Write to a temporary name first so readers (and other processes
+        # saving at shutdown) never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, model=np.array(self.model_name), keys=np.array(keys),
+                         vectors=np.vstack(vectors))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def load(self, path):
+        """Add embeddings saved by save(); returns how many were loaded"""
+        if not os.path.exists(path):
+            return 0
+        with np.load(path) as data:
+            if str(data['model']) != self.model_name:
+                return 0
+            keys, vectors = data['keys'].tolist(), data['vectors']
+        for key, vector in zip(keys, vectors):
+            self.put(key, vector)
+        return len(keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
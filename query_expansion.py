@@ -0,0 +1,62 @@
+"""
+Query expansion table for the IR system
+Maps index terms to synonyms (from WordNet) that occur in the indexed
+collection. The table is built with the lexical indices, so expanding a
+query is one dictionary lookup per term instead of WordNet calls, and only
+adds terms that can actually match a document.
+"""
+
+class ExpansionTable:
+    """Index term -> expansion index terms.
+
+    Args:
+        expansions: Dict mapping term -> tuple of terms to add for it
+    """
+
+    def __init__(self, expansions=None):
+        self.expansions = expansions or {}
+
+    def __len__(self):
+        return len(self.expansions)
+
+    def expand(self, terms, weight):
+        """(terms, weights): the query terms with weight 1, followed by their
+        expansion terms (each once, none already in the query) with weight
+        """
+        expanded = list(terms)
+        seen = set(terms)
+        for term in terms:
+            for extra in self.expansions.get(term, ()):
+                if extra not in seen:
+                    seen.add(extra)
+                    expanded.append(extra)
+        return expanded, [1.0] * len(terms) + [weight] * (len(expanded) - len(terms))
+
+def build_expansion_table(words, analyze, vocabulary, synonyms, max_terms=3):
+    """Expansion table for a collection.
+
+    Args:
+        words: Surface words occurring in the collection
+        analyze: Function mapping a word to its index terms
+        vocabulary: Index terms present in the collection (expansions are restricted to them)
+        synonyms: Function mapping a word to its synonym words, best first
+        max_terms: Most expansion terms per index term
+    """
+    expansions = {}
+    for word in words:
+        terms = analyze(word)
+        if len(terms) != 1 or terms[0] not in vocabulary:
+            continue
+        term = terms[0]
+        found = expansions.get(term, [])
+        for synonym in synonyms(word):
+            if len(found) >= max_terms:
+                break
+            # Only single-term synonyms, so an expansion is one weighted query term
+            synonym_terms = analyze(synonym)
+            if (len(synonym_terms) == 1 and synonym_terms[0] in vocabulary
+                    and synonym_terms[0] != term and synonym_terms[0] not in found):
+                found.append(synonym_terms[0])
+        if found:
+            expansions[term] = found
+    return ExpansionTable({term: tuple(found) for term, found in expansions.items()})
@@ -0,0 +1,220 @@
+"""
+Sentence and term position index for the IR system
+Stores, per document, the offsets of sentence boundary characters and the
+positions of every lowercased word, so result snippets are placed by
+binary search over offsets instead of re-scanning the document text with
+one regex per query word for every hit.
+"""
+
+import re
+from bisect import bisect_left
+from itertools import repeat
+import numpy as np
+
+WORD_PATTERN = re.compile(r'\w+')
+BOUNDARY_CHARS = '.!?\n'
+BOUNDARY_PATTERN = re.compile(r'[.!?\n]')
+
+class TextPositions:
+    """Query matches and sentence boundaries found by scanning text[lo:hi].
+    Used for documents the SnippetIndex does not cover.
+    """
+
+    def __init__(self, text, lo=0, hi=None):
+        self.text = text
+        self.lo = lo
+        self.hi = len(text) if hi is None else hi
+        self._lower = None
+
+    def matches(self, words, limit=None):
+        """Sorted (start, end, word) of every word-prefix match of the given words"""
+        if self._lower is None:
+            self._lower = self.text[self.lo:self.hi].lower()
+        matches = []
+        for word in words:
+            pattern = r'\b' + re.escape(word) + r'\w*\b'
+            for match in re.finditer(pattern, self._lower):
+                matches.append((self.lo + match.start(), self.lo + match.end(), word))
+        matches.sort()
+        return matches[:limit]
+
+    def sentence_start(self, pos):
+        """Start of the sentence containing pos (just after the previous boundary)"""
+        text, lo = self.text, self.lo
+        while pos > lo and text[pos] not in BOUNDARY_CHARS:
+            pos -= 1
+        return pos + 1 if pos > lo else lo
+
+    def sentence_end(self, pos):
+        """Offset of the next sentence boundary at or after pos"""
+        text, hi = self.text, self.hi
+        while pos < hi and text[pos] not in BOUNDARY_CHARS:
+            pos += 1
+        return pos
+
+class IndexedPositions(TextPositions):
+    """TextPositions answered from a SnippetIndex"""
+
+    def __init__(self, index, doc_id, text, lo=0, hi=None):
+        super().__init__(text, lo, hi)
+        self.index = index
+        self.doc_id = doc_id
+        start, end = index.bound_indptr[doc_id], index.bound_indptr[doc_id + 1]
+        self.bounds = index.bounds[start:end]
+
+    def matches(self, words, limit=None):
+        matches = []
+        for word in words:
+            if not WORD_PATTERN.fullmatch(word):
+                # Words with punctuation need the regex's exact boundary rules
+                matches.extend(super().matches([word]))
+                continue
+            starts, ends = self.index.term_positions(self.doc_id, self.index.prefix_ids(word))
+            inside = (starts >= self.lo) & (ends <= self.hi)
+            starts, ends = starts[inside], ends[inside]
+            if limit is not None and len(starts) > limit:
+                first = np.argsort(starts, kind='stable')[:limit]
+                starts, ends = starts[first], ends[first]
+            matches.extend(zip(starts.tolist(), ends.tolist(), repeat(word)))
+        matches.sort()
+        return matches[:limit]
+
+    def sentence_start(self, pos):
+        i = np.searchsorted(self.bounds, pos, side='right') - 1
+        if i >= 0 and self.bounds[i] > self.lo:
+            return int(self.bounds[i]) + 1
+        return self.lo
+
+    def sentence_end(self, pos):
+        i = np.searchsorted(self.bounds, pos, side='left')
+        if i < len(self.bounds) and self.bounds[i] < self.hi:
+            return int(self.bounds[i])
+        return self.hi
+
+def _word_boundary(text, pos):
+    """True unless pos falls inside a run of word characters"""
+    return not (0 < pos < len(text) and WORD_PATTERN.fullmatch(text[pos - 1:pos + 1]))
+
+class SnippetIndex:
+    """Sentence boundaries and positional term postings of every document.
+
+    Attributes:
+        vocabulary: Dict mapping lowercased word -> term id
+        token_indptr: Tokens of document d are token_*[token_indptr[d]:token_indptr[d + 1]]
+        token_terms: Term id of every token, sorted by (term, position) within a document
+        token_starts: Offset of every token in the lowercased text
+        token_ends: End offset of every token
+        bound_indptr: Boundaries of document d are bounds[bound_indptr[d]:bound_indptr[d + 1]]
+        bounds: Sorted offsets of sentence boundary characters ('.', '!', '?', newline)
+        indexed: False for documents whose lowercased text changes length (always scanned)
+    """
+
+    # Attributes persisted by index_store (the vocabulary is stored separately)
+    PARAMS = ()
+    ARRAYS = ('token_indptr', 'token_terms', 'token_starts', 'token_ends', 'bound_indptr', 'bounds', 'indexed')
+
+    _sorted_terms = None  # (terms, term ids) in lexicographic order, for prefix lookups
+
+    def __init__(self, texts=()):
+        self.vocabulary = {}
+        self.token_indptr = np.zeros(1, dtype=np.int64)
+        self.token_terms = np.zeros(0, dtype=np.int32)
+        self.token_starts = np.zeros(0, dtype=np.int32)
+        self.token_ends = np.zeros(0, dtype=np.int32)
+        self.bound_indptr = np.zeros(1, dtype=np.int64)
+        self.bounds = np.zeros(0, dtype=np.int32)
+        self.indexed = np.zeros(0, dtype=bool)
+        self.add_documents(texts)
+
+    @property
+    def num_docs(self):
+        return len(self.token_indptr) - 1
+
+    def add_documents(self, texts):
+        """Append documents to the index"""
+        vocabulary = self.vocabulary
+        terms, starts, ends, token_counts = [], [], [], []
+        bounds, bound_counts, indexed = [], [], []
+        for text in texts:
+            lower = text.lower()
+            if len(lower) != len(text):
+                token_counts.append(0)
+                bound_counts.append(0)
+                indexed.append(False)
+                continue
+            count = len(terms)
+            for match in WORD_PATTERN.finditer(lower):
+                terms.append(vocabulary.setdefault(match.group(), len(vocabulary)))
+                starts.append(match.start())
+                ends.append(match.end())
+            token_counts.append(len(terms) - count)
+            count = len(bounds)
+            bounds.extend(match.start() for match in BOUNDARY_PATTERN.finditer(text))
+            bound_counts.append(len(bounds) - count)
+            indexed.append(True)
+        if not indexed:
+            return
+
+        # Group each new document's tokens by term, in position order
+        new_terms = np.array(terms, dtype=np.int32)
+        new_starts = np.array(starts, dtype=np.int32)
+        docs = np.repeat(np.arange(len(token_counts)), token_counts)
+        order = np.lexsort((new_starts, new_terms, docs))
+        self.token_terms = np.concatenate([self.token_terms, new_terms[order]])
+        self.token_starts = np.concatenate([self.token_starts, new_starts[order]])
+        self.token_ends = np.concatenate([self.token_ends, np.array(ends, dtype=np.int32)[order]])
+        self.token_indptr = np.concatenate([self.token_indptr, self.token_indptr[-1] + np.cumsum(token_counts)])
+        self.bounds = np.concatenate([self.bounds, np.array(bounds, dtype=np.int32)])
+        self.bound_indptr = np.concatenate([self.bound_indptr, self.bound_indptr[-1] + np.cumsum(bound_counts)])
+        self.indexed = np.concatenate([self.indexed, indexed])
+        self._sorted_terms = None
+
+    def remove_documents(self, keep):
+        """Drop documents; keep is a boolean mask (or index list) of documents to keep"""
+        keep_mask = np.zeros(self.num_docs, dtype=bool)
+        keep_mask[keep] = True
+        token_counts = np.diff(self.token_indptr)
+        bound_counts = np.diff(self.bound_indptr)
+        token_mask = np.repeat(keep_mask, token_counts)
+        bound_mask = np.repeat(keep_mask, bound_counts)
+
+        self.token_terms = self.token_terms[token_mask]
+        self.token_starts = self.token_starts[token_mask]
+        self.token_ends = self.token_ends[token_mask]
+        self.token_indptr = np.concatenate([[0], np.cumsum(token_counts[keep_mask])]).astype(np.int64)
+        self.bounds = self.bounds[bound_mask]
+        self.bound_indptr = np.concatenate([[0], np.cumsum(bound_counts[keep_mask])]).astype(np.int64)
+        self.indexed = self.indexed[keep_mask]
+
+    def prefix_ids(self, prefix):
+        """Ids of all terms starting with prefix"""
+        if self._sorted_terms is None:
+            terms = sorted(self.vocabulary)
+            self._sorted_terms = (terms, [self.vocabulary[term] for term in terms])
+        terms, term_ids = self._sorted_terms
+        first = i = bisect_left(terms, prefix)
+        while i < len(terms) and terms[i].startswith(prefix):
+            i += 1
+        return term_ids[first:i]
+
+    def term_positions(self, doc_id, term_ids):
+        """(starts, ends) of the occurrences of the given terms in document doc_id"""
+        start, end = self.token_indptr[doc_id], self.token_indptr[doc_id + 1]
+        doc_terms = self.token_terms[start:end]
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        left = np.searchsorted(doc_terms, term_ids, side='left')
+        right = np.searchsorted(doc_terms, term_ids, side='right')
+        ranges = [np.arange(l, r) for l, r in zip(left.tolist(), right.tolist()) if r > l]
+        rows = start + (np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64))
+        return self.token_starts[rows], self.token_ends[rows]
+
+    def positions(self, doc_id, text, span=None):
+        """Match/boundary lookups for text[span[0]:span[1]] of document doc_id.
+        Falls back to scanning when the document is not covered, or the span
+        cuts through a word (token positions would not line up with it).
+        """
+        lo, hi = span if span is not None else (0, len(text))
+        if (doc_id < self.num_docs and self.indexed[doc_id]
+                and _word_boundary(text, lo) and _word_boundary(text, hi)):
+            return IndexedPositions(self, doc_id, text, lo, hi)
+        return TextPositions(text, lo, hi)
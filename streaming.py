@@ -0,0 +1,91 @@
+"""
+Streaming and compressed HTTP responses for the IR system
+Search hits and chat tokens can be sent as NDJSON lines or Server-Sent
+Events while they are produced, and JSON responses are gzip/brotli
+compressed according to the client's Accept-Encoding. Streams are
+compressed with a flush after every event, so compression never holds
+an event back.
+
+Every stream is a sequence of (event, data) pairs, sent as
+    NDJSON: {"event": "result", "data": {...}}\\n
+    SSE:    event: result\\ndata: {...}\\n\\n
+"""
+
+import json
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    # Optional dependency: without it responses are only gzip-compressed
+    brotli = None
+
+STREAM_MIMETYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
+def negotiate_stream(requested=None, accept=''):
+    """Stream format for a request: 'ndjson', 'sse' or None (plain JSON).
+    An explicit `stream` field in the request body wins over the Accept header.
+    """
+    if requested is True:
+        return 'ndjson'
+    if requested in STREAM_MIMETYPES:
+        return requested
+    if requested is not None:
+        return None
+    for fmt, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in (accept or ''):
+            return fmt
+    return None
+
+def format_event(event, data, fmt):
+    """One stream event as text"""
+    if fmt == 'sse':
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({'event': event, 'data': data}) + "\n"
+
+def negotiate_encoding(accept_encoding):
+    """Best supported Content-Encoding for an Accept-Encoding header, or None"""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+
+    def accepted(name):
+        return offered.get(name, offered.get('*', 0)) > 0
+
+    if brotli is not None and accepted('br'):
+        return 'br'
+    if accepted('gzip'):
+        return 'gzip'
+    return None
+
+def compress(data, encoding):
+    """Compress a complete body"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    return compressor.compress(data) + compressor.flush()
+
+def compress_stream(chunks, encoding=None):
+    """Encode text chunks as UTF-8 and compress them, flushing after every chunk"""
+    if encoding is None:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            yield compressor.process(chunk.encode('utf-8')) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            yield compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
@@ -22,7 +22,7 @@ def test_basic_functionality():
     print("\\nTesting configuration...")
     try:
         assert 'max_pages_per_pdf' in app.CONFIG
-        assert 'hybrid_alpha' in app.CONFIG
+        assert 'hybrid_weights' in app.CONFIG
         print(f"✓ Configuration loaded: {len(app.CONFIG)} parameters")
     except Exception as e:
         print(f"✗ Configuration error: {e}")
@@ -148,6 +148,1369 @@ def test_file_filtering():
     except Exception as e:
         print(f"✗ Filtering error: {e}")
 
+def test_incremental_indexing():
+    """Test that only added/changed/removed files are re-indexed"""
+    import app
+    import tempfile
+    import shutil
+    
+    print("\\nTesting incremental indexing...")
+    saved_paths = (app.DOCS_DIR, app.INDEX_DIR)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        app.DOCS_DIR = os.path.join(temp_dir, 'docs')
+        app.INDEX_DIR = os.path.join(temp_dir, 'index')
+        os.makedirs(os.path.join(app.DOCS_DIR, 'DBMS'))
+        
+        def write(rel_path, text):
+            with open(os.path.join(app.DOCS_DIR, rel_path), 'w') as f:
+                f.write(text)
+        
+        write('DBMS/normalization.txt', "Database normalization removes redundancy from relational tables.")
+        write('ml.txt', "Supervised learning trains a model on labelled examples.")
+        app.load_documents(force_reload=True)
+        assert sorted(app.doc_names) == sorted(['DBMS/normalization.txt'.replace('/', os.sep), 'ml.txt'])
+        
+        # Unchanged folder: nothing is extracted again
+        extracted = []
+        original_ingest = app.ingest_files
+        def spy_ingest(files, **kwargs):
+            extracted.extend(rel_path for rel_path, file_path in files)
+            return original_ingest(files, **kwargs)
+        app.ingest_files = spy_ingest
+        try:
+            app.reset_index()
+            app.load_documents()
+            assert extracted == [], extracted
+            assert len(app.documents) == 2
+            
+            write('ir.txt', "Information retrieval ranks documents with BM25 and TF-IDF scoring.")
+            os.remove(os.path.join(app.DOCS_DIR, 'ml.txt'))
+            app.load_documents()
+            assert extracted == ['ir.txt'], extracted
+        finally:
+            app.ingest_files = original_ingest
+        
+        assert sorted(app.doc_names) == sorted(['DBMS/normalization.txt'.replace('/', os.sep), 'ir.txt'])
+        assert app.tfidf_matrix.shape[0] == len(app.documents) == app.bm25_model.corpus_size
+        results = app.search_tfidf("retrieval ranking")
+        assert results and results[0]['filename'] == 'ir.txt'
+        # (BM25 idf is zero with two documents, so check the postings instead)
+        term_id = app.bm25_model.vocabulary['retriev']
+        postings = app.bm25_model.doc_ids[app.bm25_model.indptr[term_id]:app.bm25_model.indptr[term_id + 1]]
+        assert [app.doc_names[i] for i in postings] == ['ir.txt']
+        print("✓ Incremental indexing only processed the changed files")
+    finally:
+        app.DOCS_DIR, app.INDEX_DIR = saved_paths
+        app.reset_index()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_parallel_ingestion():
+    """Test that the process pool returns the same results, in order, as a serial run"""
+    import ingest
+    import tempfile
+    import shutil
+    
+    print("\\nTesting parallel ingestion...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        files = []
+        for i in range(4):
+            file_path = os.path.join(temp_dir, f"doc{i}.txt")
+            with open(file_path, 'w') as f:
+                f.write(f"Document number {i} about parallel ingestion.")
+            files.append((f"doc{i}.txt", file_path))
+        files.append(("missing.pdf", os.path.join(temp_dir, "missing.pdf")))
+        
+        serial = list(ingest.ingest_files(files, workers=1))
+        parallel = list(ingest.ingest_files(files, workers=2, min_files=2))
+        
+        # Batches too small to pay for starting the pool are extracted in-process
+        assert ingest.pool_size(len(files), workers=4) == 1
+        assert ingest.pool_size(ingest.POOL_MIN_FILES, workers=4) == 4
+        saved_pool = ingest.ProcessPoolExecutor
+        try:
+            ingest.ProcessPoolExecutor = None
+            assert [r['text'] for r in ingest.ingest_files(files, workers=2)] == [r['text'] for r in serial]
+        finally:
+            ingest.ProcessPoolExecutor = saved_pool
+        
+        assert [r['rel_path'] for r in parallel] == [rel_path for rel_path, _ in files]
+        assert [r['text'] for r in parallel] == [r['text'] for r in serial]
+        assert parallel[-1]['text'] is None
+        assert all(r['seconds'] >= 0 for r in parallel)
+        print(f"✓ Parallel ingestion matches serial order and output ({len(parallel)} files)")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_single_pass_pdf_extraction():
+    """Test that extract_pdf reads text in one PyMuPDF pass and honours the page limit"""
+    import ingest
+    import tempfile
+    import shutil
+    
+    print("\\nTesting single-pass PDF extraction...")
+    fitz = ingest._import_pymupdf()
+    if fitz is None:
+        print("⚠ PyMuPDF not installed, skipping")
+        return
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pdf_path = os.path.join(temp_dir, "three_pages.pdf")
+        pdf_document = fitz.open()
+        for i in range(3):
+            page = pdf_document.new_page()
+            page.insert_text((72, 72), f"Page {i} discusses inverted index construction.")
+        pdf_document.save(pdf_path)
+        pdf_document.close()
+        
+        text, images = ingest.extract_pdf(pdf_path, max_pages=2, max_images=3)
+        assert "Page 0" in text and "Page 1" in text
+        assert "Page 2" not in text
+        assert images == []
+        print("✓ Single-pass extraction respects max_pages")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_bm25_index():
+    """Test that BM25Index scores match rank_bm25.BM25Okapi, also after incremental updates"""
+    import random
+    import numpy as np
+    from bm25_index import BM25Index
+    
+    print("\\nTesting BM25 inverted index...")
+    try:
+        from rank_bm25 import BM25Okapi
+    except ImportError:
+        print("⚠ rank_bm25 not installed, skipping comparison")
+        return
+    
+    rng = random.Random(0)
+    vocab = [f"term{i}" for i in range(200)]
+    corpus = [[rng.choice(vocab[:rng.randint(5, 200)]) for _ in range(rng.randint(1, 60))] for _ in range(120)]
+    queries = [[rng.choice(vocab + ['unknown']) for _ in range(rng.randint(1, 5))] for _ in range(30)]
+    
+    reference = BM25Okapi(corpus)
+    index = BM25Index(corpus)
+    for query in queries:
+        assert np.array_equal(index.get_scores(query), reference.get_scores(query)), query
+    
+    # Patch in place: drop every 5th document, then add new ones
+    keep = [i for i in range(len(corpus)) if i % 5]
+    extra = [[rng.choice(vocab) for _ in range(20)] for _ in range(10)]
+    index.remove_documents(keep)
+    index.add_documents(extra)
+    reference = BM25Okapi([corpus[i] for i in keep] + extra)
+    for query in queries:
+        assert np.allclose(index.get_scores(query), reference.get_scores(query), rtol=1e-12, atol=1e-12), query
+    print(f"✓ BM25Index matches BM25Okapi on {len(queries)} queries")
+
+def test_vector_index():
+    """Test exact and IVF vector indices, including incremental add/remove"""
+    import numpy as np
+    from vector_index import ExactIndex, IVFIndex
+    
+    print("\\nTesting vector index...")
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2000, 32)).astype(np.float32)
+    queries = rng.standard_normal((20, 32)).astype(np.float32)
+    
+    exact = ExactIndex(vectors)
+    ivf = IVFIndex(vectors, n_lists=16, n_probe=16)
+    for query in queries:
+        exact_ids, exact_scores = exact.search(query, 10)
+        ivf_ids, ivf_scores = ivf.search(query, 10)
+        # Probing every bucket is an exhaustive search
+        assert np.array_equal(exact_ids, ivf_ids)
+        assert np.allclose(exact_scores, ivf_scores)
+    
+    ivf.n_probe = 4
+    recall = np.mean([len(set(exact.search(q, 10)[0]) & set(ivf.search(q, 10)[0])) / 10 for q in queries])
+    assert recall > 0.3, recall
+    
+    # Patch in place and compare against a fresh index
+    keep = np.arange(len(vectors)) % 3 != 0
+    extra = rng.standard_normal((100, 32)).astype(np.float32)
+    for index in (exact, ivf):
+        index.remove(keep)
+        index.add(extra)
+    ivf.n_probe = ivf.n_lists
+    fresh = ExactIndex(np.vstack([vectors[keep], extra]))
+    assert len(exact) == len(ivf) == len(fresh)
+    for query in queries:
+        assert np.array_equal(exact.search(query, 10)[0], fresh.search(query, 10)[0])
+        assert np.array_equal(ivf.search(query, 10)[0], fresh.search(query, 10)[0])
+    print(f"✓ IVF (probe 4) recall@10 vs exact: {recall:.2f}")
+
+def test_quantized_vectors():
+    """Test float16 and int8 vector storage against float32, including a save/load round trip"""
+    import numpy as np
+    import tempfile
+    import shutil
+    from vector_index import ExactIndex, IVFIndex, normalize_rows
+    from index_store import IndexWriter, IndexReader, write_object, read_object
+    
+    print("\nTesting quantized vector storage...")
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((3000, 64)).astype(np.float32)
+    queries = rng.standard_normal((20, 64)).astype(np.float32)
+    reference = ExactIndex(vectors)
+    truth = [set(reference.search(q, 10)[0]) for q in queries]
+    
+    import app
+    assert app.check_vector_config({'vector_storage': 'int8', 'vector_index': 'exact'}) == []
+    assert app.check_vector_config({'vector_storage': 'float16', 'vector_index': 'ivf'}) == []
+    assert len(app.check_vector_config({'vector_storage': 'float16', 'vector_index': 'exact'})) == 1
+    config = {'vector_storage': 'bfloat16'}
+    assert len(app.check_vector_config(config)) == 1 and config['vector_storage'] == 'float32'
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for storage, itemsize in (('float16', 2), ('int8', 1)):
+            exact = ExactIndex(vectors, storage=storage)
+            assert exact.vectors.dtype.itemsize == itemsize
+            assert np.abs(exact.decode() - normalize_rows(vectors)).max() < 0.01
+            assert np.allclose(exact.scores(queries[0]), reference.scores(queries[0]), atol=0.02)
+            recall = np.mean([len(set(exact.search(q, 10)[0]) & t) / 10 for q, t in zip(queries, truth)])
+            assert recall >= 0.9, (storage, recall)
+            for (ids, scores), query in zip(exact.search_many(queries, 10), queries):
+                single_ids, single_scores = exact.search(query, 10)
+                assert np.array_equal(ids, single_ids) and np.allclose(scores, single_scores, atol=1e-5)
+            
+            # Probing every bucket of a quantized IVF index is exact search over the same vectors
+            ivf = IVFIndex(vectors, n_lists=8, n_probe=8, storage=storage)
+            for query in queries:
+                assert np.array_equal(ivf.search(query, 10)[0], exact.search(query, 10)[0])
+            
+            # Storage and per-vector scales survive remove/add and the on-disk format
+            keep = np.arange(len(vectors)) % 4 != 0
+            for index in (exact, ivf):
+                index.remove(keep)
+                index.add(vectors[:50])
+                assert len(index.scales) == len(index) == keep.sum() + 50
+            index_dir = os.path.join(temp_dir, storage)
+            writer = IndexWriter(index_dir)
+            write_object(writer, 'ivf', ivf)
+            writer.commit()
+            loaded = read_object(IndexReader(index_dir), 'ivf', [ExactIndex, IVFIndex])
+            assert loaded.storage == storage and loaded.vectors.dtype == ivf.vectors.dtype
+            assert np.array_equal(loaded.search(queries[0], 10)[0], ivf.search(queries[0], 10)[0])
+            print(f"✓ {storage}: {exact.vectors.nbytes / reference.vectors.nbytes:.0%} of float32 memory, "
+                  f"recall@10 {recall:.2f}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+class HashingEncoder:
+    """Tiny deterministic stand-in for SentenceTransformer (bag of hashed words)"""
+    
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        import zlib
+        import numpy as np
+        vectors = np.zeros((len(texts), 256), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % 256] += 1
+        return vectors
+
+def test_passage_indexing():
+    """Test that documents are split into overlapping passages covering the whole text"""
+    import app
+    import numpy as np
+    
+    print("\\nTesting passage-level semantic indexing...")
+    text = " ".join(f"word{i}" for i in range(450))
+    spans = app.chunk_passages(text, size=200, overlap=50)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    assert len(spans) == 3
+    assert all(a[1] > b[0] for a, b in zip(spans, spans[1:])), "passages should overlap"
+    
+    saved = (app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE)
+    try:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = HashingEncoder(), True
+        app.reset_index()
+        filler = " ".join(f"intro{i}" for i in range(400))
+        app.add_documents([
+            ('a.txt', filler + " transaction concurrency control locking", [], {}),
+            ('b.txt', "supervised learning classification regression", [], {}),
+            ('c.txt', "inverted index posting lists", [], {})
+        ])
+        assert app.embedded_document_count() == 3
+        assert len(app.semantic_index) == len(app.passage_doc_ids) == len(app.passage_spans)
+        assert np.array_equal(np.unique(app.passage_doc_ids), [0, 1, 2])
+        
+        results = app.search_semantic("concurrency control locking", top_k=1)
+        assert results[0]['filename'] == 'a.txt'
+        # Snippet comes from the last passage, not the start of the document
+        assert results[0]['summary'].startswith('intro300')
+        
+        # Removing a document renumbers the passages of the remaining ones
+        app.remove_documents(['a.txt'])
+        assert np.array_equal(np.unique(app.passage_doc_ids), [0, 1])
+        results = app.search_semantic("inverted index", top_k=1)
+        assert results[0]['filename'] == 'c.txt'
+        print(f"✓ Passage index covers whole documents ({len(spans)} passages for 450 words)")
+    finally:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = saved
+        app.reset_index()
+
+def test_index_store():
+    """Test that the memory-mapped index round-trips and can still be updated"""
+    import app
+    import numpy as np
+    import tempfile
+    import shutil
+    
+    print("\\nTesting on-disk index format...")
+    saved_paths = (app.DOCS_DIR, app.INDEX_DIR)
+    saved_model = (app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        app.DOCS_DIR = os.path.join(temp_dir, 'docs')
+        app.INDEX_DIR = os.path.join(temp_dir, 'index')
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = HashingEncoder(), True
+        os.makedirs(app.DOCS_DIR)
+        texts = {
+            'db.txt': "Database transactions use locking for concurrency control. Ünïcode text survives.",
+            'ml.txt': "Supervised learning trains a classifier on labelled examples.",
+            'ir.txt': "Information retrieval ranks documents with BM25 and TF-IDF scoring."
+        }
+        for rel_path, text in texts.items():
+            with open(os.path.join(app.DOCS_DIR, rel_path), 'w', encoding='utf-8') as f:
+                f.write(text)
+        app.load_documents(force_reload=True)
+        queries = ["locking concurrency", "retrieval scoring", "labelled classifier"]
+        expected = {q: ([(r['filename'], r['summary']) for r in app.search_bm25(q)],
+                        [r['filename'] for r in app.search_tfidf(q)],
+                        [r['filename'] for r in app.search_semantic(q)]) for q in queries}
+        
+        app.reset_index()
+        assert app.load_from_cache()
+        assert isinstance(app.bm25_model.weights, np.memmap)
+        assert isinstance(app.semantic_index.vectors, np.memmap)
+        assert sorted(app.documents) == sorted(texts.values())
+        for q in queries:
+            assert expected[q] == ([(r['filename'], r['summary']) for r in app.search_bm25(q)],
+                                   [r['filename'] for r in app.search_tfidf(q)],
+                                   [r['filename'] for r in app.search_semantic(q)]), q
+        
+        # A mapped index is still patched incrementally
+        with open(os.path.join(app.DOCS_DIR, 'os.txt'), 'w') as f:
+            f.write("Operating systems schedule processes and manage virtual memory.")
+        os.remove(os.path.join(app.DOCS_DIR, 'ml.txt'))
+        app.load_documents()
+        assert sorted(app.doc_names) == ['db.txt', 'ir.txt', 'os.txt']
+        assert app.search_bm25("virtual memory")[0]['filename'] == 'os.txt'
+        assert app.snippet_index.num_docs == 3
+        generations = [name for name in os.listdir(app.INDEX_DIR) if name.startswith('gen-')]
+        assert len(generations) == 1, "old generations should be removed"
+        print("✓ Index reopened from memory-mapped files with identical results")
+    finally:
+        app.DOCS_DIR, app.INDEX_DIR = saved_paths
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = saved_model
+        app.reset_index()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_lazy_startup():
+    """Test that the semantic model is not needed at import time or for lexical search"""
+    import app
+    
+    print("\\nTesting lazy model loading...")
+    health = app.app.test_client().get('/health').get_json()
+    assert health['status'] == 'ok'
+    assert health['semantic'] in ('not_loaded', 'loading', 'ready', 'failed')
+    
+    saved = (app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE, app.semantic_status)
+    try:
+        app.reset_index()
+        app.add_documents([
+            ('db.txt', "Database transactions use locking for concurrency control.", [], {}),
+            ('ir.txt', "Information retrieval ranks documents with BM25 scoring.", [], {})
+        ])
+        app.rebuild_lexical_indices()
+        # While the model is warming up, hybrid search answers from the lexical indices only
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE, app.semantic_status = None, False, 'loading'
+        results = app.search_hybrid("locking concurrency", top_k=1)
+        assert results[0]['filename'] == 'db.txt'
+        assert results[0]['semantic_score'] == 0
+        assert app.app.test_client().get('/health').get_json()['semantic'] == 'loading'
+        print("✓ Lexical search served while the semantic model loads")
+    finally:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE, app.semantic_status = saved
+        app.reset_index()
+
+def test_result_cache():
+    """Test LRU/TTL eviction of the result cache and invalidation on index changes"""
+    import app
+    from query_cache import ResultCache
+    
+    print("\\nTesting result cache...")
+    now = [0.0]
+    cache = ResultCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    key = lambda q: ResultCache.make_key(q, 'bm25', None, 5, 0)
+    cache.put(key('a'), ['a'])
+    cache.put(key('b'), ['b'])
+    assert cache.get(key('  A ')) == ['a']  # normalized query, now most recently used
+    cache.put(key('c'), ['c'])
+    assert cache.get(key('b')) is None, "least recently used entry should be evicted"
+    now[0] = 11
+    assert cache.get(key('a')) is None, "expired entry should be dropped"
+    assert ResultCache.make_key('q', 'bm25', ['y', 'x'], 5, 0) == ResultCache.make_key('Q', 'bm25', ['x', 'y'], 5, 0)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+    
+    client = app.app.test_client()
+    try:
+        app.reset_index()
+        app.add_documents([
+            ('db.txt', "Database normalization removes redundancy.", [], {}),
+            ('ml.txt', "Supervised learning trains a classifier.", [], {})
+        ])
+        app.rebuild_lexical_indices()
+        search = lambda: client.post('/search', json={'query': 'database normalization', 'search_type': 'bm25'}).get_json()
+        first, second = search(), search()
+        assert not first['cached'] and second['cached']
+        assert first['results'] == second['results']
+        
+        # Changing the index invalidates cached results
+        app.add_documents([('db2.txt', "Normalization of a database schema into normal forms.", [], {})])
+        app.rebuild_lexical_indices()
+        third = search()
+        assert not third['cached'] and 'db2.txt' in [r['filename'] for r in third['results']]
+        print(f"✓ Result cache: {app.result_cache.stats()}")
+    finally:
+        app.reset_index()
+
+def test_query_embedding_cache():
+    """Test that query embeddings are memoized, bounded and persisted"""
+    import app
+    import numpy as np
+    import tempfile
+    import shutil
+    from query_cache import EmbeddingCache
+    
+    print("\\nTesting query embedding cache...")
+    cache = EmbeddingCache(max_entries=10, max_bytes=3 * 4 * 8, model_name='test-model')
+    for i in range(5):
+        cache.put(f"query {i}", np.full(8, i, dtype=np.float32))
+    assert len(cache) == 3 and cache.nbytes == 3 * 4 * 8, "byte bound should evict oldest entries"
+    assert cache.get("query 0") is None
+    assert np.array_equal(cache.get("  query   4 "), np.full(8, 4))
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'query_embeddings.npz')
+        cache.save(path)
+        restored = EmbeddingCache(model_name='test-model')
+        assert restored.load(path) == 3
+        assert np.array_equal(restored.get("query 3"), np.full(8, 3))
+        assert EmbeddingCache(model_name='other-model').load(path) == 0
+        assert os.listdir(temp_dir) == ['query_embeddings.npz'], "save should leave no temporary files"
+        
+        # A damaged cache file is skipped; the model still loads
+        with open(path, 'wb') as f:
+            f.write(b'PK\x03\x04 truncated')
+        fake_module = type(sys)('sentence_transformers')
+        fake_module.SentenceTransformer = lambda name: HashingEncoder()
+        saved = (app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE, app.semantic_status, app.QUERY_EMBEDDING_FILE,
+                 dict(app.CONFIG), sys.modules.get('sentence_transformers'))
+        try:
+            sys.modules['sentence_transformers'] = fake_module
+            app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE, app.semantic_status = None, False, 'not_loaded'
+            app.QUERY_EMBEDDING_FILE = path
+            app.CONFIG['persist_query_embeddings'] = True
+            app.reset_index()
+            assert app.load_semantic_model() is not None and app.semantic_status == 'ready'
+        finally:
+            app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE, app.semantic_status, app.QUERY_EMBEDDING_FILE = saved[:4]
+            app.CONFIG.clear()
+            app.CONFIG.update(saved[4])
+            if saved[5] is None:
+                sys.modules.pop('sentence_transformers', None)
+            else:
+                sys.modules['sentence_transformers'] = saved[5]
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    class CountingEncoder(HashingEncoder):
+        calls = 0
+        def encode(self, texts, **kwargs):
+            CountingEncoder.calls += len(texts)
+            return super().encode(texts, **kwargs)
+    
+    saved = (app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE)
+    try:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = CountingEncoder(), True
+        app.query_embedding_cache.clear()
+        app.reset_index()
+        app.add_documents([('a.txt', "inverted index posting lists", [], {}),
+                           ('b.txt', "supervised learning classification", [], {})])
+        CountingEncoder.calls = 0
+        app.search_semantic("posting lists")
+        app.search_semantic(" posting  lists ")
+        assert CountingEncoder.calls == 1, CountingEncoder.calls
+        print(f"✓ Query embedding cache: {app.query_embedding_cache.stats()}")
+    finally:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = saved
+        app.query_embedding_cache.clear()
+        app.reset_index()
+
+def test_hybrid_fusion():
+    """Test that hybrid search fuses full score vectors and materializes only top_k results"""
+    import app
+    import numpy as np
+    
+    print("\\nTesting hybrid score fusion...")
+    # Config files from before hybrid_weights keep their lexical/semantic split
+    assert app.upgrade_config({'hybrid_alpha': 0.6}) == {'hybrid_weights': {'tfidf': 0.3, 'bm25': 0.3, 'semantic': 0.4}}
+    weights = {'tfidf': 0.2, 'bm25': 0.2, 'semantic': 0.6}
+    assert app.upgrade_config({'hybrid_alpha': 0.5, 'hybrid_weights': weights}) == {'hybrid_weights': weights}
+    
+    saved = (app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE, app.build_result, dict(app.CONFIG))
+    built = []
+    def spy_build_result(idx, *args, **kwargs):
+        built.append(idx)
+        return saved[2](idx, *args, **kwargs)
+    try:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = HashingEncoder(), True
+        app.reset_index()
+        app.add_documents([
+            ('DBMS/locking.txt', "Database transactions use locking for concurrency control.", [], {}),
+            ('DBMS/normal.txt', "Database normalization removes redundancy from tables.", [], {}),
+            ('ir.txt', "Information retrieval ranks documents with BM25 and TF-IDF scoring.", [], {}),
+            ('ml.txt', "Supervised learning trains a classifier on labelled examples.", [], {})
+        ])
+        app.rebuild_lexical_indices()
+        app.build_result = spy_build_result
+        
+        query = "database locking"
+        tfidf = app.score_tfidf(query)
+        from sklearn.metrics.pairwise import cosine_similarity
+        assert np.allclose(tfidf, cosine_similarity(app.tfidf_vectorizer.transform([query]), app.tfidf_matrix).ravel())
+        bm25 = app.score_bm25(query)
+        semantic = app.score_semantic(query)[0]
+        expected = 0.3 * tfidf + 0.35 * bm25 / bm25.max() + 0.35 * semantic
+        results = app.search_hybrid(query, top_k=2)
+        assert built == [int(i) for i in np.argsort(-expected, kind='stable')[:2]], built
+        assert np.isclose(results[0]['score'], expected.max())
+        assert results[0]['filename'] == 'DBMS/locking.txt'
+        assert results[0]['bm25_score'] == 1.0
+        
+        # Filters are applied to the score vectors before picking the top_k
+        results = app.search_hybrid(query, top_k=5, filter_files=['ir.txt', 'ml.txt'])
+        assert {r['filename'] for r in results} <= {'ir.txt', 'ml.txt'}
+        
+        app.CONFIG['hybrid_fusion'] = 'rrf'
+        results = app.search_hybrid(query, top_k=2)
+        assert results[0]['filename'] == 'DBMS/locking.txt'
+        assert np.isclose(results[0]['score'], 1.0 / 61)
+        print("✓ Hybrid search fuses scores before building results")
+    finally:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE, app.build_result = saved[:3]
+        app.CONFIG.clear()
+        app.CONFIG.update(saved[3])
+        app.reset_index()
+
+def test_result_materialization():
+    """Test that results are built from indexed metadata without touching the filesystem"""
+    import app
+    import time
+    
+    print("\\nTesting result materialization...")
+    mtime = time.mktime((2024, 3, 1, 12, 0, 0, 0, 0, -1))
+    saved_stat, saved_exists = os.stat, os.path.exists
+    try:
+        app.reset_index()
+        app.add_documents([
+            ('DBMS/locking.txt', "Database transactions use locking for concurrency control.", [], {'size': 2048, 'mtime': mtime}),
+            ('ir.txt', "Information retrieval ranks documents with BM25 scoring.", [], {'size': 512, 'mtime': mtime}),
+            ('ml.txt', "Supervised learning trains a classifier on labelled examples.", [], {'size': 100, 'mtime': mtime})
+        ])
+        app.rebuild_lexical_indices()
+        
+        results = app.search_bm25("database locking", top_k=5, filter_files=['DBMS'])
+        assert [r['filename'] for r in results] == ['DBMS/locking.txt']
+        assert results[0]['folder'] == 'DBMS' and results[0]['score'] == 1.0
+        
+        doc_ids, scores = app.select_hits(app.score_tfidf("retrieval"), 5)
+        assert app.doc_names[doc_ids[0]] == 'ir.txt'
+        def no_filesystem(*args, **kwargs):
+            raise AssertionError("filesystem accessed while materializing results")
+        os.stat = os.path.exists = no_filesystem
+        results = app.materialize_hits(doc_ids, scores, "retrieval", 'tfidf')
+        assert results[0]['file_size'] == '0.5 KB' and results[0]['modified_date'] == '2024-03-01'
+        print("✓ Results materialized from doc_metadata")
+    finally:
+        os.stat, os.path.exists = saved_stat, saved_exists
+        app.reset_index()
+
+def test_filter_index():
+    """Test that filter bitmaps match the folder/file prefix rules for both separators"""
+    import numpy as np
+    from filter_index import FilterIndex
+    
+    print("\\nTesting filter index...")
+    doc_names = ['DBMS\\normalization.pdf', 'DBMS/sql/joins.txt', 'DBMS2/notes.txt', 'ml.txt', 'OS\\memory\\paging.pdf']
+    index = FilterIndex(doc_names)
+    
+    def expected(filter_files):
+        # The string matching rule the filters used to apply per document
+        return np.array([any(name.replace('\\', '/') == f.replace('\\', '/') or
+                             name.replace('\\', '/').startswith(f.replace('\\', '/') + '/') for f in filter_files)
+                         for name in doc_names])
+    
+    for filter_files in [['DBMS'], ['DBMS/sql'], ['DBMS\\sql\\joins.txt'], ['ml.txt', 'OS'], ['OS/memory'], ['missing'], ['DB']]:
+        assert np.array_equal(index.mask(filter_files), expected(filter_files)), filter_files
+    assert index.mask([]) is None
+    assert index.doc_ids(['DBMS', 'DBMS/sql']).tolist() == [0, 1]
+    print(f"✓ Filter index covers {len(index.groups)} files and folders")
+
+def test_search_pagination():
+    """Test partial top-k selection, offsets and min_score on /search"""
+    import app
+    import numpy as np
+    
+    print("\nTesting search pagination...")
+    scores = np.array([0.5, 0.9, 0.0, 0.5, 0.7, 0.5, 0.2])
+    doc_ids, _ = app.select_hits(scores, 10)
+    # Full stable sort order: equal scores keep document order
+    assert doc_ids.tolist() == [1, 4, 0, 3, 5, 6]
+    pages = [app.select_hits(scores, 2, offset=offset)[0].tolist() for offset in (0, 2, 4, 6)]
+    assert sum(pages, []) == doc_ids.tolist() and pages[-1] == []
+    assert app.select_hits(scores, 10, min_score=0.5)[0].tolist() == [1, 4, 0, 3, 5]
+    # Ties at the cut-off of a partial selection go to the lowest document ids
+    many = np.round(np.random.default_rng(0).random(5000), 2)
+    for k in (1, 7, 50, 333):
+        assert np.array_equal(app.select_hits(many, k)[0], np.argsort(-many, kind='stable')[:k])
+    
+    try:
+        app.reset_index()
+        app.add_documents([
+            (f"doc{i}.txt", f"Retrieval notes number {i}. " + "retrieval " * (i + 1), [], {'size': 100, 'mtime': 0})
+            for i in range(7)
+        ] + [
+            # Unrelated documents keep the query term's BM25 idf positive
+            (f"other{i}.txt", f"Cooking recipe number {i} with pasta and tomato sauce.", [], {'size': 100, 'mtime': 0})
+            for i in range(8)
+        ])
+        app.rebuild_lexical_indices()
+        client = app.app.test_client()
+        
+        seen = []
+        offset, has_more = 0, True
+        while has_more:
+            data = client.post('/search', json={'query': 'retrieval', 'search_type': 'bm25',
+                                                'top_k': 3, 'offset': offset}).get_json()
+            assert data['offset'] == offset and len(data['results']) <= 3
+            seen += [r['filename'] for r in data['results']]
+            offset, has_more = offset + 3, data['has_more']
+        # BM25 keeps zero-score documents, after every matching one
+        assert len(seen) == 15 and len(set(seen)) == 15
+        assert seen[:7] == [f"doc{i}.txt" for i in range(6, -1, -1)]
+        
+        data = client.post('/search', json={'query': 'retrieval', 'search_type': 'bm25',
+                                            'top_k': 10, 'min_score': 0.5}).get_json()
+        assert data['results'] and all(r['score'] >= 0.5 for r in data['results']) and not data['has_more']
+        assert [r['filename'] for r in data['results']] == seen[:len(data['results'])]
+        assert client.post('/search', json={'query': 'retrieval', 'top_k': 0}).status_code == 400
+        assert client.post('/search', json={'query': 'retrieval', 'offset': 'x'}).status_code == 400
+        print(f"✓ Paged through {len(seen)} results without duplicates")
+    finally:
+        app.reset_index()
+
+def test_snippet_index():
+    """Test that indexed snippet extraction matches scanning the text"""
+    import app
+    from snippet_index import SnippetIndex, IndexedPositions, TextPositions
+    
+    print("\nTesting snippet index...")
+    texts = [
+        "Databases store data. The database engine indexes data!\nRetrieval of data is fast? Yes.",
+        "• Information retrieval ranks documents.\n• Retrieving passages uses the index - indexing is done once.",
+        "No matches in this one at all",
+        "Naïve über déjà-vu: data-driven RETRIEVAL systems. E-mail and c++ notes about the database."
+    ]
+    queries = ["data retrieval", "the index", "database", "e-mail c++", "naïve über", "missing words"]
+    index = SnippetIndex(texts)
+    
+    def check(doc_ids):
+        for doc_id, text in zip(doc_ids, texts):
+            spans = [None] + [tuple(span) for span in app.chunk_passages(text, 6, 2)]
+            for span in spans:
+                positions = index.positions(doc_id, text, span)
+                assert isinstance(positions, IndexedPositions)
+                for query in queries:
+                    expected = app.extract_summary_and_points(text, query, 40, span, TextPositions(text, *(span or (0, len(text)))))
+                    assert app.extract_summary_and_points(text, query, 40, span, positions) == expected, (doc_id, span, query)
+    
+    check(range(len(texts)))
+    assert index.positions(0, texts[0], (2, 20)).__class__ is TextPositions  # span cuts a word
+    
+    index.remove_documents([0, 2, 3])
+    texts = [texts[0], texts[2], texts[3]]
+    check(range(len(texts)))
+    print(f"✓ Indexed snippets match text scanning ({len(index.vocabulary)} terms)")
+
+def test_image_store():
+    """Test content-addressed image storage and the cacheable /image endpoint"""
+    import app
+    import io
+    import tempfile
+    from PIL import Image
+    from image_store import ImageStore
+    
+    print("\nTesting image store...")
+    def png(color):
+        buffered = io.BytesIO()
+        Image.new('RGB', (80, 60), color).save(buffered, format='PNG')
+        return {'data': buffered.getvalue(), 'width': 80, 'height': 60}
+    
+    saved_store = app.image_store
+    temp_dir = tempfile.mkdtemp()
+    try:
+        app.image_store = store = ImageStore(temp_dir)
+        red, blue = png('red'), png('blue')
+        refs = store.add([red, blue, red])
+        assert refs[0] == refs[2] and refs[0] != refs[1]
+        assert refs[0] == {'id': refs[0]['id'], 'width': 80, 'height': 60}
+        assert sum(len(files) for _, _, files in os.walk(temp_dir)) == 2, "identical images are stored once"
+        
+        client = app.app.test_client()
+        response = client.get(f"/image/{refs[1]['id']}")
+        assert response.status_code == 200 and response.data == blue['data']
+        assert response.mimetype == 'image/png'
+        assert 'immutable' in response.headers['Cache-Control']
+        etag = response.headers['ETag']
+        assert client.get(f"/image/{refs[1]['id']}", headers={'If-None-Match': etag}).status_code == 304
+        assert client.get("/image/not-a-hash").status_code == 404
+        assert client.get(f"/image/{'0' * 64}").status_code == 404
+        
+        assert store.prune([refs[0]['id']]) == 1
+        assert client.get(f"/image/{refs[1]['id']}").status_code == 404
+        assert client.get(f"/image/{refs[0]['id']}").status_code == 200
+        print("✓ Images stored once and served with ETag/immutable caching")
+    finally:
+        app.image_store = saved_store
+
+def test_streaming_responses():
+    """Test NDJSON/SSE streaming of /search and /ai-chat and gzip negotiation"""
+    import app
+    import json
+    import gzip
+    from streaming import negotiate_encoding, negotiate_stream
+    
+    print("\nTesting streaming and compressed responses...")
+    assert negotiate_encoding('gzip, deflate') == 'gzip'
+    assert negotiate_encoding('gzip;q=0, identity') is None
+    assert negotiate_encoding('*') in ('gzip', 'br')
+    assert negotiate_encoding('') is None
+    assert negotiate_stream(None, 'application/x-ndjson') == 'ndjson'
+    assert negotiate_stream('sse', 'application/json') == 'sse'
+    assert negotiate_stream(False, 'text/event-stream') is None
+    
+    saved_key = os.environ.pop('OPENAI_API_KEY', None)
+    saved_min = app.CONFIG.get('compress_min_bytes')
+    try:
+        app.reset_index()
+        app.add_documents([
+            (f"doc{i}.txt", f"Retrieval notes number {i}. " + "retrieval ranking " * (i + 1), [], {'size': 100, 'mtime': 0})
+            for i in range(6)
+        ] + [(f"other{i}.txt", "Cooking pasta with tomato sauce.", [], {'size': 100, 'mtime': 0}) for i in range(6)])
+        app.rebuild_lexical_indices()
+        client = app.app.test_client()
+        request = {'query': 'retrieval ranking', 'search_type': 'tfidf', 'top_k': 4}
+        expected = client.post('/search', json=request).get_json()
+        
+        # NDJSON: one event per chunk, results identical to the JSON response
+        response = client.post('/search', json=request, headers={'Accept': 'application/x-ndjson'})
+        assert response.mimetype == 'application/x-ndjson'
+        chunks = [chunk.decode('utf-8') for chunk in response.response]
+        events = [json.loads(chunk) for chunk in chunks]
+        assert all(chunk.count('\n') == 1 for chunk in chunks)
+        assert [e['event'] for e in events] == ['meta'] + ['result'] * 4 + ['done']
+        assert [e['data'] for e in events[1:-1]] == expected['results']
+        assert events[-1]['data'] == {'total': 4, 'has_more': expected['has_more']}
+        # The stream filled the result cache
+        assert client.post('/search', json=request).get_json()['cached']
+        
+        response = client.post('/search', json=dict(request, stream='sse'))
+        assert response.mimetype == 'text/event-stream'
+        assert response.get_data(as_text=True).startswith('event: meta\ndata: {')
+        
+        # gzip for large JSON bodies and streams, nothing for small ones
+        app.CONFIG['compress_min_bytes'] = 100
+        response = client.post('/search', json=request, headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.data))['results'] == expected['results']
+        response = client.post('/search', json={'query': ''}, headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+        response = client.post('/search', json=dict(request, stream=True), headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        lines = gzip.decompress(response.get_data()).decode('utf-8').splitlines()
+        assert [json.loads(line)['data'] for line in lines[1:-1]] == expected['results']
+        
+        # Chat tokens add up to the non-streamed answer
+        chat = {'query': 'what is retrieval?', 'search_results': expected['results']}
+        answer = client.post('/ai-chat', json=chat).get_json()
+        response = client.post('/ai-chat', json=dict(chat, stream='ndjson'))
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert len(events) > 2 and events[-1]['event'] == 'done'
+        assert ''.join(e['data']['text'] for e in events[:-1]) == answer['response']
+        assert events[-1]['data']['sources'] == answer['sources']
+        print(f"✓ Streamed {len(events) - 1} chat tokens and {len(expected['results'])} search hits")
+    finally:
+        if saved_key is not None:
+            os.environ['OPENAI_API_KEY'] = saved_key
+        app.CONFIG['compress_min_bytes'] = saved_min
+        app.reset_index()
+
+def test_index_swap():
+    """Test that index updates are published atomically and picked up by other workers"""
+    import app
+    import tempfile
+    import shutil
+    import threading
+    
+    print("\nTesting index state swaps...")
+    saved_paths = (app.DOCS_DIR, app.INDEX_DIR)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        app.DOCS_DIR = os.path.join(temp_dir, 'docs')
+        app.INDEX_DIR = os.path.join(temp_dir, 'index')
+        os.makedirs(app.DOCS_DIR)
+        for i in range(3):
+            with open(os.path.join(app.DOCS_DIR, f'doc{i}.txt'), 'w') as f:
+                f.write(f"Inverted index notes {i}. Posting lists and retrieval.")
+        app.load_documents(force_reload=True)
+        
+        # A search keeps the state it started with while an update is published
+        pinned = app.index_state
+        app.add_documents([('extra.txt', "Inverted index compression of posting lists.", [], {})])
+        app.rebuild_lexical_indices()
+        assert len(pinned.documents) == 3 and len(app.documents) == 4
+        assert pinned.tfidf_matrix.shape[0] == 3 and pinned.bm25_model.corpus_size == 3
+        assert len(app.search_tfidf("inverted index", top_k=10, state=pinned)) == 3
+        assert len(app.search_tfidf("inverted index", top_k=10)) == 4
+        
+        # A failed update publishes nothing
+        generation = app.index_generation
+        try:
+            with app.updating_index() as state:
+                state.documents.append("half-built")
+                raise RuntimeError("extraction failed")
+        except RuntimeError:
+            pass
+        assert app.index_generation == generation and len(app.documents) == 4
+        
+        # Searches running during updates always see a consistent index
+        # (standalone add/remove calls publish complete states too)
+        errors = []
+        def search_loop():
+            for _ in range(30):
+                try:
+                    app.search_hybrid("posting lists", top_k=10, filter_files=['doc0.txt', 'extra.txt'])
+                    assert len(app.search_tfidf("posting lists", top_k=10)) in (4, 5)
+                except Exception as e:
+                    errors.append(e)
+        threads = [threading.Thread(target=search_loop) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for i in range(10):
+            app.add_documents([(f'new{i}.txt', f"Posting lists update {i}.", [], {})])
+            app.rebuild_lexical_indices()
+            app.remove_documents([f'new{i}.txt'])
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+        
+        # Another worker saves a generation: refresh_index swaps it in
+        app.refresh_index()
+        assert not app.refresh_index()
+        with open(os.path.join(app.DOCS_DIR, 'doc3.txt'), 'w') as f:
+            f.write("Skip pointers speed up posting list intersection.")
+        seen = app._seen_generation
+        app.load_documents()
+        assert len(app.documents) == 5
+        app._seen_generation = seen
+        app.reset_index()
+        assert app.refresh_index()
+        assert 'doc3.txt' in app.doc_names and len(app.documents) == 5
+        print(f"✓ Updates are published atomically (generation {app.index_generation})")
+    finally:
+        app.DOCS_DIR, app.INDEX_DIR = saved_paths
+        app.reset_index()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_worker_embedding():
+    """Test that forked workers embed a preloaded index once and share the result"""
+    import app
+    import tempfile
+    import shutil
+    
+    print("\nTesting embedding across server workers...")
+    
+    class CountingEncoder(HashingEncoder):
+        calls = 0
+        def encode(self, texts, **kwargs):
+            CountingEncoder.calls += len(texts)
+            return super().encode(texts, **kwargs)
+    
+    saved = (app.DOCS_DIR, app.INDEX_DIR, app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        app.DOCS_DIR = os.path.join(temp_dir, 'docs')
+        app.INDEX_DIR = os.path.join(temp_dir, 'index')
+        os.makedirs(app.DOCS_DIR)
+        for i, text in enumerate(["Posting lists", "Vector space model", "Probabilistic retrieval"]):
+            with open(os.path.join(app.DOCS_DIR, f'doc{i}.txt'), 'w') as f:
+                f.write(text)
+        # The master opens the index before the model is loaded, then forks
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = None, False
+        app.load_documents(force_reload=True)
+        master_state, master_generation = app.index_state, app._seen_generation
+        
+        # The first worker to load the model embeds and saves
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = CountingEncoder(), True
+        assert app.embed_missing_documents()
+        assert CountingEncoder.calls > 0 and app._seen_generation != master_generation
+        
+        # Another worker (still on the master's state) opens that generation instead of re-embedding
+        app.publish_index(master_state)
+        app._seen_generation = master_generation
+        CountingEncoder.calls = 0
+        assert not app.embed_missing_documents()
+        assert CountingEncoder.calls == 0
+        assert app.embedded_document_count() == len(app.documents) == 3
+        assert app.search_semantic("vector space")[0]['filename'] == 'doc1.txt'
+        print("✓ Passages embedded once and shared through the saved index")
+    finally:
+        app.DOCS_DIR, app.INDEX_DIR, app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = saved
+        app.reset_index()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_cross_worker_updates():
+    """Test that index updates from different processes are serialized and none is lost"""
+    import app
+    import time
+    import tempfile
+    import shutil
+    import subprocess
+    from jobs import Job
+    
+    print("\nTesting index updates across processes...")
+    saved = (app.DOCS_DIR, app.INDEX_DIR)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        app.DOCS_DIR = os.path.join(temp_dir, 'docs')
+        app.INDEX_DIR = os.path.join(temp_dir, 'index')
+        os.makedirs(app.DOCS_DIR)
+        with open(os.path.join(app.DOCS_DIR, 'a.txt'), 'w') as f:
+            f.write("Boolean retrieval with posting lists.")
+        app.load_documents(force_reload=True)
+        
+        # Another worker holds the lock while it indexes b.txt
+        other_worker = (
+            "import os, sys, time, app\n"
+            "app.DOCS_DIR, app.INDEX_DIR = sys.argv[1], sys.argv[2]\n"
+            "with app.index_update_lock():\n"
+            "    print('locked', flush=True)\n"
+            "    time.sleep(1)\n"
+            "    with open(os.path.join(app.DOCS_DIR, 'b.txt'), 'w') as f:\n"
+            "        f.write('Ranked retrieval with tf-idf weights.')\n"
+            "    app.load_documents()\n"
+        )
+        process = subprocess.Popen([sys.executable, '-c', other_worker, app.DOCS_DIR, app.INDEX_DIR],
+                                   cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            for line in process.stdout:
+                if line.strip() == 'locked':
+                    break
+            # This worker's upload waits for it, then builds on its generation
+            upload = os.path.join(app.DOCS_DIR, 'c.txt')
+            with open(upload, 'w') as f:
+                f.write("Probabilistic retrieval with BM25.")
+            started = time.time()
+            app.upload_job(Job('upload', None), upload)
+            waited = time.time() - started
+        finally:
+            process.communicate()
+        assert process.returncode == 0
+        assert waited > 0.5, waited
+        assert sorted(app.doc_names) == ['a.txt', 'b.txt', 'c.txt']
+        app.reset_index()
+        assert app.load_from_cache() and sorted(app.doc_names) == ['a.txt', 'b.txt', 'c.txt']
+        print(f"✓ Upload waited {waited:.1f}s for the other worker and kept both documents")
+    finally:
+        app.DOCS_DIR, app.INDEX_DIR = saved
+        app.reset_index()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_job_queue():
+    """Test that /reload and /upload index in background jobs that report progress"""
+    import app
+    import io
+    import time
+    import tempfile
+    import shutil
+    from jobs import JobQueue
+    
+    print("\nTesting background indexing jobs...")
+    saved = (app.DOCS_DIR, app.INDEX_DIR, app.job_queue)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        # Jobs run in order; progress, skipped items and failures are reported
+        queue = JobQueue(os.path.join(temp_dir, 'jobs'), max_jobs=5)
+        def count(job, n):
+            job.update(stage='counting', total=n)
+            for i in range(n):
+                job.update(done=i + 1)
+            return n
+        def fail(job):
+            job.update(stage='checking', error='one file skipped')
+            raise ValueError('broken')
+        first, second = queue.submit('count', count, 3), queue.submit('fail', fail)
+        assert second.wait(10)
+        assert queue.get(first.id)['status'] == 'done' and queue.get(first.id)['result'] == 3
+        status = queue.get(second.id)
+        assert (status['status'], status['stage'], status['error']) == ('failed', 'checking', 'broken')
+        assert status['errors'] == ['one file skipped']
+        # Other server workers read the job's status from its file
+        assert JobQueue(queue.root).get(first.id)['done'] == 3
+        assert JobQueue(queue.root).get('../config') is None
+        
+        app.DOCS_DIR = os.path.join(temp_dir, 'docs')
+        app.INDEX_DIR = os.path.join(temp_dir, 'index')
+        app.job_queue = JobQueue(os.path.join(temp_dir, 'app_jobs'))
+        os.makedirs(app.DOCS_DIR)
+        for name, text in [('a.txt', "Inverted index construction."), ('b.txt', "Query processing with skip pointers.")]:
+            with open(os.path.join(app.DOCS_DIR, name), 'w') as f:
+                f.write(text)
+        client = app.app.test_client()
+        def wait_for(response):
+            assert response.status_code == 202, response.get_json()
+            status_url = response.get_json()['status_url']
+            assert response.headers['Location'] == status_url
+            for _ in range(300):
+                status = client.get(status_url).get_json()
+                if status['status'] in ('done', 'failed'):
+                    return status
+                time.sleep(0.05)
+            raise AssertionError('job did not finish')
+        
+        status = wait_for(client.post('/reload', json={'force': True}))
+        assert status['status'] == 'done' and status['result']['doc_count'] == 2
+        assert (status['done'], status['total']) == (2, 2)
+        
+        upload = {'file': (io.BytesIO(b"Skip pointers speed up posting list intersection."), 'skip.txt')}
+        status = wait_for(client.post('/upload', data=upload, content_type='multipart/form-data'))
+        assert status['status'] == 'done' and status['result']['total_documents'] == 3
+        assert client.post('/search', json={'query': 'intersection', 'search_type': 'tfidf'}).get_json()['results']
+        
+        # A file that cannot be indexed fails its job and is removed again
+        upload = {'file': (io.BytesIO(b"   "), 'empty.txt')}
+        status = wait_for(client.post('/upload', data=upload, content_type='multipart/form-data'))
+        assert status['status'] == 'failed' and 'empty' in status['error']
+        assert not os.path.exists(os.path.join(app.DOCS_DIR, 'uploads', 'empty.txt'))
+        assert len(app.documents) == 3
+        assert client.get('/jobs/0123').status_code == 404
+        print(f"✓ Indexing jobs report progress ({len(client.get('/jobs').get_json()['jobs'])} jobs)")
+    finally:
+        app.DOCS_DIR, app.INDEX_DIR, app.job_queue = saved
+        app.reset_index()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_search_batch():
+    """Test that batch search scores all queries at once and ranks like single searches"""
+    import app
+    import numpy as np
+    from bm25_index import BM25Index
+    
+    print("\nTesting batch search...")
+    corpus = [["database", "locking", "locking"], ["database", "normal"], ["retrieval", "bm25"], []]
+    bm25 = BM25Index(corpus)
+    queries = [["database", "locking"], ["bm25", "bm25", "unknown"], []]
+    assert np.allclose(bm25.get_scores_many(queries), [bm25.get_scores(q) for q in queries])
+    
+    from vector_index import ExactIndex, IVFIndex
+    rng = np.random.default_rng(0)
+    vectors, query_vectors = rng.normal(size=(200, 16)), rng.normal(size=(5, 16))
+    for index in (ExactIndex(vectors), IVFIndex(vectors, n_probe=3)):
+        for (ids, scores), query in zip(index.search_many(query_vectors, 5), query_vectors):
+            expected_ids, expected_scores = index.search(query, 5)
+            assert np.allclose(scores, expected_scores) and set(ids) == set(expected_ids)
+    
+    class CountingEncoder(HashingEncoder):
+        calls = []
+        def encode(self, texts, **kwargs):
+            self.calls.append(list(texts))
+            return super().encode(texts, **kwargs)
+    
+    saved = (app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE)
+    try:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = CountingEncoder(), True
+        app.reset_index()
+        app.add_documents([
+            ('DBMS/locking.txt', "Database transactions use locking for concurrency control.", [], {}),
+            ('DBMS/normal.txt', "Database normalization removes redundancy from tables.", [], {}),
+            ('ir.txt', "Information retrieval ranks documents with BM25 and TF-IDF scoring.", [], {}),
+            ('ml.txt', "Supervised learning trains a classifier on labelled examples.", [], {})
+        ])
+        app.rebuild_lexical_indices()
+        app.query_embedding_cache.clear()
+        CountingEncoder.calls.clear()
+        
+        queries = ["database locking", "retrieval scoring", "supervised classifier", "database locking"]
+        batch = app.search_batch(queries, app.SEARCH_METHODS, top_k=3, filter_files=['DBMS', 'ir.txt'])
+        assert CountingEncoder.calls == [queries[:3]], CountingEncoder.calls  # One model call, duplicates encoded once
+        assert len(batch) == len(queries)
+        for query, results in zip(queries, batch):
+            for method in app.SEARCH_METHODS:
+                single = app.run_search(query, method, filter_files=['DBMS', 'ir.txt'], top_k=3)
+                assert [r['filename'] for r in results[method]] == [r['filename'] for r in single], (query, method)
+                assert np.allclose([r['score'] for r in results[method]], [r['score'] for r in single])
+                assert results[method] == [] or results[method][0]['summary'] == single[0]['summary']
+        assert batch[0]['hybrid'][0]['filename'] == 'DBMS/locking.txt'
+        assert 'bm25_score' in batch[0]['hybrid'][0]
+        
+        # Chunked batches score (and encode) the queries a chunk at a time, with the same results
+        saved_cells = app.BATCH_SCORE_CELLS
+        try:
+            app.BATCH_SCORE_CELLS = 2 * len(app.semantic_index)
+            app.query_embedding_cache.clear()
+            CountingEncoder.calls.clear()
+            assert app.search_batch(queries, app.SEARCH_METHODS, top_k=3, filter_files=['DBMS', 'ir.txt']) == batch
+            assert CountingEncoder.calls == [queries[:2], queries[2:3]], CountingEncoder.calls
+        finally:
+            app.BATCH_SCORE_CELLS = saved_cells
+        
+        brief = app.search_batch(queries[:1], ['bm25'], top_k=2, snippets=False)
+        assert set(brief[0]['bm25'][0]) == {'filename', 'score', 'method'}
+        try:
+            app.search_batch(queries, ['boolean'])
+            assert False, "Unknown methods must be rejected"
+        except ValueError:
+            pass
+        
+        client = app.app.test_client()
+        response = client.post('/search/batch', json={'queries': queries[:2], 'methods': ['tfidf', 'hybrid'],
+                                                      'top_k': 2, 'snippets': False})
+        data = response.get_json()
+        assert response.status_code == 200 and data['total'] == 2
+        assert data['results'][1]['query'] == 'retrieval scoring'
+        assert data['results'][1]['results']['tfidf'][0]['filename'] == 'ir.txt'
+        assert client.post('/search/batch', json={'queries': []}).status_code == 400
+        assert client.post('/search/batch', json={'queries': ['x'], 'methods': ['boolean']}).status_code == 400
+        print(f"✓ Batch search ranks {len(queries)} queries x {len(app.SEARCH_METHODS)} methods like single searches")
+    finally:
+        app.SEMANTIC_MODEL, app.SEMANTIC_AVAILABLE = saved
+        app.reset_index()
+
+def test_text_analyzer():
+    """Test that TextAnalyzer produces exactly the tokens of the word_tokenize pipeline"""
+    import re
+    import app
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize
+    from text_analyzer import TextAnalyzer, CUSTOM_STOPWORDS
+    
+    print("\nTesting text analyzer...")
+    app.ensure_nltk_data()
+    try:
+        nltk.data.find('tokenizers/punkt')  # Only the reference tokenizer needs it
+    except LookupError:
+        nltk.download('punkt', quiet=True)
+    stop_words = CUSTOM_STOPWORDS.union(stopwords.words('english'))
+    def reference(text, normalize):
+        tokens = word_tokenize(re.sub(r'[^a-z0-9\s]', ' ', text.lower()))
+        return [normalize(t) for t in tokens if t not in stop_words and len(t) > 2]
+    
+    texts = [
+        "Information Retrieval (IR) ranks documents; BM25 & TF-IDF are classic models.",
+        "You cannot normalize what you don't understand, I'm gonna say. Gotta wanna",
+        "Unit 3 notes: page 42\tquestion/answer\n\nsection 2.1 -- Café naïve résumé İstanbul",
+        "lemme gimme CANNOT cannot5 wanna-be e-mail x y zz 1000000 ",
+        ""
+    ]
+    for normalize in (app.stemmer.stem, str.upper, lambda t: t):
+        analyzer = TextAnalyzer(stop_words, normalize)
+        for text in texts + [" ".join(texts)]:
+            assert analyzer.analyze(text) == reference(text, normalize), text
+        assert analyzer.analyze_many(texts) == [reference(text, normalize) for text in texts]
+    
+    # The memoized word table stays within max_terms
+    analyzer = TextAnalyzer(stop_words, app.stemmer.stem, max_terms=5)
+    assert analyzer.analyze(texts[0]) == reference(texts[0], app.stemmer.stem)
+    assert len(analyzer) <= 5
+    
+    # preprocess_text_advanced follows the configured normalization
+    saved = dict(app.CONFIG)
+    try:
+        app.CONFIG.update({'use_stemming': False, 'use_lemmatization': False})
+        assert app.preprocess_text_advanced(texts[0]) == reference(texts[0], lambda t: t)
+    finally:
+        app.CONFIG.clear()
+        app.CONFIG.update(saved)
+    assert app.preprocess_text_advanced(texts[0]) == reference(texts[0], app.stemmer.stem)
+    print("✓ TextAnalyzer matches the word_tokenize pipeline")
+
+def test_shared_term_counts():
+    """Test that TF-IDF is built from the BM25 term counts with the same analysis"""
+    import app
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    
+    print("\nTesting shared term counts...")
+    saved = dict(app.CONFIG)
+    try:
+        app.CONFIG['tfidf_max_features'] = 0
+        app.reset_index()
+        app.add_documents([
+            ('a.txt', "Indexing builds postings; indexes store posting lists.", [], {}),
+            ('b.txt', "Ranking documents with ranked retrieval models.", [], {}),
+            ('c.txt', "Stemming maps ranking and ranked to one term.", [], {})
+        ])
+        app.remove_documents(['a.txt'])
+        app.add_documents([('d.txt', "Retrieval evaluation uses ranked lists of documents.", [], {})])
+        app.rebuild_lexical_indices()
+        
+        # Same matrix as a TfidfVectorizer fitted with the BM25 analyzer
+        expected = TfidfVectorizer(analyzer=app.preprocess_text_advanced)
+        expected_matrix = expected.fit_transform(app.documents)
+        assert app.tfidf_vectorizer.vocabulary == expected.vocabulary_
+        assert np.allclose(app.tfidf_matrix.toarray(), expected_matrix.toarray())
+        assert np.allclose(app.tfidf_vectorizer.transform(["ranking"]).toarray(),
+                           expected.transform(["ranking"]).toarray())
+        # Both lexical methods share one vocabulary (terms of removed documents aside)
+        counts = app.bm25_model.count_matrix()
+        assert counts.sum() == app.bm25_model.doc_len.sum()
+        assert set(app.tfidf_vectorizer.vocabulary) <= set(app.bm25_model.vocabulary)
+        assert 'rank' in app.tfidf_vectorizer.vocabulary and 'index' not in app.tfidf_vectorizer.vocabulary
+        
+        app.CONFIG['tfidf_max_features'] = 2
+        app.rebuild_lexical_indices()
+        assert sorted(app.tfidf_vectorizer.vocabulary) == ['document', 'rank']
+        print("✓ TF-IDF and BM25 share one tokenization pass")
+    finally:
+        app.CONFIG.clear()
+        app.CONFIG.update(saved)
+        app.reset_index()
+
+def test_full_vocabulary_tfidf():
+    """Test the full-vocabulary float32 TF-IDF index and its document-frequency pruning"""
+    import app
+    import numpy as np
+    from sklearn.metrics.pairwise import cosine_similarity
+    
+    print("\nTesting full-vocabulary TF-IDF...")
+    saved = dict(app.CONFIG)
+    try:
+        app.reset_index()
+        app.add_documents([(f'doc{i}.txt', f"Database systems store tables and indexes, lecture {i}.", [], {})
+                           for i in range(8)] + [('rare.txt', "Database tables: Boyce Codd decomposition.", [], {})])
+        app.rebuild_lexical_indices()
+        assert app.tfidf_matrix.dtype == np.float32
+        assert np.allclose(np.asarray(app.tfidf_matrix.multiply(app.tfidf_matrix).sum(axis=1)).ravel(), 1, atol=1e-6)
+        
+        # A term of one document is kept and found
+        results = app.search_tfidf("decomposition")
+        assert [r['filename'] for r in results] == ['rare.txt']
+        query_vec = app.tfidf_vectorizer.transform(["codd tables"])
+        assert np.allclose(app.score_tfidf("codd tables"), cosine_similarity(query_vec, app.tfidf_matrix).ravel(), atol=1e-6)
+        
+        # min_df drops rare terms, a fractional max_df drops terms in most documents
+        app.CONFIG.update({'tfidf_min_df': 2, 'tfidf_max_df': 0.9})
+        app.rebuild_lexical_indices()
+        vocabulary = app.tfidf_vectorizer.vocabulary
+        assert 'decomposit' not in vocabulary and 'databas' not in vocabulary and 'lectur' in vocabulary
+        assert app.search_tfidf("decomposition") == []
+        print(f"✓ TF-IDF keeps the full vocabulary ({len(vocabulary)} terms after pruning)")
+    finally:
+        app.CONFIG.clear()
+        app.CONFIG.update(saved)
+        app.reset_index()
+
+def test_query_expansion():
+    """Test the precomputed expansion table and down-weighted expansion terms"""
+    import app
+    import shutil
+    import tempfile
+    
+    print("\nTesting query expansion...")
+    synonyms = {'car': ('automobile', 'auto', 'machine'), 'automobile': ('car',), 'film': ('movie', 'picture')}
+    saved = (app.wordnet_synonyms, app.INDEX_DIR, dict(app.CONFIG), app.wordnet_synonyms, app.wordnet,
+             app._wordnet_ready, dict(app._synonyms))
+    temp_dir = tempfile.mkdtemp()
+    try:
+        app.wordnet_synonyms = lambda word: synonyms.get(word, ())
+        app.CONFIG['enable_query_expansion'] = True
+        app.reset_index()
+        app.add_documents([
+            ('cars.txt', "The car was parked in the garage next to another car.", [], {}),
+            ('auto.txt', "An automobile needs fuel and regular maintenance.", [], {}),
+            ('movie.txt', "The movie premiered last night.", [], {})
+        ])
+        app.rebuild_lexical_indices()
+        
+        # Only synonyms occurring in the collection, as index terms
+        assert app.expansion_table.expansions == {'car': ('automobil',), 'automobil': ('car',)}
+        assert app.expand_query("car") == "car automobil"
+        terms, weights = app.analyze_query("cars and automobiles")
+        assert terms == ['car', 'automobil'] and weights == [1.0, 1.0]
+        
+        for search in (app.search_bm25, app.search_tfidf):
+            results = [r for r in search("car") if r['score'] > 0]
+            assert [r['filename'] for r in results] == ['cars.txt', 'auto.txt'], search
+            assert results[1]['score'] < results[0]['score']
+        
+        bm25 = app.score_bm25("car")
+        app.CONFIG['expansion_weight'] = 0.6
+        assert abs(app.score_bm25("car")[1] - 2 * bm25[1]) < 1e-9
+        assert app.score_bm25_many(["car"])[0][1] == app.score_bm25("car")[1]
+        
+        app.CONFIG['enable_query_expansion'] = False
+        assert [r['filename'] for r in app.search_bm25("car") if r['score'] > 0] == ['cars.txt']
+        assert [r['filename'] for r in app.search_tfidf("car")] == ['cars.txt']
+        
+        # The table is saved with the index
+        app.INDEX_DIR = os.path.join(temp_dir, 'index')
+        app.save_to_cache()
+        assert app.open_index().expansion_table.expansions == app.expansion_table.expansions
+        
+        # So are the WordNet lookups: a restarted process rebuilds without repeating them
+        class FakeWordNet:
+            lookups = []
+            def ensure_loaded(self):
+                pass
+            def synsets(self, word):
+                self.lookups.append(word)
+                lemma = type('Lemma', (), {'name': lambda self: synonyms.get(word, ('',))[0] or word})()
+                return [type('Synset', (), {'lemmas': lambda self: [lemma]})()]
+        app.wordnet, app._wordnet_ready = FakeWordNet(), None
+        app.wordnet_synonyms = saved[3]
+        app._synonyms.clear()
+        app.CONFIG['enable_query_expansion'] = True
+        app.rebuild_lexical_indices()
+        assert 'car' in FakeWordNet.lookups and app.expansion_table.expansions['car'] == ('automobil',)
+        app.save_to_cache()
+        app._synonyms.clear()
+        FakeWordNet.lookups.clear()
+        app.load_from_cache()
+        app.add_documents([('film.txt', "A film about a car chase.", [], {})])
+        app.rebuild_lexical_indices()
+        assert sorted(FakeWordNet.lookups) == ['chase', 'film'], "only words new to the collection"
+        assert app.expansion_table.expansions['film'] == ('movi',)
+        print(f"✓ Query expansion adds down-weighted synonyms ({len(app.expansion_table)} terms)")
+    finally:
+        app.wordnet_synonyms, app.INDEX_DIR = saved[:2]
+        app.CONFIG.clear()
+        app.CONFIG.update(saved[2])
+        app.wordnet, app._wordnet_ready = saved[4:6]
+        app._synonyms.clear()
+        app._synonyms.update(saved[6])
+        app.reset_index()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
 def run_all_tests():
     """Run complete test suite"""
     print("="*70)
@@ -161,6 +1524,33 @@ def run_all_tests():
     test_search_methods()
     test_caching()
     test_file_filtering()
+    test_incremental_indexing()
+    test_parallel_ingestion()
+    test_single_pass_pdf_extraction()
+    test_bm25_index()
+    test_vector_index()
+    test_quantized_vectors()
+    test_passage_indexing()
+    test_index_store()
+    test_lazy_startup()
+    test_result_cache()
+    test_query_embedding_cache()
+    test_hybrid_fusion()
+    test_result_materialization()
+    test_filter_index()
+    test_search_pagination()
+    test_snippet_index()
+    test_image_store()
+    test_streaming_responses()
+    test_index_swap()
+    test_worker_embedding()
+    test_cross_worker_updates()
+    test_job_queue()
+    test_search_batch()
+    test_text_analyzer()
+    test_shared_term_counts()
+    test_full_vocabulary_tfidf()
+    test_query_expansion()
     
     print("\\n" + "="*70)
     print("TEST SUMMARY")
@@ -0,0 +1,72 @@
+"""
+Text analysis for the BM25 index
+A reusable analyzer that produces exactly the tokens of the original
+preprocess_text_advanced pipeline (lowercase, strip to [a-z0-9], NLTK
+word_tokenize, stopword and length filter, stemming or lemmatization)
+without its per-call setup. The stop set is built once, tokenizing is a
+precompiled regex and each distinct word is analyzed once and memoized.
+"""
+
+import re
+
+# Custom IR-specific stopwords, added to NLTK's English list
+CUSTOM_STOPWORDS = frozenset({'note', 'notes', 'question', 'answer', 'section', 'unit', 'page'})
+
+# Once text is reduced to [a-z0-9] words, these are the only contractions
+# word_tokenize still splits (its other rules need punctuation)
+CONTRACTIONS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na')
+}
+
+STRIP_PATTERN = re.compile(r'[^a-z0-9\s]')
+WORD_PATTERN = re.compile(r'\S+')
+
+class TextAnalyzer:
+    """Turns text into index terms.
+
+    Args:
+        stop_words: Words dropped before normalizing (tokens of 2 characters or fewer are always dropped)
+        normalize: Function applied to every kept token (e.g. PorterStemmer().stem), or None
+        max_terms: Most distinct words whose analysis is memoized
+    """
+
+    def __init__(self, stop_words, normalize=None, max_terms=500000):
+        self.stop_words = frozenset(stop_words)
+        self.normalize = normalize
+        self.max_terms = max_terms
+        self._terms = {}  # word -> tuple of terms it produces
+
+    def _analyze_word(self, word):
+        terms = []
+        for token in CONTRACTIONS.get(word, (word,)):
+            if token not in self.stop_words and len(token) > 2:
+                terms.append(self.normalize(token) if self.normalize else token)
+        terms = tuple(terms)
+        if len(self._terms) >= self.max_terms:
+            # Unusually large vocabulary: start over rather than grow without bound
+            self._terms.clear()
+        self._terms[word] = terms
+        return terms
+
+    def analyze(self, text):
+        """List of terms of a text (document or query)"""
+        memo = self._terms
+        terms = []
+        for word in WORD_PATTERN.findall(STRIP_PATTERN.sub(' ', text.lower())):
+            analyzed = memo.get(word)
+            if analyzed is None:
+                analyzed = self._analyze_word(word)
+            terms.extend(analyzed)
+        return terms
+
+    def analyze_many(self, texts):
+        """analyze for every text, sharing the memoized word table"""
+        return [self.analyze(text) for text in texts]
+
+    def __len__(self):
+        return len(self._terms)
@@ -0,0 +1,260 @@
+"""
+Vector indices for semantic search
+An exact backend (normalized float32 matrix + argpartition) and an IVF
+backend (spherical k-means coarse quantizer) with a tunable recall/latency
+trade-off via n_probe. Both own the embedding storage and support
+incremental add/remove. Vectors can be stored as float32, float16 or int8
+(scalar-quantized with a per-vector scale); quantized vectors are decoded
+to float32 one block at a time while scoring.
+"""
+
+import numpy as np
+
+def normalize_rows(vectors):
+    """L2-normalize rows as float32 so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+# Storage formats for the vectors
+STORAGE_TYPES = ('float32', 'float16', 'int8')
+
+# Rows decoded at a time when scoring quantized vectors (small enough to stay in cache)
+BLOCK_ROWS = 2048
+
+def quantize_rows(vectors, storage):
+    """Encode normalized float32 rows for storage; returns (stored rows, per-row scales).
+    int8 rows hold round(v / scale) with scale = max|v| / 127, so decoding is
+    stored * scale; float rows have scale 1.
+    """
+    scales = np.ones(len(vectors), dtype=np.float32)
+    if storage == 'float32':
+        return vectors, scales
+    if storage == 'float16':
+        return vectors.astype(np.float16), scales
+    if storage == 'int8':
+        peaks = np.abs(vectors).max(axis=1) if vectors.shape[1] else np.zeros(len(vectors), dtype=np.float32)
+        scales[peaks > 0] = peaks[peaks > 0] / 127
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales
+    raise ValueError(f"Unknown vector storage: {storage}")
+
+def top_k_ids(scores, k):
+    """Indices of the k highest scores, best first (ties broken by lower index)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        # Everything above the k-th best score, then the lowest-index ties at it
+        threshold = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > threshold)
+        tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+class ExactIndex:
+    """Brute-force cosine search over a matrix of normalized vectors.
+
+    Args:
+        storage: 'float32', 'float16' (half the memory) or 'int8' (a quarter)
+    """
+
+    # Attributes persisted by index_store
+    PARAMS = ('storage',)
+    ARRAYS = ('vectors', 'scales')
+
+    def __init__(self, vectors=None, storage='float32'):
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown vector storage: {storage}")
+        self.storage = storage
+        self.vectors = np.zeros((0, 0), dtype=storage)
+        self.scales = np.zeros(0, dtype=np.float32)
+        if vectors is not None:
+            self.add(vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def add(self, vectors):
+        """Append vectors (normalized and encoded on the way in)"""
+        vectors, scales = quantize_rows(normalize_rows(vectors), self.storage)
+        if len(self.vectors) == 0:
+            self.vectors, self.scales = vectors, scales
+        else:
+            self.vectors = np.vstack([self.vectors, vectors])
+            self.scales = np.concatenate([self.scales, scales])
+
+    def remove(self, keep):
+        """Keep only the rows selected by a boolean mask or index list"""
+        self.vectors = self.vectors[keep]
+        self.scales = self.scales[keep]
+
+    def decode(self, rows=slice(None)):
+        """float32 copy of the stored vectors selected by rows (a slice or index array)"""
+        block = self.vectors[rows].astype(np.float32, copy=self.storage != 'float32')
+        if self.storage == 'int8':
+            block *= self.scales[rows, None]
+        return block
+
+    def _row_scores(self, rows, queries):
+        """Dot products of stored rows with normalized queries (rows x queries, or rows
+        for a single query). int8 scales are applied to the dot products rather than
+        to the decoded rows, one multiply per score instead of per component.
+        """
+        scores = self.vectors[rows].astype(np.float32, copy=False) @ queries.T
+        if self.storage == 'int8':
+            scores *= self.scales[rows] if scores.ndim == 1 else self.scales[rows, None]
+        return scores
+
+    def _scores_all(self, queries):
+        """_row_scores over the whole index; quantized rows are decoded BLOCK_ROWS at a time"""
+        if self.storage == 'float32':
+            return self.vectors @ queries.T
+        scores = np.empty((len(self.vectors),) + queries.shape[:-1], dtype=np.float32)
+        for start in range(0, len(self.vectors), BLOCK_ROWS):
+            rows = slice(start, start + BLOCK_ROWS)
+            scores[rows] = self._row_scores(rows, queries)
+        return scores
+
+    def scores(self, query):
+        """Cosine similarity of the query against every vector"""
+        if len(self.vectors) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self._scores_all(normalize_rows(query)[0])
+
+    def search(self, query, k):
+        """Return (ids, scores) of the k nearest vectors, best first"""
+        scores = self.scores(query)
+        ids = top_k_ids(scores, k)
+        return ids, scores[ids]
+
+    def search_many(self, queries, k):
+        """search for every row of queries, scoring them all in one matrix product.
+        Returns a list of (ids, scores), one per query.
+        """
+        queries = normalize_rows(queries)
+        if len(self.vectors) == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        results = []
+        for scores in self._scores_all(queries).T:
+            ids = top_k_ids(scores, k)
+            results.append((ids, scores[ids]))
+        return results
+
+class IVFIndex(ExactIndex):
+    """Inverted-file index: vectors are bucketed by their nearest k-means centroid
+    and a query only scores the n_probe closest buckets.
+
+    Args:
+        n_lists: Number of buckets (0 = about sqrt(number of vectors))
+        n_probe: Buckets scanned per query; higher is slower but more accurate
+        train_iters: k-means iterations
+        storage: Vector storage format, as for ExactIndex (centroids stay float32)
+    """
+
+    PARAMS = ('n_lists', 'n_probe', 'train_iters', 'seed', 'trained_size', 'storage')
+    ARRAYS = ('vectors', 'scales', 'centroids', 'assignments', 'list_order', 'list_offsets')
+
+    def __init__(self, vectors=None, n_lists=0, n_probe=8, train_iters=10, seed=0, storage='float32'):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iters = train_iters
+        self.seed = seed
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.list_order = np.zeros(0, dtype=np.int64)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        self.trained_size = 0
+        super().__init__(vectors, storage=storage)
+
+    def _assign(self, vectors):
+        """Nearest centroid of every vector, in chunks to bound memory"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 16384):
+            block = vectors[start:start + 16384]
+            assignments[start:start + 16384] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def _build_lists(self):
+        """Group vector ids by bucket (CSR layout)"""
+        self.list_order = np.argsort(self.assignments, kind='stable')
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def train(self):
+        """Run spherical k-means over the current vectors and rebuild the buckets"""
+        n = len(self.vectors)
+        if n == 0:
+            return
+        n_lists = min(n, self.n_lists or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(self.seed)
+        vectors = self.decode()
+        self.centroids = vectors[rng.choice(n, size=n_lists, replace=False)].copy()
+
+        for _ in range(self.train_iters):
+            self.assignments = self._assign(vectors)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, self.assignments, vectors)
+            counts = np.bincount(self.assignments, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty buckets with random vectors
+                sums[empty] = vectors[rng.choice(n, size=int(empty.sum()))]
+            self.centroids = normalize_rows(sums)
+
+        self.assignments = self._assign(vectors)
+        self._build_lists()
+        self.trained_size = n
+
+    def add(self, vectors):
+        """Append vectors, retraining the quantizer once the index has doubled in size"""
+        start = len(self.vectors)
+        super().add(vectors)
+        if self.trained_size == 0 or len(self.vectors) >= 2 * self.trained_size:
+            self.train()
+        else:
+            self.assignments = np.concatenate([self.assignments, self._assign(self.decode(slice(start, None)))])
+            self._build_lists()
+
+    def remove(self, keep):
+        super().remove(keep)
+        self.assignments = self.assignments[keep]
+        if len(self.vectors) == 0:
+            self.trained_size = 0
+        self._build_lists()
+
+    def search(self, query, k):
+        """Return (ids, scores) of the approximate k nearest vectors, best first"""
+        if len(self.vectors) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = normalize_rows(query)[0]
+        return self._search_buckets(query, self.centroids @ query, k)
+
+    def _search_buckets(self, query, centroid_scores, k):
+        """Score the vectors of the n_probe buckets closest to a normalized query"""
+        probe = top_k_ids(centroid_scores, self.n_probe)
+        candidates = np.concatenate([self.list_order[self.list_offsets[b]:self.list_offsets[b + 1]]
+                                     for b in probe])
+        scores = self._row_scores(candidates, query)
+        best = top_k_ids(scores, k)
+        return candidates[best], scores[best]
+
+    def search_many(self, queries, k):
+        """search for every row of queries; bucket selection for all of them is one matrix product"""
+        queries = normalize_rows(queries)
+        if len(self.vectors) == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        centroid_scores = queries @ self.centroids.T
+        return [self._search_buckets(query, scores, k) for query, scores in zip(queries, centroid_scores)]
+
+def build_vector_index(vectors=None, backend='exact', **params):
+    """Create a vector index by backend name ('exact' or 'ivf')"""
+    if backend == 'ivf':
+        return IVFIndex(vectors, **params)
+    if backend == 'exact':
+        return ExactIndex(vectors, storage=params.get('storage', 'float32'))
+    raise ValueError(f"Unknown vector index backend: {backend}")
@@ -0,0 +1,18 @@
+"""
+Production entry point for the IR system
+
+    gunicorn -c gunicorn.conf.py wsgi:app               (Linux/macOS, several worker processes)
+    waitress-serve --threads=8 --port=5000 wsgi:app     (Windows, one process with threads)
+
+The document index is opened when this module is imported. With gunicorn's
+preload_app that happens once in the master process, and the forked workers
+share its memory-mapped index pages read-only.
+"""
+
+import os
+import app as ir_system
+
+# Under gunicorn every worker starts the warm-up itself after fork (see gunicorn.conf.py)
+ir_system.startup(warmup=not os.environ.get('IR_FORKED_WORKERS'))
+
+app = ir_system.app